@@ -0,0 +1,138 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Sentence-final punctuation only; "C++" or "2+2=4" must keep their symbols to stay distinct
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing ?/!/. so trivial variants match exactly.
+
+    Anything else (e.g. symbols inside the question) is kept; closer rephrasings are left
+    to the semantic lookup and its distance check.
+    """
+    return TRAILING_PUNCTUATION.sub("", " ".join(question.lower().split()))
+
+
+class AnswerCache:
+    """Cache of /ask answers keyed by collection version, retrieval settings and question.
+
+    Lookups try the normalized question text first, then the nearest cached question
+    embedding within ``max_distance`` cosine distance. ``settings`` are whatever else
+    shapes an answer (e.g. ``(k, token_budget)``); answers given under other settings
+    never match. Entries belong to one index version of one collection: a new version
+    drops them. They also expire after ``ttl_seconds`` and the least recently used are
+    evicted beyond ``max_entries``. A collection's version is only remembered while it
+    has entries, so the bookkeeping stays within ``max_entries`` too.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, max_distance):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (collection, settings, normalized question) -> entry
+        self._versions = {}             # collection -> index version its entries belong to
+        self._sizes = {}                # collection -> number of entries
+        self._matrices = {}             # (collection, settings) -> (keys, unit question vectors), rebuilt lazily
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _check_version(self, collection, version):
+        if collection in self._versions and self._versions[collection] != version:
+            self._drop_collection(collection)
+
+    def _drop_collection(self, collection):
+        for key in [key for key in self._entries if key[0] == collection]:
+            self._remove(key)
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._matrices.pop(key[:2], None)
+        collection = key[0]
+        self._sizes[collection] -= 1
+        if not self._sizes[collection]:
+            del self._sizes[collection]
+            del self._versions[collection]
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created"] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def invalidate(self, collection):
+        """Forget every answer for ``collection`` (called when its index changes)."""
+        with self._lock:
+            self._drop_collection(collection)
+
+    def get_exact(self, collection, version, settings, question):
+        with self._lock:
+            self._check_version(collection, version)
+            entry = self._live((collection, settings, normalize_question(question)))
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return entry["answer"]
+
+    def get_similar(self, collection, version, settings, vector):
+        """Return the answer of the closest cached question, if it is within ``max_distance``."""
+        with self._lock:
+            self._check_version(collection, version)
+            scope = (collection, settings)
+            if scope not in self._matrices:
+                keys = [key for key in self._entries if key[:2] == scope]
+                if keys:
+                    self._matrices[scope] = (keys, np.stack([self._entries[key]["vector"] for key in keys]))
+            if scope not in self._matrices:
+                self.misses += 1
+                return None
+
+            keys, matrix = self._matrices[scope]
+            similarities = matrix @ _unit(vector)
+            best = int(np.argmax(similarities))
+            if 1.0 - similarities[best] <= self.max_distance:
+                entry = self._live(keys[best])
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def put(self, collection, version, settings, question, vector, answer):
+        with self._lock:
+            self._check_version(collection, version)
+            key = (collection, settings, normalize_question(question))
+            if key not in self._entries:
+                self._sizes[collection] = self._sizes.get(collection, 0) + 1
+            self._versions[collection] = version
+            self._entries[key] = {"vector": _unit(vector), "answer": answer, "created": time.monotonic()}
+            self._entries.move_to_end(key)
+            self._matrices.pop(key[:2], None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+            }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
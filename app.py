@@ -1,19 +1,65 @@
-from flask import Flask, request, jsonify
+import startup_metrics  # First import, so import time is measured from here
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
-from newapp import ask_question, upload_pdf
-from keyword_extractor import extract_keywords  # Import the function from keyword_extractor.py
-from keybert import KeyBERT
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import gc
+import logging
+import threading
+from keyword_extractor import extract_keywords, model_registry  # Import the function from keyword_extractor.py
+from keyword_cache import KeywordCache
+from shared_models import KEYBERT_BACKEND, SENTENCE_MODEL_NAME
+from store_ids import STORE_ID_PATTERN, model_cache_dir
 from dotenv import load_dotenv
-import resend
 
-kw_model = KeyBERT(model='all-MiniLM-L6-v2')
+# Heavy dependencies (KeyBERT/sentence-transformers, the LangChain stack in newapp, resend)
+# are imported inside the routes that need them, so the app imports fast.
 
 # Load environment variables
 load_dotenv()
 
+# Load the TF-IDF keyword model now rather than on the first request; a missing or broken
+# file is reported here and by /extract_keywords_manual until it is fixed
+try:
+    model_registry.load()
+except Exception as e:
+    logging.error(f"Keyword model not loaded at startup: {e}")
+
+# Embeddings and keyword results for texts clients send repeatedly, looked up by content hash.
+# ONNX int8 vectors differ slightly from PyTorch ones, so each backend keeps its own disk entries
+keyword_cache_dir = os.getenv("KEYWORD_CACHE_DIR")
+keyword_cache = KeywordCache(
+    max_bytes=int(os.getenv("KEYWORD_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    disk_dir=model_cache_dir(keyword_cache_dir, f"{KEYBERT_BACKEND}-{SENTENCE_MODEL_NAME}") if keyword_cache_dir else None,
+)
+_keyword_engine = None
+_keyword_engine_lock = threading.Lock()
+
+def get_keyword_engine():
+    """KeyBERT engine, created on first use; KeyBERT shares the sentence-transformer
+    used by the local RAG embedding backend."""
+    global _keyword_engine
+    with _keyword_engine_lock:
+        if _keyword_engine is None:
+            from shared_models import get_kw_model
+            from keyword_engine import BatchKeywordEngine
+            _keyword_engine = BatchKeywordEngine(get_kw_model(), cache=keyword_cache)
+        return _keyword_engine
+
+def preload():
+    """Load the MiniLM weights and the RAG stack before gunicorn forks its workers.
+
+    Workers then share those pages copy-on-write. gc.freeze() moves everything loaded so
+    far out of the garbage collector's view, so collections in a worker do not touch (and
+    thereby copy) the shared objects.
+    """
+    get_keyword_engine()
+    import newapp  # noqa: F401
+    gc.freeze()
+    startup_metrics.mark("models_preloaded")
+
+if os.getenv("PRELOAD_MODELS") == "1":
+    preload()
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
@@ -24,6 +70,7 @@ def index():
 @app.route('/ask', methods=['POST'])
 def ask():
     try:
+        from newapp import ask_question
         result = ask_question()
         return result
     except Exception as e:
@@ -32,24 +79,134 @@ def ask():
 @app.route('/upload', methods=['POST'])
 def upload():
     try:
+        from newapp import upload_pdf
         result = upload_pdf()
         return result
     except Exception as e:
         return jsonify({"error": "Error in upload endpoint", "details": str(e)}), 500
 
+@app.route('/upload/<job_id>', methods=['GET'])
+def upload_job_status(job_id):
+    try:
+        from newapp import upload_status
+        result = upload_status(job_id)
+        return result
+    except Exception as e:
+        return jsonify({"error": "Error in upload status endpoint", "details": str(e)}), 500
+
+@app.route('/documents/<doc_id>', methods=['DELETE'])
+def delete_uploaded_document(doc_id):
+    try:
+        from newapp import delete_document
+        result = delete_document(doc_id)
+        return result
+    except Exception as e:
+        return jsonify({"error": "Error in delete document endpoint", "details": str(e)}), 500
+
+@app.route('/embedding_cache/stats', methods=['GET'])
+def embedding_cache_stats_endpoint():
+    try:
+        from newapp import embedding_cache_stats
+        result = embedding_cache_stats()
+        return result
+    except Exception as e:
+        return jsonify({"error": "Error in embedding cache stats endpoint", "details": str(e)}), 500
+
+@app.route('/metrics/startup', methods=['GET'])
+def startup_metrics_endpoint():
+    """API endpoint reporting import timings and memory use of this worker process."""
+    return jsonify(startup_metrics.report()), 200
+
+# Reference corpora for TF-IDF keyword scoring, registered once instead of sent with every request
+IDF_CORPUS_DIR = os.getenv("IDF_CORPUS_DIR", "idf_corpora")
+_idf_corpora = None
+_idf_corpora_lock = threading.Lock()
+
+def get_idf_corpus(corpus_id):
+    global _idf_corpora
+    from idf_corpus import IdfCorpusStore
+    with _idf_corpora_lock:
+        if _idf_corpora is None:
+            _idf_corpora = IdfCorpusStore(IDF_CORPUS_DIR)
+    return _idf_corpora.get(corpus_id)
+
 @app.route('/extract_keywords_manual', methods=['POST'])
 def extract_keywords_endpoint():
-    """API endpoint to extract keywords from provided text and documents."""
+    """API endpoint to extract keywords from provided text and documents.
+
+    Documents in the request are used as the IDF corpus for that request only. Without
+    them, the text is scored against a registered corpus (corpus) or, failing that,
+    the IDF the model was trained with.
+    """
     data = request.get_json()
-    if not data or 'text' not in data or 'docs' not in data:
+    if not data or 'text' not in data:
         return jsonify({'error': 'No valid text or docs provided'}), 400
 
     custom_text = data['text']
-    docs = data['docs']  # Get documents from the request
-
-    keywords = extract_keywords(custom_text, docs)
+    docs = data.get('docs')  # Get documents from the request
+
+    if docs or not data.get('corpus'):
+        keywords = extract_keywords(custom_text, docs)
+        return jsonify(keywords), 200
+
+    corpus_id = data['corpus']
+    if not isinstance(corpus_id, str) or not STORE_ID_PATTERN.match(corpus_id):
+        return jsonify({'error': 'corpus must be 1-64 letters, digits, underscores or hyphens'}), 400
+    corpus = get_idf_corpus(corpus_id)
+    if not corpus.exists():
+        return jsonify({'error': f"Corpus '{corpus_id}' not found"}), 404
+    try:
+        from idf_corpus import score_keywords
+        artifacts = model_registry.get()
+        idf = corpus.idf(artifacts.feature_names)
+        return jsonify(score_keywords(artifacts, idf, custom_text)), 200
+    except Exception as e:
+        return jsonify({"error": "Keyword extraction failed", "details": str(e)}), 500
+
+@app.route('/idf_corpus/<corpus_id>', methods=['GET'])
+def idf_corpus_stats(corpus_id):
+    """API endpoint reporting the size of a registered IDF corpus."""
+    if not STORE_ID_PATTERN.match(corpus_id):
+        return jsonify({'error': 'Invalid corpus name'}), 400
+    corpus = get_idf_corpus(corpus_id)
+    if not corpus.exists():
+        return jsonify({'error': f"Corpus '{corpus_id}' not found"}), 404
+    return jsonify(corpus.stats()), 200
+
+@app.route('/idf_corpus/<corpus_id>/documents', methods=['POST'])
+def idf_corpus_add(corpus_id):
+    """API endpoint registering documents ({"docs": [{"id", "text"}]}) in an IDF corpus.
+
+    A document with an id that is already registered replaces the earlier one.
+    """
+    if not STORE_ID_PATTERN.match(corpus_id):
+        return jsonify({'error': 'Invalid corpus name'}), 400
+    data = request.get_json()
+    docs = data.get('docs') if data else None
+    if not isinstance(docs, list) or not all(isinstance(doc, dict) and 'id' in doc and isinstance(doc.get('text'), str) for doc in docs):
+        return jsonify({'error': 'docs must be a list of {"id", "text"} objects'}), 400
 
-    return jsonify(keywords), 200
+    try:
+        corpus = get_idf_corpus(corpus_id)
+        added = corpus.add_documents(model_registry.get(), [(doc['id'], doc['text']) for doc in docs])
+        return jsonify({'added': added, **corpus.stats()}), 200
+    except Exception as e:
+        return jsonify({"error": "Error registering documents", "details": str(e)}), 500
+
+@app.route('/idf_corpus/<corpus_id>/documents/<doc_id>', methods=['DELETE'])
+def idf_corpus_remove(corpus_id, doc_id):
+    """API endpoint removing one document from an IDF corpus."""
+    if not STORE_ID_PATTERN.match(corpus_id):
+        return jsonify({'error': 'Invalid corpus name'}), 400
+    corpus = get_idf_corpus(corpus_id)
+    if not corpus.exists():
+        return jsonify({'error': f"Corpus '{corpus_id}' not found"}), 404
+    try:
+        if not corpus.remove_document(doc_id):
+            return jsonify({'error': f"Document '{doc_id}' is not in corpus '{corpus_id}'"}), 404
+        return jsonify(corpus.stats()), 200
+    except Exception as e:
+        return jsonify({"error": "Error removing document", "details": str(e)}), 500
 
 @app.route('/extract_keywords', methods=['POST'])
 def extract_keywords_keybert():
@@ -67,21 +224,62 @@ def extract_keywords_keybert():
     top_n = data.get('keywords', 10)  # Default value is 50 if top_n is not provided
 
     try:
-        # Extract keywords using KeyBERT with the dynamic top_n
-        keywords = kw_model.extract_keywords(doc, keyphrase_ngram_range=(1, 1), stop_words=None, top_n=top_n)
+        # Extract keywords using KeyBERT with the dynamic top_n (cached by text and parameters)
+        keywords = get_keyword_engine().extract([doc], top_n=top_n)[0][0]
 
         return jsonify({'keywords': keywords}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Function to extract keywords using KeyBERT
-def extract_keywords_from_text(text):
-    keywords = kw_model.extract_keywords(text, keyphrase_ngram_range=(1, 1), stop_words=None, top_n=50)
-    return [kw[0] for kw in keywords]  # Return only the keyword, not the score
+@app.route('/extract_keywords/batch', methods=['POST'])
+def extract_keywords_batch():
+    """API endpoint extracting keywords for many texts, streamed back as NDJSON.
+
+    The body is either JSON ({"texts": [...]}) or, for large batches, NDJSON with one
+    text (a string or {"id", "text"}) per line, read as it arrives. Query parameters:
+    method (keybert, tfidf or both), keywords (top n) and batch_size.
+    """
+    from keyword_batch import METHODS, KEYWORD_BATCH_SIZE, iter_json_items, iter_ndjson_items, stream_keywords
+
+    method = request.args.get('method', 'keybert')
+    if method not in METHODS:
+        return jsonify({'error': f"method must be one of {', '.join(METHODS)}"}), 400
+    try:
+        top_n = int(request.args.get('keywords', 10))
+        batch_size = int(request.args.get('batch_size', KEYWORD_BATCH_SIZE))
+    except ValueError:
+        return jsonify({'error': 'keywords and batch_size must be integers'}), 400
+    if not 1 <= top_n <= 100 or not 1 <= batch_size <= 256:
+        return jsonify({'error': 'keywords must be 1-100 and batch_size 1-256'}), 400
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        items = iter_ndjson_items(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('texts'), list):
+            return jsonify({'error': 'No valid texts provided'}), 400
+        items = iter_json_items(data['texts'])
+
+    try:
+        keyword_engine = get_keyword_engine() if method in ('keybert', 'both') else None
+        artifacts = model_registry.get() if method in ('tfidf', 'both') else None
+    except Exception as e:
+        return jsonify({"error": "Error loading keyword models", "details": str(e)}), 500
+
+    lines = stream_keywords(items, method, top_n, keyword_engine, artifacts, batch_size)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+
+@app.route('/keyword_cache/stats', methods=['GET'])
+def keyword_cache_stats():
+    """API endpoint reporting hit rates and memory use of the keyword cache."""
+    return jsonify(keyword_cache.stats()), 200
 
 # Function to calculate similarity between documents using cosine similarity
 def calculate_similarity(doc_keywords):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
     # Create a TF-IDF vectorizer for the keyword lists
     tfidf_vectorizer = TfidfVectorizer()
     
@@ -104,9 +302,18 @@ def generate_similarity_description(similarity_matrix, docs):
 
     return descriptions
 
+# Largest top_k accepted by the sparse /compare_documents mode
+MAX_COMPARE_TOP_K = 100
+
 @app.route('/compare_documents', methods=['POST'])
 def compare_documents():
-    """API to compare content similarity between two or more documents."""
+    """API to compare content similarity between two or more documents.
+
+    The response's metric field names the measure behind every similarity, including
+    the ones in similarity_descriptions: the default mode scores documents by cosine
+    similarity of TF-IDF vectors over their KeyBERT keywords ("tfidf_keywords_cosine"),
+    sparse mode by cosine similarity of their document embeddings ("embedding_cosine").
+    """
     data = request.get_json()
 
     if not data or 'docs' not in data:
@@ -117,9 +324,30 @@ def compare_documents():
     if len(docs) < 2:
         return jsonify({'error': 'At least two text fields are required to compare'}), 400
 
+    # Sparse mode: only each document's top_k neighbours and/or pairs above a threshold
+    if data.get('mode') == 'sparse':
+        top_k = data.get('top_k')
+        threshold = data.get('threshold')
+        if top_k is None and threshold is None:
+            return jsonify({'error': 'Sparse mode needs top_k and/or threshold'}), 400
+        try:
+            top_k = min(int(top_k), MAX_COMPARE_TOP_K) if top_k is not None else None
+            threshold = float(threshold) if threshold is not None else None
+        except (TypeError, ValueError):
+            return jsonify({'error': 'top_k must be an integer and threshold a number'}), 400
+        if top_k is not None and top_k < 1:
+            return jsonify({'error': 'top_k must be positive'}), 400
+
+        try:
+            return jsonify(compare_documents_sparse(docs, top_k, threshold)), 200
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
     try:
-        # Step 1: Extract keywords for each document
-        doc_keywords = [extract_keywords_from_text(doc) for doc in docs]
+        # Step 1: Extract keywords for all documents in one batched pass
+        from keyword_engine import embedding_similarity
+        keywords, doc_embeddings = get_keyword_engine().extract(docs, top_n=50)
+        doc_keywords = [[kw[0] for kw in doc_kw] for doc_kw in keywords]
 
         # Step 2: Calculate similarity between the documents
         similarity_matrix = calculate_similarity([" ".join(kw) for kw in doc_keywords])
@@ -127,18 +355,103 @@ def compare_documents():
         # Step 3: Generate textual descriptions of similarity
         similarity_descriptions = generate_similarity_description(similarity_matrix, docs)
 
-        # Step 4: Prepare the response
+        # Step 4: Prepare the response, including the direct embedding similarity
         return jsonify({
+            'metric': 'tfidf_keywords_cosine',
             'similarity_matrix': similarity_matrix.tolist(),
+            'embedding_similarity_matrix': embedding_similarity(doc_embeddings).tolist(),
             'similarity_descriptions': similarity_descriptions
         }), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Sparse comparison for large collections: document embeddings are compared block by
+# block, and only the returned pairs are described, so nothing grows as N x N
+def compare_documents_sparse(docs, top_k, threshold):
+    from keyword_engine import sparse_neighbors
+    doc_embeddings = get_keyword_engine().embed_documents(docs)
+    pairs = sparse_neighbors(doc_embeddings, top_k=top_k, threshold=threshold)
+
+    return {
+        'mode': 'sparse',
+        'metric': 'embedding_cosine',
+        'pairs': [
+            {'source': i, 'target': j, 'similarity': round(similarity, 4)}
+            for i, j, similarity in pairs
+        ],
+        'similarity_descriptions': [
+            f"Text {i+1} and Text {j+1} have a similarity of {round(similarity * 100, 2)}%."
+            for i, j, similarity in pairs
+        ]
+    }
+
+# Stored MinHash corpora, loaded on first use and kept for the life of the process
+MINHASH_CORPUS_DIR = os.getenv("MINHASH_CORPUS_DIR", "minhash_corpora")
+minhash_corpora = {}
+minhash_corpora_lock = threading.Lock()
+
+def get_minhash_corpus(corpus_id):
+    from near_duplicates import MinHashIndex
+    with minhash_corpora_lock:
+        if corpus_id not in minhash_corpora:
+            minhash_corpora[corpus_id] = MinHashIndex(os.path.join(MINHASH_CORPUS_DIR, corpus_id))
+        return minhash_corpora[corpus_id]
+
+@app.route('/near_duplicates', methods=['POST'])
+def near_duplicates():
+    """API to flag near-verbatim copies among documents using MinHash and LSH.
+
+    With a corpus name, documents are also checked against every submission stored in that
+    corpus and (unless store is false) added to it for later checks.
+    """
+    from near_duplicates import find_near_duplicates
+    data = request.get_json()
+
+    if not data or 'docs' not in data:
+        return jsonify({'error': 'No valid texts are provided'}), 400
+
+    docs = data['docs']
+    corpus_id = data.get('corpus')
+    store = data.get('store', True)
+    ids = data.get('ids')
+
+    if not isinstance(docs, list) or not all(isinstance(doc, str) for doc in docs):
+        return jsonify({'error': 'docs must be a list of strings'}), 400
+    if ids is not None and not isinstance(ids, list):
+        return jsonify({'error': 'ids must be a list'}), 400
+
+    if ids is None:
+        if corpus_id and store:
+            return jsonify({'error': 'ids are required when storing documents in a corpus'}), 400
+        ids = [f"Text {i+1}" for i in range(len(docs))]
+    if len(ids) != len(docs) or len(set(ids)) != len(ids):
+        return jsonify({'error': 'Provide one unique id per document'}), 400
+    ids = [str(doc_id) for doc_id in ids]
+
+    if corpus_id is not None and not STORE_ID_PATTERN.match(str(corpus_id)):
+        return jsonify({'error': "Invalid corpus name. Use 1-64 letters, digits, '_' or '-'."}), 400
+
+    try:
+        threshold = float(data.get('threshold', 0.8))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'threshold must be a number'}), 400
+
+    try:
+        corpus = get_minhash_corpus(corpus_id) if corpus_id else None
+        pairs, clusters, unsigned = find_near_duplicates(ids, docs, threshold, corpus=corpus, store=bool(store))
+
+        # Documents without any words are not compared (or stored); they are listed as unsigned
+        return jsonify({'pairs': pairs, 'clusters': clusters, 'unsigned': unsigned}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/contact', methods=['POST'])
 def contact():
     try:
+        import resend
+
         # Get the data from the incoming request (assume JSON)
         data = request.get_json()
 
@@ -386,6 +699,9 @@ table, td {{ color: #000000; }} @media (max-width: 480px) {{ #u_content_heading_
         # Handle errors
         return jsonify({'error': 'An error occurred', 'details': str(e)}), 500
 
+startup_metrics.mark("app_imported")
+logging.info(f"Startup metrics: {startup_metrics.report()}")
+
 if __name__ == '__main__':
     app.run(debug=True, use_reloader=True)
 
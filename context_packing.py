@@ -0,0 +1,81 @@
+import re
+
+from langchain_core.documents import Document
+
+from embedding_dispatcher import estimate_tokens
+
+# Longest span the packer will consider as one unit, in estimated tokens
+MAX_SPAN_TOKENS = 200
+
+WORD_PATTERN = re.compile(r"\w{3,}")
+
+
+def count_tokens(text):
+    return estimate_tokens([text])
+
+
+def retrieve(vector_store, question_vector, k, fetch_k, lambda_mult):
+    """Top ``k`` chunks for a question by maximal marginal relevance.
+
+    ``fetch_k`` nearest chunks are re-ranked so near-duplicates (e.g. the overlap
+    between neighbouring chunks) do not crowd out other relevant passages.
+    Returns ``(document, distance)`` pairs, best first.
+    """
+    return vector_store.max_marginal_relevance_search_with_score_by_vector(
+        question_vector, k=k, fetch_k=max(fetch_k, k), lambda_mult=lambda_mult
+    )
+
+
+def split_spans(text):
+    """Split a chunk into paragraph spans, breaking long paragraphs on sentence boundaries."""
+    spans = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if count_tokens(paragraph) <= MAX_SPAN_TOKENS:
+            spans.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if current and count_tokens(current + " " + sentence) > MAX_SPAN_TOKENS:
+                spans.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            spans.append(current)
+    return spans
+
+
+def pack_context(scored_docs, question, token_budget):
+    """Fill ``token_budget`` with the best-scoring spans of the retrieved chunks.
+
+    A span scores by its chunk's retrieval relevance, weighted by how many of the
+    question's words it contains. Chosen spans are returned as one document per
+    chunk, in retrieval order and original reading order, with the chunk metadata.
+    Returns ``(documents, context_tokens)``.
+    """
+    question_words = set(WORD_PATTERN.findall(question.lower()))
+    candidates = []
+    for rank, (doc, distance) in enumerate(scored_docs):
+        relevance = 1.0 / (1.0 + float(distance))
+        for position, span in enumerate(split_spans(doc.page_content)):
+            span_words = set(WORD_PATTERN.findall(span.lower()))
+            overlap = len(question_words & span_words) / len(question_words) if question_words else 0.0
+            candidates.append((relevance * (0.5 + overlap), rank, position, span))
+
+    chosen = []
+    used = 0
+    for score, rank, position, span in sorted(candidates, key=lambda c: c[0], reverse=True):
+        tokens = count_tokens(span)
+        if used + tokens > token_budget:
+            continue
+        chosen.append((rank, position, span))
+        used += tokens
+
+    documents = []
+    for rank in sorted({rank for rank, _, _ in chosen}):
+        spans = [span for r, _, span in sorted(chosen) if r == rank]
+        documents.append(Document(page_content="\n\n".join(spans), metadata=scored_docs[rank][0].metadata))
+    return documents, used
@@ -0,0 +1,305 @@
+import os
+import json
+import fcntl
+import hashlib
+import logging
+import threading
+import uuid
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+VECTORS_FILE = "vectors.f32"
+JOURNAL_FILE = "index.jsonl"
+LOCK_FILE = ".lock"
+
+# When the cache goes over budget it is compacted down to this fraction of it,
+# so eviction (which rewrites the vector file) does not run on every insert
+EVICT_TO_FRACTION = 0.9
+
+# The journal is rewritten once it holds this many records per cached row (plus some
+# slack), so recency records from busy readers do not grow it without bound
+JOURNAL_COMPACT_RATIO = 4
+JOURNAL_COMPACT_SLACK = 1000
+
+
+def cache_key(model_name, kind, text):
+    """Content hash identifying one embedding: model, document/query, and chunk text."""
+    digest = hashlib.sha256()
+    for part in (model_name, kind, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache: a memory-mapped float32 matrix plus an append-only key journal.
+
+    ``vectors.f32`` holds one row per cached embedding. ``index.jsonl`` starts with a
+    header naming the vector size and a generation id, followed by one record per new
+    row (key, row, last-used tick) and per recency update (key, tick). Writers hold an
+    exclusive file lock and only append, so a put costs the size of what it adds; the
+    recency ticks ``get_many`` records are flushed in the same append, which lets every
+    process evict in the same order. Eviction, and a journal grown long with recency
+    records, rewrite the files under a new generation, and readers then reload in full.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._dim = None
+        self._rows = {}
+        self._last_used = {}
+        self._touched = {}
+        self._tick = 0
+        self._vectors = None
+        self._generation = None
+        self._journal_stat = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._refresh()
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.directory, VECTORS_FILE)
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.directory, JOURNAL_FILE)
+
+    def _file_lock(self):
+        return open(os.path.join(self.directory, LOCK_FILE), "w")
+
+    def _refresh(self, locked=False):
+        """Replay journal records other processes appended, re-mapping the vectors if rows changed.
+
+        ``locked`` says the caller already holds the exclusive file lock; otherwise a shared
+        lock keeps a concurrent compaction from swapping the files mid-read.
+        """
+        try:
+            st = os.stat(self._journal_path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_size) == self._journal_stat:
+            return
+        if locked:
+            self._replay()
+            return
+        with self._file_lock() as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            self._replay()
+
+    def _replay(self):
+        row_count = len(self._rows)
+        with open(self._journal_path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["generation"] != self._generation:
+                # Rewritten by a compaction: rows were renumbered, so start over
+                self._dim = header["dim"]
+                self._generation = header["generation"]
+                self._rows = {}
+                self._last_used = {}
+                self._journal_records = 0
+                row_count = -1
+                self._journal_offset = f.tell()
+            f.seek(self._journal_offset)
+            data = f.read()
+            inode = os.fstat(f.fileno()).st_ino
+
+        # A trailing record without its newline belongs to a writer that is still (or was,
+        # before crashing) appending; it is read once complete
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            self._apply(json.loads(line))
+        self._journal_offset += len(complete)
+        self._journal_stat = (inode, self._journal_offset)
+
+        # Recency this process recorded but has not written yet still counts
+        for key, tick in self._touched.items():
+            if key in self._last_used:
+                self._last_used[key] = max(self._last_used[key], tick)
+        if len(self._rows) != row_count:
+            self._vectors = self._map_vectors()
+
+    def _apply(self, record):
+        key, tick = record["key"], record["tick"]
+        if "row" in record:
+            self._rows[key] = record["row"]
+        elif key not in self._rows:
+            return
+        self._last_used[key] = max(self._last_used.get(key, 0), tick)
+        self._tick = max(self._tick, tick)
+        self._journal_records += 1
+
+    def _map_vectors(self):
+        if not self._rows or not os.path.exists(self._vectors_path):
+            return None
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self._dim))
+
+    def _append_journal(self, records):
+        if self._generation is None:
+            self._write_journal([])
+        with open(self._journal_path, "ab") as f:
+            # Drop a partial record a crashed writer left behind
+            f.truncate(self._journal_offset)
+            f.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+            self._journal_offset = f.tell()
+            self._journal_stat = (os.fstat(f.fileno()).st_ino, self._journal_offset)
+        self._journal_records += len(records)
+
+    def _write_journal(self, records):
+        """Publish a fresh journal under a new generation, so readers reload it in full."""
+        self._generation = uuid.uuid4().hex
+        tmp_path = f"{self._journal_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps({"dim": self._dim, "generation": self._generation}).encode("utf-8") + b"\n")
+            f.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._journal_path)
+        st = os.stat(self._journal_path)
+        self._journal_offset = st.st_size
+        self._journal_stat = (st.st_ino, st.st_size)
+        self._journal_records = len(records)
+
+    def _compact_journal(self):
+        self._write_journal([
+            {"key": key, "row": row, "tick": self._last_used[key]}
+            for key, row in sorted(self._rows.items(), key=lambda item: item[1])
+        ])
+
+    def get_many(self, keys):
+        """Return ``{key: vector}`` for the keys that are cached."""
+        found = {}
+        with self._lock:
+            self._refresh()
+            for key in keys:
+                row = self._rows.get(key)
+                if row is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                self._tick += 1
+                self._last_used[key] = self._tick
+                self._touched[key] = self._tick
+                found[key] = np.array(self._vectors[row])
+        return found
+
+    def put_many(self, items):
+        """Store ``(key, vector)`` pairs, evicting least recently used rows if over budget."""
+        items = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        if not items:
+            return
+
+        with self._lock, self._file_lock() as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh(locked=True)
+            new_items = [(key, vector) for key, vector in dict(items).items() if key not in self._rows]
+            if not new_items:
+                return
+            if self._dim is None:
+                self._dim = len(new_items[0][1])
+
+            records = [
+                {"key": key, "tick": self._last_used[key]}
+                for key in self._touched if key in self._rows
+            ]
+            self._touched = {}
+
+            # Rows are append-only; the journal only names them once they are on disk
+            self._vectors = None
+            with open(self._vectors_path, "ab") as f:
+                # Drop rows a crashed writer appended but never recorded in the journal
+                f.truncate(len(self._rows) * self._dim * 4)
+                for key, vector in new_items:
+                    f.write(vector.tobytes())
+                    self._rows[key] = len(self._rows)
+                    self._tick += 1
+                    self._last_used[key] = self._tick
+                    records.append({"key": key, "row": self._rows[key], "tick": self._tick})
+                f.flush()
+                os.fsync(f.fileno())
+
+            if len(self._rows) * self._dim * 4 > self.max_bytes:
+                self._evict()
+                self._compact_journal()
+            elif self._journal_records + len(records) > JOURNAL_COMPACT_RATIO * len(self._rows) + JOURNAL_COMPACT_SLACK:
+                self._compact_journal()
+            else:
+                self._append_journal(records)
+            self._vectors = self._map_vectors()
+
+    def _evict(self):
+        """Compact the vector file, keeping only the most recently used rows."""
+        keep_count = int(self.max_bytes * EVICT_TO_FRACTION) // (self._dim * 4)
+        keep = sorted(self._rows, key=self._last_used.__getitem__, reverse=True)[:keep_count]
+        old = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self._dim))
+
+        tmp_path = f"{self._vectors_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            for key in keep:
+                f.write(old[self._rows[key]].tobytes())
+        del old
+        os.replace(tmp_path, self._vectors_path)
+
+        self.evictions += len(self._rows) - len(keep)
+        self._rows = {key: row for row, key in enumerate(keep)}
+        self._last_used = {key: self._last_used[key] for key in keep}
+        logging.info(f"Embedding cache compacted to {len(keep)} entries")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._rows),
+                "bytes": len(self._rows) * (self._dim or 0) * 4,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves chunks and queries from an ``EmbeddingCache`` first."""
+
+    def __init__(self, embeddings, cache, model_name):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def _embed(self, kind, texts, embed_missing):
+        keys = [cache_key(self.model_name, kind, text) for text in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = embed_missing(list(missing.values()))
+            new_items = list(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            found.update((key, np.asarray(vector, dtype=np.float32)) for key, vector in new_items)
+
+        return [found[key].tolist() for key in keys]
+
+    def cached_documents(self, texts):
+        """Cached document vectors for ``texts`` (``None`` where not cached); nothing is embedded."""
+        keys = [cache_key(self.model_name, "document", text) for text in texts]
+        found = self.cache.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
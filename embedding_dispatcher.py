@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+# HTTP statuses and exception class names worth retrying (rate limits, overloads, timeouts)
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "TooManyRequests", "GatewayTimeout",
+}
+
+
+def is_transient(error):
+    """True if ``error`` (or an exception it wraps) looks like a temporary failure."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+            return True
+        if isinstance(error, urllib.error.URLError) and not isinstance(error, urllib.error.HTTPError):
+            return True
+        code = getattr(error, "code", None)
+        if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+            return True
+        if any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+# Rough token count used for rate limiting (about four characters per token)
+def estimate_tokens(texts):
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class TokenBucket:
+    """Tokens-per-minute limiter shared by every batch in flight."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        # A batch larger than the whole budget waits for a full bucket instead of forever
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingDispatcher(Embeddings):
+    """Embed documents in fixed-size batches, a bounded number at a time, with retries.
+
+    Each batch is retried on its own with exponential backoff and jitter, so one
+    rate-limited request does not restart the whole upload. ``tokens_per_minute``
+    (0 disables it) throttles batches before they are sent.
+    """
+
+    def __init__(self, embeddings, batch_size=100, max_concurrency=4, tokens_per_minute=0,
+                 max_retries=5, backoff_seconds=1.0):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self._bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+
+    def _with_retries(self, call, texts):
+        for attempt in range(self.max_retries + 1):
+            if self._bucket is not None:
+                self._bucket.acquire(estimate_tokens(texts))
+            try:
+                return call(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_transient(e):
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logging.warning(f"Embedding batch of {len(texts)} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        futures = [
+            self._executor.submit(self._with_retries, self.embeddings.embed_documents, batch)
+            for batch in batches
+        ]
+        vectors = []
+        for future in futures:
+            vectors.extend(future.result())
+        return vectors
+
+    def embed_query(self, text):
+        return self._with_retries(lambda texts: self.embeddings.embed_query(texts[0]), [text])
+
+
+class HttpEmbeddings(Embeddings):
+    """Client for a plain JSON embedding server (see fake_embedding_server.py).
+
+    POST ``{"texts": [...], "kind": "document" | "query"}`` to ``url`` and read
+    back ``{"embeddings": [[...], ...]}``.
+    """
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, texts, kind):
+        body = json.dumps({"texts": texts, "kind": kind}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.load(response)["embeddings"]
+
+    def embed_documents(self, texts):
+        return self._post(texts, "document")
+
+    def embed_query(self, text):
+        return self._post([text], "query")[0]
+
+
+# Offline throughput benchmark against a local embedding server, e.g.
+#   python fake_embedding_server.py --port 8765 &
+#   python embedding_dispatcher.py --url http://127.0.0.1:8765/embed --texts 5000
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the embedding dispatcher against an HTTP embedding server")
+    parser.add_argument("--url", required=True)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--chars", type=int, default=2000, help="characters per text")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("EMBEDDING_BATCH_SIZE", "100")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4")))
+    parser.add_argument("--tokens-per-minute", type=int, default=int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "0")))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    texts = [f"chunk {i} " + "x" * args.chars for i in range(args.texts)]
+    dispatcher = EmbeddingDispatcher(
+        HttpEmbeddings(args.url), batch_size=args.batch_size,
+        max_concurrency=args.concurrency, tokens_per_minute=args.tokens_per_minute
+    )
+
+    start = time.perf_counter()
+    vectors = dispatcher.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    if len(vectors) != len(texts):
+        sys.exit(f"Expected {len(texts)} vectors, got {len(vectors)}")
+    print(f"Embedded {len(texts)} texts in {elapsed:.2f}s ({len(texts) / elapsed:.1f} texts/s)")
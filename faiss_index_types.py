@@ -0,0 +1,231 @@
+import os
+import json
+import math
+import pickle
+import logging
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+# Index type for new and growing collections: auto, flat (exact), hnsw (low-latency
+# graph search) or ivfpq (compressed inverted lists for large corpora)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "auto")
+
+# Vector counts at which "auto" moves from flat to HNSW and from HNSW to IVF-PQ
+FLAT_MAX_VECTORS = int(os.getenv("FAISS_FLAT_MAX_VECTORS", "20000"))
+HNSW_MAX_VECTORS = int(os.getenv("FAISS_HNSW_MAX_VECTORS", "1000000"))
+
+# IVF-PQ needs enough vectors to train its coarse and product quantizers
+IVFPQ_MIN_VECTORS = 10000
+
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+
+# Vectors sampled to train IVF-PQ (per inverted list)
+IVF_TRAINING_POINTS_PER_LIST = 64
+
+
+def choose_index_type(n_vectors):
+    if FAISS_INDEX_TYPE != "auto":
+        if FAISS_INDEX_TYPE == "ivfpq" and n_vectors < IVFPQ_MIN_VECTORS:
+            return "flat"
+        return FAISS_INDEX_TYPE
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivfpq"
+
+
+def index_type_of(index):
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+def ivf_list_count(n_vectors):
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def pq_subquantizers(dim):
+    """Largest divisor of ``dim`` giving at least 8 dimensions per PQ sub-vector."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(vectors, index_type):
+    """Build (and, for IVF-PQ, train) a FAISS index of ``index_type`` holding ``vectors``."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif index_type == "ivfpq":
+        nlist = ivf_list_count(n_vectors)
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, pq_subquantizers(dim), 8)
+        sample_size = min(n_vectors, nlist * IVF_TRAINING_POINTS_PER_LIST)
+        sample = vectors[np.random.default_rng(0).choice(n_vectors, sample_size, replace=False)]
+        logging.info(f"Training IVF-PQ index ({nlist} lists) on {sample_size} vectors")
+        index.train(sample)
+        index.nprobe = IVF_NPROBE
+        # Saved with the index, so MMR retrieval can reconstruct vectors from a read-only mapping
+        index.make_direct_map()
+    elif index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    else:
+        raise ValueError(f"Unknown FAISS index type '{index_type}'. Use auto, flat, hnsw or ivfpq.")
+
+    if n_vectors:
+        index.add(vectors)
+    return index
+
+
+def reconstruct_all(index):
+    """Read every stored vector back out of an index (lossy for IVF-PQ)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def stored_vectors(vector_store):
+    """Every vector of the store in index order, at full precision wherever possible.
+
+    Flat and HNSW indexes hold the vectors as added. IVF-PQ only keeps compressed codes,
+    so chunk embeddings are taken from the store's embedding cache instead (if its
+    embeddings have ``cached_documents``, as ``CachedEmbeddings`` does). Chunks the cache
+    no longer holds are reconstructed from their codes and keep the quantization error.
+    """
+    vectors = reconstruct_all(vector_store.index)
+    lookup = getattr(vector_store.embedding_function, "cached_documents", None)
+    if index_type_of(vector_store.index) != "ivfpq" or lookup is None or not len(vectors):
+        return vectors
+
+    texts = [vector_store.docstore.search(vector_store.index_to_docstore_id[position]).page_content
+             for position in range(len(vectors))]
+    missing = 0
+    for position, vector in enumerate(lookup(texts)):
+        if vector is None:
+            missing += 1
+        else:
+            vectors[position] = vector
+    if missing:
+        logging.info(f"{missing} of {len(vectors)} IVF-PQ vectors were not cached; using their lossy reconstructions")
+    return vectors
+
+
+def needs_rebuild(index):
+    """True if the index type no longer suits its size (or IVF lists have grown too long)."""
+    wanted = choose_index_type(index.ntotal)
+    if wanted != index_type_of(index):
+        return True
+    return wanted == "ivfpq" and ivf_list_count(index.ntotal) >= 2 * index.nlist
+
+
+def fit_index_to_size(vector_store):
+    """Rebuild the store's index in place when its vector count calls for another type.
+
+    Vectors come from ``stored_vectors``, so nothing is re-embedded and an IVF-PQ index
+    is retrained on the original embeddings rather than on its own lossy reconstructions.
+    """
+    if needs_rebuild(vector_store.index):
+        wanted = choose_index_type(vector_store.index.ntotal)
+        logging.info(
+            f"Rebuilding {index_type_of(vector_store.index)} index with "
+            f"{vector_store.index.ntotal} vectors as {wanted}"
+        )
+        vector_store.index = build_index(stored_vectors(vector_store), wanted)
+    return vector_store
+
+
+def delete_chunks(vector_store, chunk_ids):
+    """Delete chunks by docstore id.
+
+    Only flat indexes renumber their vectors on ``remove_ids`` the way the LangChain
+    store expects; HNSW cannot remove at all and IVF keeps gaps in its labels. Those
+    are refilled from their remaining vectors (see ``stored_vectors``), keeping the
+    trained quantizers.
+    """
+    if index_type_of(vector_store.index) == "flat":
+        vector_store.delete(chunk_ids)
+        return
+
+    removed = set(chunk_ids)
+    positions = sorted(vector_store.index_to_docstore_id)
+    keep = [position for position in positions if vector_store.index_to_docstore_id[position] not in removed]
+    vectors = stored_vectors(vector_store)[keep]
+    kept_ids = [vector_store.index_to_docstore_id[position] for position in keep]
+
+    index = faiss.clone_index(vector_store.index)
+    index.reset()
+    if len(vectors):
+        index.add(vectors)
+    vector_store.index = index
+    vector_store.index_to_docstore_id = dict(enumerate(kept_ids))
+    vector_store.docstore.delete(list(removed))
+
+
+# Sidecar file mapping each doc_id to the docstore ids of its chunks
+DOC_CHUNKS_FILE = "doc_chunks.json"
+
+
+def doc_chunk_map(vector_store):
+    """``{doc_id: [chunk ids]}`` for the store, kept on it and updated with every add or delete.
+
+    Stores saved before the map existed get it built once from their docstore.
+    """
+    doc_chunks = getattr(vector_store, "doc_chunks", None)
+    if doc_chunks is None:
+        doc_chunks = {}
+        for docstore_id in vector_store.index_to_docstore_id.values():
+            doc = vector_store.docstore.search(docstore_id)
+            doc_id = getattr(doc, "metadata", {}).get("doc_id")
+            if doc_id is not None:
+                doc_chunks.setdefault(doc_id, []).append(docstore_id)
+        vector_store.doc_chunks = doc_chunks
+    return doc_chunks
+
+
+def save_store(vector_store, path):
+    """``save_local`` plus the doc_id -> chunk ids map."""
+    vector_store.save_local(path)
+    with open(os.path.join(path, DOC_CHUNKS_FILE), "w") as f:
+        json.dump(doc_chunk_map(vector_store), f)
+
+
+def load_store(path, embeddings, mmap=True):
+    """Load a store saved with ``save_local``, memory-mapping the index where FAISS supports it.
+
+    IVF inverted lists are mapped straight from ``index.faiss``, so a large compressed
+    corpus opens quickly and only the pages that searches touch become resident.
+    A mapped index refers to its file, so load with ``mmap=False`` to get a copy to modify.
+    """
+    index_path = os.path.join(path, "index.faiss")
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = None
+    if index is None:
+        index = faiss.read_index(index_path)
+
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    store = FAISS(embeddings, index, docstore, index_to_docstore_id)
+    doc_chunks_path = os.path.join(path, DOC_CHUNKS_FILE)
+    if os.path.exists(doc_chunks_path):
+        with open(doc_chunks_path) as f:
+            store.doc_chunks = json.load(f)
+    return store
@@ -0,0 +1,41 @@
+import os
+import time
+import random
+import hashlib
+import argparse
+
+import numpy as np
+from flask import Flask, request, jsonify
+
+# Local stand-in for the embedding API, used to benchmark ingestion offline.
+# Vectors are deterministic per text, so cache and index behaviour is reproducible.
+app = Flask(__name__)
+
+EMBEDDING_DIM = int(os.getenv("FAKE_EMBEDDING_DIM", "768"))
+LATENCY_MS = float(os.getenv("FAKE_EMBEDDING_LATENCY_MS", "50"))
+FAILURE_RATE = float(os.getenv("FAKE_EMBEDDING_FAILURE_RATE", "0"))
+
+def fake_embedding(text, kind):
+    seed = int.from_bytes(hashlib.sha256(f"{kind}\0{text}".encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+@app.route('/embed', methods=['POST'])
+def embed():
+    data = request.get_json()
+    if not data or 'texts' not in data:
+        return jsonify({'error': 'texts is required'}), 400
+
+    # Simulate rate limiting so the dispatcher's retries can be exercised
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return jsonify({'error': 'Too many requests'}), 429
+
+    time.sleep(LATENCY_MS / 1000.0)
+    kind = data.get('kind', 'document')
+    return jsonify({'embeddings': [fake_embedding(text, kind) for text in data['texts']]}), 200
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a fake embedding server")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    app.run(host="127.0.0.1", port=args.port, threaded=True)
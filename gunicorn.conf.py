@@ -0,0 +1,27 @@
+import os
+import sys
+import logging
+
+# Gunicorn settings (see Procfile). With PRELOAD_MODELS=1 the app, and with it the MiniLM
+# weights and the RAG stack, is imported once in the master and shared by forked workers.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+preload_app = os.getenv("PRELOAD_MODELS") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Intra-op threads per worker for the sentence-transformer; several workers each using
+# every core would only contend for the CPU
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))
+
+
+def post_fork(server, worker):
+    torch = sys.modules.get("torch")
+    if torch is not None and TORCH_THREADS_PER_WORKER > 0:
+        torch.set_num_threads(TORCH_THREADS_PER_WORKER)
+
+
+def post_worker_init(worker):
+    startup_metrics = sys.modules.get("startup_metrics")
+    if startup_metrics is not None:
+        startup_metrics.mark("worker_ready")
+        logging.getLogger("gunicorn.error").info(f"Worker startup metrics: {startup_metrics.report()}")
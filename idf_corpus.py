@@ -0,0 +1,199 @@
+import os
+import json
+import math
+import uuid
+import fcntl
+import logging
+import threading
+from collections import Counter
+
+import numpy as np
+
+from keyword_extractor import TOP_N_KEYWORDS, preprocess_text
+
+JOURNAL_FILE = "journal.jsonl"
+LOCK_FILE = ".lock"
+
+# Rewrite the journal once it holds this many times more entries than live documents
+COMPACT_RATIO = 2
+
+
+class IdfCorpus:
+    """Reference documents for TF-IDF keyword scoring, with incrementally maintained IDF.
+
+    Each document is kept as the set of model vocabulary terms it contains; document
+    frequencies are a sparse term -> count map updated by the terms of each added or
+    removed document. Changes are appended to ``journal.jsonl`` under a file lock, and
+    every process replays only the entries appended since it last read the journal,
+    so gunicorn workers converge without reloading the whole corpus. Compaction
+    rewrites the journal under a new generation id, which makes readers start over.
+
+    Terms are stored as words, not vocabulary columns, so the corpus survives a
+    retrained vectorizer; words the new vocabulary lacks are ignored when scoring.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._documents = {}        # doc_id -> tuple of terms
+        self._df = Counter()
+        self._journal_entries = 0
+        self._offset = 0
+        self._generation = None     # id in the journal's header line, new on every rewrite
+        self._stat = None
+        self._version = 0
+        self._idf_cache = None      # (version, feature_names, idf vector)
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.directory, JOURNAL_FILE)
+
+    def exists(self):
+        """Whether any document was ever registered, i.e. the journal has been created."""
+        return os.path.exists(self._journal_path)
+
+    def _apply(self, entry):
+        previous = self._documents.pop(entry["id"], None)
+        if previous is not None:
+            self._df.subtract(previous)
+            for term in previous:
+                if self._df[term] <= 0:
+                    del self._df[term]
+        if entry["op"] == "add":
+            terms = tuple(entry["terms"])
+            self._documents[entry["id"]] = terms
+            self._df.update(terms)
+        self._journal_entries += 1
+        self._version += 1
+
+    def _refresh(self):
+        """Replay journal entries written since the last read (by this or another process)."""
+        try:
+            stat = os.stat(self._journal_path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if signature == self._stat:
+            return
+        with open(self._journal_path, "rb") as f:
+            header = f.readline()
+            if not header.endswith(b"\n"):
+                return  # Journal still being created
+            generation = json.loads(header)["generation"]
+            if generation != self._generation:
+                # New or compacted journal: start over from the beginning
+                self._documents, self._df = {}, Counter()
+                self._journal_entries = 0
+                self._offset = len(header)
+                self._generation = generation
+                self._version += 1
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Entry still being written
+                self._apply(json.loads(line))
+                self._offset += len(line)
+        self._stat = signature
+
+    def _header(self):
+        return (json.dumps({"generation": uuid.uuid4().hex}) + "\n").encode("utf-8")
+
+    def _append(self, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, LOCK_FILE), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._refresh()
+            with open(self._journal_path, "ab") as f:
+                if f.tell() == 0:
+                    f.write(self._header())
+                for entry in entries:
+                    f.write((json.dumps(entry) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            if self._journal_entries > COMPACT_RATIO * max(len(self._documents), 1):
+                self._compact()
+
+    def _compact(self):
+        tmp_path = f"{self._journal_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            f.write(self._header())
+            for doc_id, terms in self._documents.items():
+                f.write((json.dumps({"op": "add", "id": doc_id, "terms": list(terms)}) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._journal_path)
+        # Replaying the rewritten journal rebuilds the same state
+        self._refresh()
+        logging.info(f"IDF corpus {self.directory} compacted to {len(self._documents)} documents")
+
+    def add_documents(self, artifacts, documents):
+        """Add or replace ``(doc_id, text)`` pairs; costs only the length of the new texts."""
+        counts = artifacts.cv.transform([preprocess_text(text) for _, text in documents]).tocsr()
+        entries = []
+        for row, (doc_id, _) in enumerate(documents):
+            columns = counts.indices[counts.indptr[row]:counts.indptr[row + 1]]
+            entries.append({"op": "add", "id": str(doc_id), "terms": sorted(map(str, artifacts.feature_names[columns]))})
+        self._append(entries)
+        return len(entries)
+
+    def remove_document(self, doc_id):
+        """Remove a document; returns False if it was not registered."""
+        with self._lock:
+            self._refresh()
+            if str(doc_id) not in self._documents:
+                return False
+        self._append([{"op": "remove", "id": str(doc_id)}])
+        return True
+
+    def idf(self, feature_names):
+        """Smoothed IDF vector over ``feature_names``, as scikit-learn's TfidfTransformer computes it.
+
+        Rebuilt only after the corpus changed, never per scored text.
+        """
+        with self._lock:
+            self._refresh()
+            cached = self._idf_cache
+            if cached is not None and cached[0] == self._version and cached[1] is feature_names:
+                return cached[2]
+            n_documents = len(self._documents)
+            df = np.fromiter((self._df.get(word, 0) for word in feature_names), dtype=np.float64, count=len(feature_names))
+            idf = np.log((1 + n_documents) / (1 + df)) + 1
+            self._idf_cache = (self._version, feature_names, idf)
+            return idf
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {"documents": len(self._documents), "terms": len(self._df), "journal_entries": self._journal_entries}
+
+
+def score_keywords(artifacts, idf, text, top_n=TOP_N_KEYWORDS):
+    """Top TF-IDF keywords of ``text`` under a precomputed IDF vector.
+
+    Only the text's own non-zero terms are touched, so the cost does not depend on the
+    corpus size.
+    """
+    counts = artifacts.cv.transform([preprocess_text(text)]).tocsr()
+    columns = counts.indices
+    weights = counts.data * idf[columns]
+    norm = math.sqrt(float(np.dot(weights, weights)))
+    if norm == 0:
+        return {}
+    order = np.lexsort((-columns, -weights))[:top_n]
+    return {str(artifacts.feature_names[columns[i]]): round(float(weights[i] / norm), 3) for i in order}
+
+
+class IdfCorpusStore:
+    """Named IDF corpora under one root directory, opened once per process."""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._corpora = {}
+
+    def get(self, corpus_id):
+        with self._lock:
+            if corpus_id not in self._corpora:
+                self._corpora[corpus_id] = IdfCorpus(os.path.join(self.root, corpus_id))
+            return self._corpora[corpus_id]
@@ -0,0 +1,209 @@
+import os
+import fcntl
+import shutil
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from faiss_index_types import load_store, save_store
+from store_ids import STORE_ID_PATTERN
+
+# Name of the pointer file that records which version directory is live
+CURRENT_FILE = "CURRENT"
+
+# Held by the writer of a collection across processes for its whole read-modify-commit cycle
+LOCK_FILE = ".lock"
+
+# Number of published versions kept on disk (the live one plus its predecessor,
+# so a reader in another process that is mid-load never loses its files)
+KEEP_VERSIONS = 2
+
+
+class IndexManager:
+    """Keep a FAISS index resident in the process and publish new versions atomically.
+
+    Every version is written to its own directory under ``root``; the ``CURRENT``
+    pointer file is swapped with ``os.replace`` only once that directory is complete,
+    so readers never see a half-written index. Published stores are never mutated:
+    writers build (or copy) a store and hand it to ``commit``.
+    """
+
+    def __init__(self, root, embeddings_factory):
+        self.root = root
+        self._embeddings_factory = embeddings_factory
+        self._lock = threading.RLock()
+        # (store, version, resident_bytes) replaced as a whole so readers see a consistent triple
+        self._live = (None, None, 0)
+
+    def _read_current(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _load(self, version, mmap=True):
+        path = os.path.join(self.root, version)
+        logging.info(f"Loading FAISS index version {version} from {path}")
+        return load_store(path, self._embeddings_factory(), mmap=mmap)
+
+    def get(self):
+        """Return ``(store, version)`` for the live index, or ``(None, None)`` if there is none.
+
+        The index is only read from disk when the published version changes,
+        e.g. after a commit from another worker process.
+        """
+        version = self._read_current()
+        store, live_version, _ = self._live
+        if store is not None and version == live_version:
+            return store, version
+
+        with self._lock:
+            version = self._read_current()
+            if version is None:
+                return None, None
+            store, live_version, _ = self._live
+            if store is None or version != live_version:
+                store = self._load(version)
+                self._live = (store, version, self._version_bytes(version))
+            return store, version
+
+    @property
+    def resident_bytes(self):
+        """Approximate memory held by the resident index (its size on disk), 0 if unloaded."""
+        store, _, size = self._live
+        return size if store is not None else 0
+
+    def unload(self):
+        """Drop the resident index; requests already holding it keep their reference."""
+        with self._lock:
+            self._live = (None, None, 0)
+
+    def _version_bytes(self, version):
+        path = os.path.join(self.root, version)
+        return sum(
+            os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+        )
+
+    def commit(self, store):
+        """Persist ``store`` as a new version, publish it and make it the resident index."""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            version = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+            # Write the whole index into a scratch directory, then rename it into place
+            tmp_dir = os.path.join(self.root, f".tmp-{version}")
+            save_store(store, tmp_dir)
+            os.replace(tmp_dir, os.path.join(self.root, version))
+
+            # Swap the pointer file; os.replace is atomic on the same filesystem
+            tmp_pointer = os.path.join(self.root, f".{CURRENT_FILE}-{version}")
+            with open(tmp_pointer, "w") as f:
+                f.write(version)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_pointer, os.path.join(self.root, CURRENT_FILE))
+
+            self._live = (store, version, self._version_bytes(version))
+            self._prune()
+            return version
+
+    def update(self, apply):
+        """Copy-on-write update: ``apply`` receives a private copy of the live store
+        (or ``None`` if there is no index yet) and returns the store to publish.
+
+        Writers are serialised across threads and, through a file lock, across worker
+        processes, and always start from the latest published version, so concurrent
+        updates cannot drop each other's changes. Readers keep using the old store
+        until the commit.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, LOCK_FILE), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # The private copy is read fully into memory: a memory-mapped index refers to
+            # its version directory, which is pruned once newer versions are published
+            version = self._read_current()
+            store = self._load(version, mmap=False) if version is not None else None
+            new_store = apply(store)
+            if new_store is None:
+                return self._live[1]
+            return self.commit(new_store)
+
+    def _prune(self):
+        """Remove old version directories, keeping the newest ``KEEP_VERSIONS``."""
+        versions = sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and name != CURRENT_FILE
+            and os.path.isdir(os.path.join(self.root, name))
+        )
+        for name in versions[:-KEEP_VERSIONS]:
+            if name == self._live[1]:
+                continue
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+class IndexRegistry:
+    """One ``IndexManager`` per named collection, with an LRU of resident indexes.
+
+    Each collection lives in ``root/<collection_id>``. Loaded indexes are tracked in
+    least-recently-used order and the coldest ones are unloaded once their combined
+    size exceeds ``max_bytes``; they are read back from disk on their next use.
+    """
+
+    def __init__(self, root, embeddings_factory, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._embeddings_factory = embeddings_factory
+        self._lock = threading.Lock()
+        self._managers = {}
+        self._resident = OrderedDict()
+
+    def manager(self, collection_id):
+        if not STORE_ID_PATTERN.match(collection_id or ""):
+            raise ValueError(
+                f"Invalid collection id '{collection_id}': use 1-64 letters, digits, '_' or '-'"
+            )
+        with self._lock:
+            manager = self._managers.get(collection_id)
+            if manager is None:
+                manager = IndexManager(os.path.join(self.root, collection_id), self._embeddings_factory)
+                self._managers[collection_id] = manager
+            return manager
+
+    def get(self, collection_id):
+        manager = self.manager(collection_id)
+        result = manager.get()
+        self._touch(collection_id, manager)
+        return result
+
+    def update(self, collection_id, apply):
+        manager = self.manager(collection_id)
+        version = manager.update(apply)
+        self._touch(collection_id, manager)
+        return version
+
+    def _touch(self, collection_id, manager):
+        """Mark a collection as most recently used and evict cold ones over the byte budget."""
+        with self._lock:
+            if manager.resident_bytes:
+                self._resident[collection_id] = manager
+                self._resident.move_to_end(collection_id)
+            else:
+                self._resident.pop(collection_id, None)
+
+            total = sum(m.resident_bytes for m in self._resident.values())
+            while total > self.max_bytes and len(self._resident) > 1:
+                cold_id, cold = self._resident.popitem(last=False)
+                total -= cold.resident_bytes
+                cold.unload()
+                logging.info(f"Evicted FAISS index for collection '{cold_id}' from memory")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "resident_bytes": sum(m.resident_bytes for m in self._resident.values()),
+                "resident_collections": list(self._resident.keys()),
+            }
@@ -0,0 +1,242 @@
+import os
+import json
+import uuid
+import fcntl
+import queue
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime, timezone
+
+STATUS_FILE = "status.json"
+
+# Locked by the process that owns a queued or running job; the lock dies with the process
+LOCK_FILE = ".lock"
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class QueueFull(Exception):
+    """Raised when the ingestion queue is at capacity; callers should answer 429."""
+
+
+class IngestJob:
+    """One queued upload. Its status is mirrored to ``<job_dir>/status.json`` on every
+    update, so any worker process can report progress for it."""
+
+    def __init__(self, job_id, job_dir, params):
+        self.id = job_id
+        self.dir = job_dir
+        self.params = params
+        self._lock = threading.Lock()
+        self._owner = None
+        self.status = {
+            "job_id": job_id,
+            "state": "queued",
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "progress": {
+                "pages_extracted": 0,
+                "chunks_total": 0,
+                "chunks_embedded": 0,
+                "index_committed": False,
+            },
+        }
+
+    def update(self, **progress):
+        with self._lock:
+            self.status["progress"].update(progress)
+            self._save()
+
+    def increment(self, field, amount=1):
+        with self._lock:
+            self.status["progress"][field] += amount
+            self._save()
+
+    def set_state(self, state, error=None):
+        with self._lock:
+            self.status["state"] = state
+            if state == "running":
+                self.status["started_at"] = _now()
+            if state in ("succeeded", "failed"):
+                self.status["finished_at"] = _now()
+            self.status["error"] = error
+            self._save()
+
+    def claim(self):
+        """Lock the job for this process until ``release``, marking it as in progress."""
+        self._owner = open(os.path.join(self.dir, LOCK_FILE), "w")
+        fcntl.flock(self._owner, fcntl.LOCK_EX)
+
+    def release(self):
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def _save(self):
+        path = os.path.join(self.dir, STATUS_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.status, f)
+        os.replace(tmp_path, path)
+
+
+class IngestJobQueue:
+    """Bounded queue of ingestion jobs drained by a small pool of background threads.
+
+    ``run_job(job)`` does the actual work and reports progress through ``job.update``
+    and ``job.increment``. Uploaded files live in the job's directory until it
+    finishes. Worker threads start on the first submit, so a forking server never
+    starts them in the master process. Jobs left queued or running by a process that
+    died are marked as failed when a queue is created. Finished jobs are deleted
+    ``retention_seconds`` after their last status update.
+    """
+
+    def __init__(self, run_job, root, workers=1, max_depth=16, retention_seconds=7 * 24 * 3600):
+        self.run_job = run_job
+        self.root = root
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._threads = []
+        self._lock = threading.Lock()
+        self.recover()
+
+    def create_job(self, params):
+        """Create a job directory to spool uploaded files into before ``submit``."""
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.root, job_id)
+        os.makedirs(job_dir)
+        return IngestJob(job_id, job_dir, params)
+
+    def discard(self, job):
+        """Delete a job that was created but never submitted, e.g. because spooling failed."""
+        job.release()
+        shutil.rmtree(job.dir, ignore_errors=True)
+
+    def submit(self, job):
+        self._start_workers()
+        job.claim()
+        job.set_state("queued")
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            job.release()
+            shutil.rmtree(job.dir, ignore_errors=True)
+            raise QueueFull(f"Ingestion queue is full ({self._queue.maxsize} jobs waiting)")
+        return job
+
+    def status(self, job_id):
+        """Return the last saved status of a job, or ``None`` if it is unknown."""
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(os.path.join(self.root, job_id, STATUS_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def recover(self):
+        """Mark jobs whose owning process is gone (e.g. killed by a restart) as failed.
+
+        A job still locked by a live process, such as another gunicorn worker, is left
+        alone. Returns the ids of the jobs marked as failed.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        recovered = []
+        for job_id in os.listdir(self.root):
+            job_dir = os.path.join(self.root, job_id)
+            if not os.path.exists(os.path.join(job_dir, STATUS_FILE)):
+                continue
+            with open(os.path.join(job_dir, LOCK_FILE), "w") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Owned by a live process
+                job = IngestJob(job_id, job_dir, None)
+                with open(os.path.join(job_dir, STATUS_FILE)) as f:
+                    job.status = json.load(f)
+                if job.status["state"] not in ACTIVE_STATES:
+                    continue
+                job.set_state("failed", error="Interrupted by a server restart; upload the files again")
+                _remove_uploads(job_dir)
+                recovered.append(job_id)
+        if recovered:
+            logging.warning(f"Marked {len(recovered)} interrupted ingestion jobs as failed")
+        self.prune()
+        return recovered
+
+    def prune(self):
+        """Delete finished jobs older than ``retention_seconds``.
+
+        Age is taken from the last status update. A directory without a status file is
+        an upload still being spooled, or one whose process died while spooling it; it
+        is deleted once it is that old too. Returns the ids of the deleted jobs.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        cutoff = time.time() - self.retention_seconds
+        pruned = []
+        for job_id in os.listdir(self.root):
+            job_dir = os.path.join(self.root, job_id)
+            status_path = os.path.join(job_dir, STATUS_FILE)
+            try:
+                if os.path.getmtime(status_path if os.path.exists(status_path) else job_dir) > cutoff:
+                    continue
+                if os.path.exists(status_path):
+                    with open(status_path) as f:
+                        if json.load(f)["state"] in ACTIVE_STATES:
+                            continue
+            except (FileNotFoundError, ValueError):
+                continue  # Removed or rewritten by another process meanwhile
+            shutil.rmtree(job_dir, ignore_errors=True)
+            pruned.append(job_id)
+        if pruned:
+            logging.info(f"Deleted {len(pruned)} finished ingestion jobs")
+        return pruned
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def is_full(self):
+        return self._queue.full()
+
+    def _start_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingest-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.set_state("running")
+            try:
+                self.run_job(job)
+                job.set_state("succeeded")
+            except Exception as e:
+                logging.error(f"Ingestion job {job.id} failed: {e}")
+                job.set_state("failed", error=str(e))
+            finally:
+                _remove_uploads(job.dir)
+                job.release()
+                self._queue.task_done()
+            self.prune()
+
+
+# Keep only the status file (and lock) once the uploaded files have been ingested
+def _remove_uploads(job_dir):
+    for name in os.listdir(job_dir):
+        if name not in (STATUS_FILE, LOCK_FILE):
+            os.remove(os.path.join(job_dir, name))
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
@@ -0,0 +1,126 @@
+import os
+import json
+import logging
+from itertools import islice
+
+import numpy as np
+
+from keyword_extractor import preprocess_text
+
+# Texts per micro-batch: one KeyBERT forward pass and one sparse TF-IDF transform each
+KEYWORD_BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", "32"))
+
+# Longest NDJSON line accepted, in bytes
+MAX_LINE_BYTES = int(os.getenv("KEYWORD_BATCH_MAX_LINE_BYTES", str(1024 * 1024)))
+
+METHODS = ("keybert", "tfidf", "both")
+
+
+def _item(value, position):
+    """Normalize one submitted text: a string, or an object with "text" and an optional "id"."""
+    if isinstance(value, str):
+        return {"id": position, "text": value}
+    if isinstance(value, dict) and isinstance(value.get("text"), str):
+        return {"id": value.get("id", position), "text": value["text"]}
+    return {"id": position, "error": "Expected a string or an object with a 'text' string"}
+
+
+def iter_ndjson_items(stream):
+    """Items from an NDJSON body, read line by line so the body is never held in memory."""
+    position = 0
+    while True:
+        line = stream.readline(MAX_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_LINE_BYTES:
+            yield {"id": position, "error": f"Line longer than {MAX_LINE_BYTES} bytes"}
+            # Skip the rest of the oversized line
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(MAX_LINE_BYTES + 1)
+            position += 1
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield _item(json.loads(line), position)
+        except ValueError as e:
+            yield {"id": position, "error": f"Invalid JSON: {e}"}
+        position += 1
+
+
+def iter_json_items(texts):
+    for position, value in enumerate(texts):
+        yield _item(value, position)
+
+
+def micro_batches(items, size=KEYWORD_BATCH_SIZE):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def top_n_per_row(matrix, feature_names, top_n):
+    """Best ``top_n`` (feature, score) pairs of every row of a CSR matrix.
+
+    Non-zeros are ordered by row, then by descending score, in one lexsort; each
+    entry's rank within its row follows from the row offsets.
+    """
+    matrix = matrix.tocsr()
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows))
+    ranks = np.arange(len(order)) - matrix.indptr[rows[order]]
+    keep = order[ranks < top_n]
+    kept_rows = rows[keep]
+    words = feature_names[matrix.indices[keep]]
+    scores = np.round(matrix.data[keep].astype(np.float64), 3)
+
+    results = [{} for _ in range(matrix.shape[0])]
+    for row, word, score in zip(kept_rows.tolist(), words.tolist(), scores.tolist()):
+        results[row][str(word)] = score
+    return results
+
+
+def tfidf_keywords(artifacts, texts, top_n):
+    """TF-IDF keywords for a batch of texts from the stored vectorizer and IDF."""
+    counts = artifacts.cv.transform([preprocess_text(text) for text in texts])
+    return top_n_per_row(artifacts.tfidf_transformer.transform(counts), artifacts.feature_names, top_n)
+
+
+def stream_keywords(items, method, top_n, keyword_engine=None, artifacts=None, batch_size=KEYWORD_BATCH_SIZE):
+    """Yield one NDJSON line per item, a micro-batch at a time, then a summary line.
+
+    Only one micro-batch of texts and results is held at a time. Items that failed to
+    parse are reported in place with their error. If extraction fails for a micro-batch
+    (e.g. the embedding model raises), each of its items gets an error line and the
+    stream continues with the next batch.
+    """
+    count = errors = 0
+    for batch in micro_batches(items, batch_size):
+        valid = [item for item in batch if "error" not in item]
+        texts = [item["text"] for item in valid]
+        try:
+            if texts and method in ("keybert", "both"):
+                keybert_results = keyword_engine.extract(texts, top_n=top_n)[0]
+                for item, keywords in zip(valid, keybert_results):
+                    item["keybert"] = [[word, round(float(score), 4)] for word, score in keywords]
+            if texts and method in ("tfidf", "both"):
+                for item, keywords in zip(valid, tfidf_keywords(artifacts, texts, top_n)):
+                    item["tfidf"] = keywords
+        except Exception as e:
+            logging.error(f"Keyword extraction failed for a batch of {len(texts)} texts: {e}")
+            for item in valid:
+                item.pop("keybert", None)
+                item.pop("tfidf", None)
+                item["error"] = f"Keyword extraction failed: {e}"
+
+        lines = []
+        for item in batch:
+            item.pop("text", None)
+            count += 1
+            errors += "error" in item
+            lines.append(json.dumps(item))
+        yield "\n".join(lines) + "\n"
+    yield json.dumps({"done": True, "count": count, "errors": errors}) + "\n"
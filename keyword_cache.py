@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _size_of(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    # Keyword results: (word, score) pairs
+    return 64 + sum(len(word) + 48 for word, _ in value)
+
+
+class KeywordCache:
+    """Content-addressed cache for KeyBERT work, bounded by a memory budget.
+
+    Entries live in namespaces: ``doc`` and ``word`` hold MiniLM embeddings keyed by
+    text hash, ``keywords`` holds keyword results keyed by text hash and extraction
+    parameters. Least recently used entries are evicted past ``max_bytes``. With
+    ``disk_dir`` set, every entry is also written there (``.npy`` or ``.json``) and
+    memory misses are served from disk before anything is recomputed.
+    """
+
+    NAMESPACES = ("doc", "word", "keywords")
+
+    def __init__(self, max_bytes, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (namespace, key) -> (value, size)
+        self._bytes = 0
+        self.hits = {namespace: 0 for namespace in self.NAMESPACES}
+        self.disk_hits = {namespace: 0 for namespace in self.NAMESPACES}
+        self.misses = {namespace: 0 for namespace in self.NAMESPACES}
+        self.evictions = 0
+
+    def _disk_path(self, namespace, key):
+        extension = "json" if namespace == "keywords" else "npy"
+        return os.path.join(self.disk_dir, namespace, key[:2], f"{key}.{extension}")
+
+    def get(self, namespace, key):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                self._entries.move_to_end((namespace, key))
+                self.hits[namespace] += 1
+                return entry[0]
+
+        value = self._read_disk(namespace, key)
+        with self._lock:
+            if value is None:
+                self.misses[namespace] += 1
+                return None
+            self.disk_hits[namespace] += 1
+            self._insert(namespace, key, value)
+            return value
+
+    def put(self, namespace, key, value):
+        with self._lock:
+            self._insert(namespace, key, value)
+        self._write_disk(namespace, key, value)
+
+    def _insert(self, namespace, key, value):
+        old = self._entries.pop((namespace, key), None)
+        if old is not None:
+            self._bytes -= old[1]
+        size = _size_of(value)
+        self._entries[(namespace, key)] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _read_disk(self, namespace, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(namespace, key)
+        try:
+            if namespace == "keywords":
+                with open(path) as f:
+                    return [tuple(pair) for pair in json.load(f)]
+            return np.load(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_disk(self, namespace, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        if namespace == "keywords":
+            with open(tmp_path, "w") as f:
+                json.dump([[word, float(score)] for word, score in value], f)
+        else:
+            with open(tmp_path, "wb") as f:
+                np.save(f, value)
+        os.replace(tmp_path, path)
+
+    def stats(self):
+        with self._lock:
+            stats = {"bytes": self._bytes, "max_bytes": self.max_bytes, "entries": len(self._entries),
+                     "evictions": self.evictions}
+            for namespace in self.NAMESPACES:
+                lookups = self.hits[namespace] + self.disk_hits[namespace] + self.misses[namespace]
+                stats[namespace] = {
+                    "hits": self.hits[namespace],
+                    "disk_hits": self.disk_hits[namespace],
+                    "misses": self.misses[namespace],
+                    "hit_rate": (self.hits[namespace] + self.disk_hits[namespace]) / lookups if lookups else 0.0,
+                }
+            return stats
@@ -0,0 +1,154 @@
+import numpy as np
+
+from keyword_cache import text_hash
+
+
+class BatchKeywordEngine:
+    """Keyword extraction for many documents in one batched KeyBERT pass.
+
+    All documents and all candidate words are embedded together, keywords for every
+    document are scored against those shared embeddings, and the document embeddings
+    are returned so callers can compare documents without another forward pass.
+
+    With a ``KeywordCache``, document embeddings, candidate-word embeddings and keyword
+    results are looked up by content hash first, so only unseen text reaches the model.
+    """
+
+    def __init__(self, kw_model, cache=None):
+        self.kw_model = kw_model
+        self.cache = cache
+
+    def _embed_texts(self, namespace, texts):
+        texts = list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return self.kw_model.model.embed(texts)
+
+        keys = [text_hash(text) for text in texts]
+        vectors = [self.cache.get(namespace, key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = self.kw_model.model.embed([texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = np.array(vector)
+                self.cache.put(namespace, keys[i], vectors[i])
+        return np.vstack(vectors)
+
+    def embed_documents(self, docs):
+        """Embed documents only (no candidate words), e.g. for similarity search."""
+        return self._embed_texts("doc", docs)
+
+    def embed(self, docs, keyphrase_ngram_range=(1, 1), stop_words=None):
+        """Return ``(doc_embeddings, word_embeddings)`` for the documents and their candidate words.
+
+        Candidate words come from the same ``CountVectorizer`` KeyBERT fits internally,
+        so the word embeddings line up with its vocabulary.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        try:
+            count = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=stop_words, min_df=1).fit(docs)
+            words = count.get_feature_names_out()
+        except ValueError:
+            words = []  # Empty vocabulary: no document has a word that is not a stop word
+        return self._embed_texts("doc", docs), self._embed_texts("word", words)
+
+    def extract(self, docs, top_n=50, keyphrase_ngram_range=(1, 1), stop_words=None):
+        """Return ``(keywords per document, doc_embeddings)``; keywords are ``(word, score)`` lists.
+
+        Documents without a candidate word (empty, punctuation, one-letter or stop words
+        only) get no keywords, as KeyBERT gives them, and are kept out of the batched
+        pass so they cannot fail it for the other documents.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        params = f"{top_n}:{keyphrase_ngram_range[0]}-{keyphrase_ngram_range[1]}:{stop_words}"
+        keys = [f"{text_hash(doc)}:{params}" for doc in docs]
+        keywords = [self.cache.get("keywords", key) if self.cache else None for key in keys]
+        doc_embeddings = [None] * len(docs)
+
+        analyzer = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=stop_words).build_analyzer()
+        missing = []
+        for i, result in enumerate(keywords):
+            if result is None:
+                if analyzer(docs[i]):
+                    missing.append(i)
+                else:
+                    keywords[i] = []
+        if missing:
+            missing_docs = [docs[i] for i in missing]
+            missing_embeddings, word_embeddings = self.embed(missing_docs, keyphrase_ngram_range, stop_words)
+            extracted = self.kw_model.extract_keywords(
+                missing_docs,
+                keyphrase_ngram_range=keyphrase_ngram_range,
+                stop_words=stop_words,
+                top_n=top_n,
+                doc_embeddings=missing_embeddings,
+                word_embeddings=word_embeddings,
+            )
+            # KeyBERT unwraps the result when given a single document
+            if len(missing_docs) == 1:
+                extracted = [extracted]
+            for i, result, embedding in zip(missing, extracted, missing_embeddings):
+                keywords[i] = result
+                doc_embeddings[i] = embedding
+                if self.cache is not None:
+                    self.cache.put("keywords", keys[i], result)
+
+        # Cached results and wordless documents still need their document embeddings
+        rest = [i for i, embedding in enumerate(doc_embeddings) if embedding is None]
+        if rest:
+            for i, embedding in zip(rest, self._embed_texts("doc", [docs[i] for i in rest])):
+                doc_embeddings[i] = embedding
+        return keywords, np.vstack(doc_embeddings) if docs else np.zeros((0, 0), dtype=np.float32)
+
+
+def normalize_rows(doc_embeddings):
+    embeddings = np.asarray(doc_embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+
+# Cosine similarity of every pair of documents in one matrix multiply
+def embedding_similarity(doc_embeddings):
+    normalized = normalize_rows(doc_embeddings)
+    return normalized @ normalized.T
+
+
+def sparse_neighbors(doc_embeddings, top_k=None, threshold=None, block_size=256):
+    """Similar document pairs without materialising the N x N matrix.
+
+    Similarities are computed ``block_size`` rows at a time, so memory stays at
+    ``block_size x N``. With ``top_k`` each document gets its ``top_k`` nearest
+    neighbours (directed pairs); otherwise every unordered pair is returned once.
+    ``threshold`` drops pairs below that cosine similarity in either mode.
+    Returns ``(source, target, similarity)`` tuples.
+    """
+    normalized = normalize_rows(doc_embeddings)
+    n_docs = len(normalized)
+    pairs = []
+    if n_docs < 2:
+        return pairs
+    for start in range(0, n_docs, block_size):
+        stop = min(start + block_size, n_docs)
+        similarities = normalized[start:stop] @ normalized.T
+        rows = np.arange(stop - start)
+        similarities[rows, rows + start] = -np.inf
+
+        if top_k is not None:
+            k = min(top_k, n_docs - 1)
+            candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            scores = np.take_along_axis(similarities, candidates, axis=1)
+            order = np.argsort(-scores, axis=1)
+            candidates = np.take_along_axis(candidates, order, axis=1)
+            scores = np.take_along_axis(scores, order, axis=1)
+            keep = np.ones_like(scores, dtype=bool) if threshold is None else scores >= threshold
+            sources = np.broadcast_to(rows[:, None] + start, candidates.shape)
+            pairs.extend(zip(sources[keep].tolist(), candidates[keep].tolist(), scores[keep].tolist()))
+        else:
+            # Upper triangle only, so each unordered pair is reported once
+            similarities[np.arange(n_docs)[None, :] <= (rows[:, None] + start)] = -np.inf
+            sources, targets = np.nonzero(similarities >= threshold)
+            pairs.extend(zip((sources + start).tolist(), targets.tolist(), similarities[sources, targets].tolist()))
+    return pairs
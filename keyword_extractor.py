@@ -1,56 +1,187 @@
 # keyword_extractor.py
+import os
+import re
 import pickle
 import logging
-import os
+import threading
+from functools import lru_cache
+from collections import namedtuple
 
 # Configure logging to display error messages
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def load_model_and_functions():
-    """Load the model and functions from the pickle file."""
-    pickle_file_path = 'model_functions.pkl'  # Adjust this path if necessary
+# CountVectorizer and TF-IDF transformer fitted offline; replacing the file is picked up without a restart
+MODEL_FUNCTIONS_PATH = os.getenv(
+    "MODEL_FUNCTIONS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_functions.pkl")
+)
 
-    # Check if the pickle file exists
-    if not os.path.exists(pickle_file_path):
-        logging.error(f"Pickle file '{pickle_file_path}' does not exist.")
-        raise FileNotFoundError(f"Pickle file '{pickle_file_path}' not found.")
+# Keywords returned per text
+TOP_N_KEYWORDS = 10
 
-    try:
+HTML_TAG_PATTERN = re.compile(r"<.*?>")
+NON_LETTER_PATTERN = re.compile(r"[^a-z\s]")
+
+# Stop words removed before the vocabulary was built: NLTK's English list plus these
+# words common in the training papers that the vocabulary was built without
+CUSTOM_STOP_WORDS = ("using", "also", "large", "one", "two", "three", "four", "five", "iv", "et", "al", "fig")
+
+ModelArtifacts = namedtuple("ModelArtifacts", ["cv", "tfidf_transformer", "feature_names", "mtime"])
+
+
+@lru_cache(maxsize=1)
+def text_normalizer():
+    """``(stop_words, lemmatize)`` as the notebook that fitted the vectorizer used them.
+
+    Words are lemmatized with WordNet's noun lemmas ("uses" -> "us", "pass" -> "pas"),
+    which is why the vocabulary holds features like "algorithm us" and "low pas". The
+    NLTK data is downloaded on first use if it is missing.
+    """
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    for resource in ("stopwords", "wordnet"):
         try:
-            with open(model_file, 'rb') as f:
-                model_data = pickle.load(f)
-                logging.info("Model data loaded successfully.")
-                return True, model_data  # Return success and model data
-        except Exception as e:
-            logging.error(f"An error occurred while loading the model: {e}")
-            return False
-
-        # Extract components
-        cv = model_data['cv']
-        tfidf_transformer = model_data['tfidf_transformer']
-        preprocess_text = model_data['preprocess_text']
-        get_keywords_from_text = model_data['get_keywords_from_text']
-        get_keywords = model_data['get_keywords']
-
-        return cv, tfidf_transformer, preprocess_text, get_keywords_from_text, get_keywords
-
-    except FileNotFoundError as e:
-        logging.error("The pickle file was not found. Please ensure that 'model_functions.pkl' exists.")
-        raise e  # Re-raise the exception after logging
-    except KeyError as e:
-        logging.error(f"Missing key in the model data: {e}. Please check the contents of the pickle file.")
-        raise e  # Re-raise the exception after logging
-    except Exception as e:
-        logging.error(f"An error occurred while loading the model and functions: {e}")
-        raise e  # Re-raise the exception after logging
+            nltk.data.find(f"corpora/{resource}")
+        except LookupError:
+            logging.info(f"Downloading NLTK data '{resource}'")
+            nltk.download(resource, quiet=True)
+
+    stop_words = frozenset(stopwords.words("english")).union(CUSTOM_STOP_WORDS)
+    lemmatize = lru_cache(maxsize=100000)(WordNetLemmatizer().lemmatize)
+    lemmatize("uses")  # Load WordNet now; its lazy loader is not thread-safe
+    return stop_words, lemmatize
+
+
+def preprocess_text(txt):
+    """Lowercase, strip HTML tags and non-letters, drop stop words and lemmatize the rest."""
+    stop_words, lemmatize = text_normalizer()
+    txt = HTML_TAG_PATTERN.sub(" ", txt.lower())
+    txt = NON_LETTER_PATTERN.sub(" ", txt)
+    return " ".join(lemmatize(word) for word in txt.split() if word not in stop_words)
+
+
+def sort_coo(coo_matrix):
+    """(column, score) pairs of a sparse row, highest score first."""
+    return sorted(zip(coo_matrix.col, coo_matrix.data), key=lambda x: (x[1], x[0]), reverse=True)
+
+
+def extract_topn_from_vector(feature_names, sorted_items, topn=TOP_N_KEYWORDS):
+    """Map the best ``topn`` (column, score) pairs to {keyword: score}."""
+    return {str(feature_names[idx]): round(float(score), 3) for idx, score in sorted_items[:topn]}
+
+
+def get_keywords_from_text(text, docs, artifacts=None):
+    """Top TF-IDF keywords of an already preprocessed ``text``.
+
+    Term frequencies use the stored vocabulary. IDF comes from ``docs`` plus the text when
+    documents are given, otherwise from the stored transformer.
+    """
+    from sklearn.feature_extraction.text import TfidfTransformer
+
+    artifacts = artifacts or model_registry.get()
+    counts = artifacts.cv.transform([text])
+    if docs:
+        corpus_counts = artifacts.cv.transform([preprocess_text(doc) for doc in docs] + [text])
+        tfidf_transformer = TfidfTransformer(smooth_idf=True, use_idf=True).fit(corpus_counts)
+    else:
+        tfidf_transformer = artifacts.tfidf_transformer
+    tf_idf_vector = tfidf_transformer.transform(counts)
+    return extract_topn_from_vector(artifacts.feature_names, sort_coo(tf_idf_vector.tocoo()))
+
+
+def get_keywords(idx, docs, artifacts=None):
+    """Top keywords of ``docs[idx]``, scored against the other documents."""
+    return get_keywords_from_text(preprocess_text(docs[idx]), docs, artifacts)
+
+
+# The pickle refers to these helpers as __main__ globals of the notebook that produced it;
+# they resolve to the implementations above instead
+PICKLED_FUNCTIONS = {
+    "preprocess_text": preprocess_text,
+    "get_keywords_from_text": get_keywords_from_text,
+    "get_keywords": get_keywords,
+}
+
+
+class ModelUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module == "__main__":
+            if name in PICKLED_FUNCTIONS:
+                return PICKLED_FUNCTIONS[name]
+            raise pickle.UnpicklingError(f"Unknown function '{name}' in {MODEL_FUNCTIONS_PATH}")
+        return super().find_class(module, name)
+
+
+class ModelRegistry:
+    """Keyword model artifacts, loaded once per process and shared by all request threads.
+
+    ``get`` compares the file's modification time with the loaded one and reloads when
+    it changed. A failed reload (e.g. a half-copied file) is logged and the previous
+    artifacts keep serving.
+    """
+
+    def __init__(self, path=MODEL_FUNCTIONS_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._artifacts = None
+
+    def load(self):
+        with self._lock:
+            # Check if the pickle file exists
+            if not os.path.exists(self.path):
+                logging.error(f"Pickle file '{self.path}' does not exist.")
+                raise FileNotFoundError(f"Pickle file '{self.path}' not found.")
+
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, 'rb') as f:
+                model_data = ModelUnpickler(f).load()
+            try:
+                cv = model_data['cv']
+                tfidf_transformer = model_data['tfidf_transformer']
+            except KeyError as e:
+                logging.error(f"Missing key in the model data: {e}. Please check the contents of the pickle file.")
+                raise
+
+            text_normalizer()  # Stop words and WordNet load with the model, before requests run in threads
+            self._artifacts = ModelArtifacts(cv, tfidf_transformer, cv.get_feature_names_out(), mtime)
+            logging.info(f"Keyword model loaded from {self.path} ({len(self._artifacts.feature_names)} features).")
+            return self._artifacts
+
+    def get(self):
+        artifacts = self._artifacts
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if artifacts is not None and (mtime is None or mtime == artifacts.mtime):
+            return artifacts
+
+        with self._lock:
+            if self._artifacts is not artifacts:
+                return self._artifacts  # Another thread reloaded meanwhile
+            if artifacts is None:
+                return self.load()
+            try:
+                return self.load()
+            except Exception as e:
+                logging.error(f"Reloading {self.path} failed, keeping the loaded model: {e}")
+                # Do not retry on every request until the file changes again
+                self._artifacts = artifacts._replace(mtime=mtime)
+                return self._artifacts
+
+
+# Shared by every request in this process; app.py loads it at startup
+model_registry = ModelRegistry()
+
 
 def extract_keywords(text, docs):
     """Preprocess the input text and extract keywords."""
     try:
-        cv, tfidf_transformer, preprocess_text, get_keywords_from_text, get_keywords = load_model_and_functions()
+        artifacts = model_registry.get()
 
         preprocessed_text = preprocess_text(text)
-        keywords = get_keywords_from_text(preprocessed_text, docs)
+        keywords = get_keywords_from_text(preprocessed_text, docs, artifacts)
 
         return keywords
 
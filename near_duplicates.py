@@ -0,0 +1,345 @@
+import os
+import re
+import json
+import zlib
+import fcntl
+import threading
+import uuid
+from contextlib import contextmanager
+from collections import defaultdict
+
+import numpy as np
+
+# Signature length and LSH banding: with 32 bands of 4 rows, pairs above ~0.45 Jaccard
+# almost always share a bucket, and pairs below ~0.25 rarely do
+MINHASH_NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", "128"))
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", "32"))
+SHINGLE_SIZE = int(os.getenv("MINHASH_SHINGLE_SIZE", "3"))
+MINHASH_SEED = 1
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+IDS_FILE = "ids.jsonl"
+# Stored signatures are rewritten once superseded rows make up half the file
+COMPACT_RATIO = 2
+
+
+def shingle_hashes(text, shingle_size=SHINGLE_SIZE):
+    """Unique 32-bit hashes of the document's word ``shingle_size``-grams.
+
+    Words are hashed once each; shingle hashes are combined from them with vectorized
+    polynomial hashing rather than hashing every shingle string.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    if len(words) < shingle_size:
+        shingle_size = len(words)
+
+    combined = np.zeros(len(words) - shingle_size + 1, dtype=np.uint64)
+    for offset in range(shingle_size):
+        combined = combined * np.uint64(1000003) + word_hashes[offset:offset + len(combined)]
+    return np.unique(combined & MAX_HASH)
+
+
+class MinHasher:
+    """Vectorized MinHash: every permutation is applied to every shingle in one array op."""
+
+    def __init__(self, num_perm=MINHASH_NUM_PERM, seed=MINHASH_SEED):
+        rng = np.random.default_rng(seed)
+        # Coefficients below 2**32 keep a * hash + b inside uint64 without overflow
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes, block_size=4096):
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), block_size):
+            block = hashes[start:start + block_size]
+            permuted = (self.a[:, None] * block[None, :] + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+            signature = np.minimum(signature, permuted.min(axis=1))
+        return signature.astype(np.uint32)
+
+    def signatures(self, texts):
+        """Signatures of ``texts``, or ``None`` for a text without a single word to shingle.
+
+        An empty shingle set would sign as all ``MAX_HASH`` and match every other empty text.
+        """
+        signatures = []
+        for text in texts:
+            hashes = shingle_hashes(text)
+            signatures.append(self.signature(hashes) if len(hashes) else None)
+        return signatures
+
+
+class MinHashIndex:
+    """MinHash signatures with LSH band buckets, optionally persisted to a directory.
+
+    On disk an index is an append-only pair: ``ids.jsonl`` starts with a header naming
+    the signature length and a generation id, then holds one stored id per line, and
+    ``signatures-<generation>.u32`` holds the matching signature rows. ``save`` appends
+    only what was added since the last save. Adding an id that is already stored
+    replaces its signature, which on disk appends a new row that supersedes the old
+    one; once superseded rows make up half of the file, ``save`` rewrites both files
+    under a new generation. The band buckets are rebuilt from the signatures on load.
+    Processes sharing a directory work on it inside ``locked()``, which holds a file
+    lock and first replays whatever another process saved meanwhile.
+    """
+
+    def __init__(self, directory=None, num_perm=MINHASH_NUM_PERM, bands=MINHASH_BANDS):
+        if num_perm % bands:
+            raise ValueError("MINHASH_NUM_PERM must be a multiple of MINHASH_BANDS")
+        self.directory = directory
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.lock = threading.Lock()
+        self._reset()
+        if directory:
+            self._load()
+
+    @property
+    def _ids_path(self):
+        return os.path.join(self.directory, IDS_FILE)
+
+    def _signatures_path(self, generation):
+        return os.path.join(self.directory, f"signatures-{generation}.u32")
+
+    def _ids_stat(self):
+        try:
+            stat = os.stat(self._ids_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    @contextmanager
+    def locked(self):
+        """Hold this index exclusively, across threads and processes, up to date with disk."""
+        with self.lock:
+            if not self.directory:
+                yield self
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                if self._ids_stat() not in (None, self._stat):
+                    self._replay()
+                yield self
+
+    def _reset(self):
+        self.ids = []
+        self._rows_buffer = np.zeros((0, self.hasher.num_perm), dtype=np.uint32)
+        self._positions = {}
+        self._buckets = [defaultdict(set) for _ in range(self.bands)]
+        self._pending = {}      # ids added since the last save, in order
+        self._generation = None
+        self._offset = 0        # bytes of ids.jsonl replayed or written
+        self._disk_rows = 0     # signature rows on disk, superseded ones included
+        self._stat = None       # (inode, size) of ids.jsonl as of the last replay or save
+
+    @property
+    def signatures(self):
+        return self._rows_buffer[:len(self.ids)]
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _load(self):
+        if os.path.exists(self._ids_path):
+            self._replay()
+        elif os.path.exists(os.path.join(self.directory, "ids.json")):
+            # Corpus saved in the old whole-file format; the next save rewrites it as a journal
+            with open(os.path.join(self.directory, "ids.json")) as f:
+                ids = json.load(f)
+            signatures = np.load(os.path.join(self.directory, "signatures.npy"))
+            self._check_num_perm(signatures.shape[1])
+            for doc_id, signature in zip(ids, signatures):
+                self.add(doc_id, signature)
+
+    def _check_num_perm(self, num_perm):
+        if num_perm != self.hasher.num_perm:
+            raise ValueError(f"Stored signatures in {self.directory} use {num_perm} permutations")
+
+    def _replay(self):
+        """Apply the ids (and their signature rows) appended since this instance last looked."""
+        with open(self._ids_path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["generation"] != self._generation:
+                # Rewritten by another process, so positions changed: start over
+                self._check_num_perm(header["num_perm"])
+                self._reset()
+                self._generation = header["generation"]
+                self._offset = f.tell()
+            f.seek(self._offset)
+            data = f.read()
+            inode = os.fstat(f.fileno()).st_ino
+
+        # A line without its newline is still being written (or was, by a crashed writer)
+        complete = data[:data.rfind(b"\n") + 1]
+        ids = [json.loads(line) for line in complete.splitlines()]
+        if ids:
+            num_perm = self.hasher.num_perm
+            signatures = np.fromfile(
+                self._signatures_path(self._generation), dtype=np.uint32,
+                count=len(ids) * num_perm, offset=self._disk_rows * num_perm * 4,
+            ).reshape(len(ids), num_perm)
+            for doc_id, signature in zip(ids, signatures):
+                self._insert(doc_id, signature)
+            self._disk_rows += len(ids)
+        self._offset += len(complete)
+        self._stat = (inode, self._offset)
+
+    def save(self):
+        if not self.directory or not self._pending:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self._generation is None or self._disk_rows + len(self._pending) > COMPACT_RATIO * len(self.ids):
+            self._rewrite()
+        else:
+            self._append(list(self._pending))
+        self._pending = {}
+
+    def _append(self, ids):
+        rows = self.signatures[[self._positions[doc_id] for doc_id in ids]]
+        with open(self._signatures_path(self._generation), "ab") as f:
+            # Drop rows a crashed writer appended without recording their ids
+            f.truncate(self._disk_rows * self.hasher.num_perm * 4)
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._ids_path, "ab") as f:
+            f.truncate(self._offset)
+            f.write(b"".join(json.dumps(doc_id).encode("utf-8") + b"\n" for doc_id in ids))
+            f.flush()
+            os.fsync(f.fileno())
+            self._offset = f.tell()
+            self._stat = (os.fstat(f.fileno()).st_ino, self._offset)
+        self._disk_rows += len(ids)
+
+    def _rewrite(self):
+        """Write every live signature under a new generation, dropping superseded rows."""
+        old_generation = self._generation
+        self._generation = uuid.uuid4().hex
+        with open(self._signatures_path(self._generation), "wb") as f:
+            f.write(self.signatures.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        tmp_ids = f"{self._ids_path}.tmp-{os.getpid()}"
+        with open(tmp_ids, "wb") as f:
+            f.write(json.dumps({"num_perm": self.hasher.num_perm, "generation": self._generation}).encode("utf-8") + b"\n")
+            f.write(b"".join(json.dumps(doc_id).encode("utf-8") + b"\n" for doc_id in self.ids))
+            f.flush()
+            os.fsync(f.fileno())
+        # Publishing ids.jsonl switches readers to the new generation's signature file
+        os.replace(tmp_ids, self._ids_path)
+        self._offset = os.path.getsize(self._ids_path)
+        self._stat = self._ids_stat()
+        self._disk_rows = len(self.ids)
+
+        stale = ["ids.json", "signatures.npy"]
+        if old_generation is not None:
+            stale.append(os.path.basename(self._signatures_path(old_generation)))
+        for name in stale:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def candidates(self, signature):
+        """Positions of stored documents sharing at least one band bucket with ``signature``."""
+        found = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found |= self._buckets[band].get(key, set())
+        return found
+
+    def add(self, doc_id, signature):
+        self._insert(doc_id, signature)
+        self._pending.pop(doc_id, None)
+        self._pending[doc_id] = None
+
+    def _insert(self, doc_id, signature):
+        position = self._positions.get(doc_id)
+        if position is not None:
+            for band, key in enumerate(self._band_keys(self.signatures[position])):
+                self._buckets[band][key].discard(position)
+            self._rows_buffer[position] = signature
+        else:
+            position = len(self.ids)
+            if position == len(self._rows_buffer):
+                # Grow by doubling so adding documents one at a time stays linear overall
+                grown = np.zeros((max(16, 2 * position), self.hasher.num_perm), dtype=np.uint32)
+                grown[:position] = self._rows_buffer[:position]
+                self._rows_buffer = grown
+            self._rows_buffer[position] = signature
+            self.ids.append(doc_id)
+            self._positions[doc_id] = position
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(position)
+
+
+def find_near_duplicates(doc_ids, texts, threshold, corpus=None, store=True):
+    """Check new documents against each other and, if given, a stored ``corpus`` index.
+
+    Each text is signed once; LSH buckets give the candidate pairs, whose Jaccard
+    similarity is estimated from signature agreement. Pairs at or above ``threshold``
+    are grouped into clusters with union-find. With ``store`` the new signatures are
+    added to the corpus and saved. Texts without any words cannot be signed; they are
+    neither compared nor stored, and are returned as ``unsigned``.
+    Returns ``(pairs, clusters, unsigned)``.
+    """
+    batch = MinHashIndex()
+    signed = [(doc_id, signature) for doc_id, signature in zip(doc_ids, batch.hasher.signatures(texts))
+              if signature is not None]
+    signed_ids = {doc_id for doc_id, _ in signed}
+    unsigned = [doc_id for doc_id in doc_ids if doc_id not in signed_ids]
+    pairs = {}
+
+    def compare(index, doc_id, signature):
+        candidates = [position for position in index.candidates(signature) if index.ids[position] != doc_id]
+        if not candidates:
+            return
+        estimates = (index.signatures[candidates] == signature[None, :]).mean(axis=1)
+        for position, jaccard in zip(candidates, estimates.tolist()):
+            if jaccard >= threshold:
+                pair = tuple(sorted((doc_id, index.ids[position])))
+                pairs[pair] = max(jaccard, pairs.get(pair, 0.0))
+
+    if corpus is None:
+        for doc_id, signature in signed:
+            compare(batch, doc_id, signature)
+            batch.add(doc_id, signature)
+    else:
+        with corpus.locked():
+            for doc_id, signature in signed:
+                compare(corpus, doc_id, signature)
+                compare(batch, doc_id, signature)
+                batch.add(doc_id, signature)
+            if store and signed:
+                for doc_id, signature in signed:
+                    corpus.add(doc_id, signature)
+                corpus.save()
+
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        parent[find(a)] = find(b)
+
+    clusters = defaultdict(list)
+    for member in {doc_id for pair in pairs for doc_id in pair}:
+        clusters[find(member)].append(member)
+
+    pair_list = [{"a": a, "b": b, "jaccard": round(jaccard, 4)} for (a, b), jaccard in sorted(pairs.items())]
+    cluster_list = [sorted(members) for members in clusters.values()]
+    return pair_list, sorted(cluster_list, key=len, reverse=True), unsigned
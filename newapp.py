@@ -1,14 +1,21 @@
 import os
-from flask import Flask, request, jsonify
-from PyPDF2 import PdfReader
+import json
+from functools import lru_cache
+from flask import Flask, Response, request, jsonify, stream_with_context
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-import google.generativeai as genai
 from langchain_community.vectorstores import FAISS
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains.question_answering import load_qa_chain
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+from pdf_extractor import spool_upload, iter_pdf_pages
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from embedding_dispatcher import EmbeddingDispatcher, HttpEmbeddings
+from shared_models import LocalEmbeddings, SENTENCE_MODEL_NAME
+from answer_cache import AnswerCache
+from ingest_jobs import IngestJobQueue, QueueFull
+from faiss_index_types import delete_chunks, doc_chunk_map, fit_index_to_size
+from context_packing import retrieve, pack_context, count_tokens
+from index_manager import IndexRegistry
+from store_ids import STORE_ID_PATTERN, model_cache_dir
 
 # Load environment variables
 load_dotenv()
@@ -16,35 +23,212 @@ load_dotenv()
 # Initialize Flask app
 app = Flask(__name__)
 
-# Retrieve the API key
-api_key = os.getenv("GOOGLE_API_KEY")
+# Configure Google Generative AI API on first use, so deployments on the local or http
+# embedding backend neither import the Google SDK nor need its key at startup
+@lru_cache(maxsize=1)
+def configure_genai():
+    import google.generativeai as genai
 
-# Check if the API key is loaded properly
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found. Ensure it's correctly defined in the .env file.")
+    # Retrieve the API key
+    api_key = os.getenv("GOOGLE_API_KEY")
 
-# Configure Google Generative AI API
-genai.configure(api_key=api_key)
+    # Check if the API key is loaded properly
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found. Ensure it's correctly defined in the .env file.")
 
-def get_pdf_text(pdf_docs):
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-    return text
+    genai.configure(api_key=api_key)
 
-def get_text_chunks(text):
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=10000, chunk_overlap=1000)
-    chunks = text_splitter.split_text(text)
-    return chunks
+# Directory holding one versioned FAISS index per collection
+INDEX_DIR = "faiss_index"
+DEFAULT_COLLECTION = "default"
 
-def get_vector_store(text_chunks):
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    vector_store = FAISS.from_texts(text_chunks, embedding=embeddings)
-    vector_store.save_local("faiss_index")
+# Memory budget for indexes kept loaded at the same time (least recently used are evicted)
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
 
-def get_conversational_chain():
+# Embedding backend for ingestion and queries:
+#   google - Google embedding API (default)
+#   http   - self-hosted (or fake, for offline benchmarks) server at EMBEDDING_SERVER_URL
+#   local  - the in-process MiniLM model that KeyBERT also uses; works without network access
+# Vectors from different backends are not comparable, so re-ingest collections after switching.
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "http" if EMBEDDING_SERVER_URL else "google")
+if EMBEDDING_BACKEND not in ("google", "http", "local"):
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'. Use google, http or local.")
+
+if EMBEDDING_BACKEND == "local":
+    EMBEDDING_MODEL = f"local:{SENTENCE_MODEL_NAME}"
+elif EMBEDDING_BACKEND == "http":
+    EMBEDDING_MODEL = f"http:{EMBEDDING_SERVER_URL}"
+else:
+    EMBEDDING_MODEL = "models/embedding-001"
+
+# Batching, concurrency, rate limit (0 = unlimited) and retries for embedding calls
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "100"))
+EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "0"))
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+
+# Persistent cache of chunk and query embeddings, bounded by size on disk
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+@lru_cache(maxsize=1)
+def get_embedding_cache():
+    return EmbeddingCache(model_cache_dir(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL), EMBEDDING_CACHE_MAX_BYTES)
+
+# Embeddings client shared by ingestion and every /ask request; identical text is never re-embedded,
+# and remote cache misses are sent in concurrent, rate-limited batches
+@lru_cache(maxsize=1)
+def get_embeddings():
+    if EMBEDDING_BACKEND == "local":
+        # Batching happens inside the model's encode call; extra threads would only contend for the CPU
+        return CachedEmbeddings(LocalEmbeddings(), get_embedding_cache(), EMBEDDING_MODEL)
+
+    if EMBEDDING_BACKEND == "http":
+        base = HttpEmbeddings(EMBEDDING_SERVER_URL)
+    else:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        configure_genai()
+        base = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+    dispatcher = EmbeddingDispatcher(
+        base,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        max_concurrency=EMBEDDING_MAX_CONCURRENCY,
+        tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+        max_retries=EMBEDDING_MAX_RETRIES,
+    )
+    return CachedEmbeddings(dispatcher, get_embedding_cache(), EMBEDDING_MODEL)
+
+# Process-wide indexes: each collection is loaded once and swapped atomically when a new one is written
+index_registry = IndexRegistry(INDEX_DIR, get_embeddings, max_bytes=INDEX_CACHE_MAX_BYTES)
+
+# Answers to repeated (or nearly identical) questions, valid until the collection's index changes
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    max_distance=float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05")),
+)
+
+# Chunking and retrieval: MMR picks RETRIEVAL_K of the RETRIEVAL_FETCH_K nearest chunks,
+# then the packer fills CONTEXT_TOKEN_BUDGET (estimated tokens) with their best spans
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "2000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "4"))
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+RETRIEVAL_MMR_LAMBDA = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.5"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+MAX_RETRIEVAL_K = 20
+MAX_CONTEXT_TOKEN_BUDGET = 30000
+
+def invalid_collection_response(collection):
+    return jsonify({
+        "error": f"Invalid collection '{collection}'. Use 1-64 letters, digits, '_' or '-'."
+    }), 400
+
+# Yield (source, page_number, text) for every page of a spooled PDF, extracted in a process pool
+def get_pdf_pages(path, source):
+    for page_number, text in iter_pdf_pages(path):
+        yield source, page_number, text
+
+# Split pages into chunks as they arrive, yielding (chunk, metadata) with the page number kept
+def get_text_chunks(pages):
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    for source, page_number, text in pages:
+        for chunk in text_splitter.split_text(text):
+            yield chunk, {"source": source, "page": page_number}
+
+# Docstore ids of every chunk that belongs to one document, from the store's doc_id map
+def get_document_chunk_ids(vector_store, doc_id):
+    return list(doc_chunk_map(vector_store).get(doc_id, []))
+
+def remove_document_chunks(vector_store, doc_id):
+    chunk_ids = get_document_chunk_ids(vector_store, doc_id)
+    if chunk_ids:
+        delete_chunks(vector_store, chunk_ids)
+        del doc_chunk_map(vector_store)[doc_id]
+    return len(chunk_ids)
+
+# Record the chunk ids of newly added documents in the store's doc_id map
+def register_document_chunks(vector_store, metadatas, ids):
+    doc_chunks = doc_chunk_map(vector_store)
+    for metadata, chunk_id in zip(metadatas, ids):
+        doc_chunks.setdefault(metadata["doc_id"], []).append(chunk_id)
+
+# Embed only the new chunks and add them to the existing index.
+# documents is a list of (doc_id, [(chunk, metadata), ...]); a doc_id that is already indexed is replaced.
+# mode="replace" discards the collection's existing index instead of appending to it.
+# progress, if given, is an ingestion job that receives chunks_embedded / index_committed updates.
+def get_vector_store(documents, collection=DEFAULT_COLLECTION, mode="append", progress=None):
+    texts, metadatas, ids = [], [], []
+    for doc_id, chunks in documents:
+        for i, (chunk, metadata) in enumerate(chunks):
+            texts.append(chunk)
+            metadatas.append({**metadata, "doc_id": doc_id, "chunk": i})
+            ids.append(f"{doc_id}:{i}")
+
+    # Embedding happens outside the index lock so /ask and other writers are not blocked.
+    # Slices of several dispatcher batches keep all batches busy while still reporting progress.
+    if progress is not None:
+        progress.update(chunks_total=len(texts))
+    slice_size = EMBEDDING_BATCH_SIZE * EMBEDDING_MAX_CONCURRENCY
+    vectors = []
+    for start in range(0, len(texts), slice_size):
+        vectors.extend(get_embeddings().embed_documents(texts[start:start + slice_size]))
+        if progress is not None:
+            progress.update(chunks_embedded=len(vectors))
+    text_embeddings = list(zip(texts, vectors))
+
+    # New stores start flat; once the vector count calls for HNSW or IVF-PQ the index is
+    # rebuilt (and trained) from its stored vectors as part of the same commit
+    def apply(vector_store):
+        if vector_store is None or mode == "replace":
+            vector_store = FAISS.from_embeddings(text_embeddings, get_embeddings(), metadatas=metadatas, ids=ids)
+            vector_store.doc_chunks = {}
+            register_document_chunks(vector_store, metadatas, ids)
+            return fit_index_to_size(vector_store)
+        for doc_id, _ in documents:
+            remove_document_chunks(vector_store, doc_id)
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        register_document_chunks(vector_store, metadatas, ids)
+        return fit_index_to_size(vector_store)
+
+    version = index_registry.update(collection, apply)
+    answer_cache.invalidate(collection)
+    if progress is not None:
+        progress.update(index_committed=True)
+    return version
+
+# Background ingestion of one queued upload: extract pages, chunk, embed and commit
+def run_ingest_job(job):
+    documents = []
+    for doc_id, source, path in job.params["files"]:
+        chunks = list(get_text_chunks(count_pages(get_pdf_pages(path, source), job)))
+        documents.append((doc_id, chunks))
+
+    if not any(chunks for _, chunks in documents):
+        raise ValueError("No text could be extracted from the uploaded files")
+
+    get_vector_store(documents, collection=job.params["collection"], mode=job.params["mode"], progress=job)
+
+def count_pages(pages, job):
+    for page in pages:
+        job.increment("pages_extracted")
+        yield page
+
+# Uploads are stored and queued; a small pool of background threads ingests them.
+# A full queue answers 429 instead of letting work pile up behind the web worker;
+# finished jobs are kept for INGEST_JOB_RETENTION_SECONDS (a week) so their status can be read.
+ingest_queue = IngestJobQueue(
+    run_ingest_job,
+    root=os.getenv("INGEST_JOB_DIR", "ingest_jobs"),
+    workers=int(os.getenv("INGEST_WORKERS", "1")),
+    max_depth=int(os.getenv("INGEST_QUEUE_MAX_DEPTH", "16")),
+    retention_seconds=int(os.getenv("INGEST_JOB_RETENTION_SECONDS", "604800")),
+)
+
+@lru_cache(maxsize=1)
+def get_qa_prompt():
     prompt_template = """
     Answer the question as detailed as possible from the provided context, make sure to provide all the details, if the answer is not in
     provided context just say, "answer is not available in the context", don't provide the wrong answer\n\n
@@ -54,12 +238,68 @@ def get_conversational_chain():
     Answer:
     """
 
-    model = ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    chain = load_qa_chain(model, chain_type="stuff", prompt=prompt)
+    return PromptTemplate(template=prompt_template, input_variables=["context", "question"])
+
+@lru_cache(maxsize=1)
+def get_chat_model():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    configure_genai()
+    return ChatGoogleGenerativeAI(model="gemini-pro", temperature=0.3)
+
+@lru_cache(maxsize=1)
+def get_conversational_chain():
+    from langchain.chains.question_answering import load_qa_chain
+
+    chain = load_qa_chain(get_chat_model(), chain_type="stuff", prompt=get_qa_prompt())
 
     return chain
 
+# Format one Server-Sent Event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# Same layout the "stuff" chain uses: documents joined by blank lines
+def build_prompt(docs, question):
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return get_qa_prompt().format(context=context, question=question)
+
+# Stream an answer as Server-Sent Events: the retrieved context first, then answer tokens
+# as the model produces them. llm is any LangChain model with .stream(), so a fake
+# streaming model can stand in for gemini-pro in tests.
+def stream_answer(llm, docs, question, on_complete=None, usage=None):
+    yield sse_event("context", {"documents": [doc.metadata for doc in docs], "usage": usage})
+
+    prompt = build_prompt(docs, question)
+
+    try:
+        parts = []
+        for chunk in llm.stream(prompt):
+            text = getattr(chunk, "content", chunk)
+            if text:
+                parts.append(text)
+                yield sse_event("token", {"text": text})
+    except Exception as e:
+        yield sse_event("error", {"error": "Error while generating the answer", "details": str(e)})
+        return
+
+    answer = "".join(parts)
+    if on_complete is not None:
+        on_complete(answer)
+    yield sse_event("done", {"answer": answer, "cached": False})
+
+def cached_answer_stream(answer, cached):
+    yield sse_event("context", {"documents": []})
+    yield sse_event("token", {"text": answer})
+    yield sse_event("done", {"answer": answer, "cached": cached})
+
+def event_stream_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 def upload_pdf():
     if 'pdf_files' not in request.files:
         return jsonify({"error": "No file part"}), 400
@@ -69,12 +309,72 @@ def upload_pdf():
     if not pdf_files:
         return jsonify({"error": "No files uploaded"}), 400
 
-    # Process uploaded PDF files
-    raw_text = get_pdf_text(pdf_files)
-    text_chunks = get_text_chunks(raw_text)
-    get_vector_store(text_chunks)
+    collection = request.form.get('collection', DEFAULT_COLLECTION)
+    if not STORE_ID_PATTERN.match(collection):
+        return invalid_collection_response(collection)
+
+    mode = request.form.get('mode', 'append')
+    if mode not in ('append', 'replace'):
+        return jsonify({"error": "mode must be 'append' or 'replace'"}), 400
+
+    # Each file is indexed under its own document id (defaults to the file name)
+    doc_ids = request.form.getlist('doc_id')
+    if doc_ids and len(doc_ids) != len(pdf_files):
+        return jsonify({"error": "Provide one doc_id per uploaded file"}), 400
+
+    if ingest_queue.is_full():
+        return jsonify({"error": "Too many uploads are being processed, try again later"}), 429
+
+    # Store the files with the job and return immediately; ingestion runs in the background
+    job = ingest_queue.create_job({"collection": collection, "mode": mode, "files": []})
+    try:
+        for i, pdf in enumerate(pdf_files):
+            doc_id = doc_ids[i] if doc_ids else pdf.filename
+            job.params["files"].append((doc_id, pdf.filename, spool_upload(pdf, spool_dir=job.dir)))
+    except Exception as e:
+        ingest_queue.discard(job)
+        return jsonify({"error": "Failed to store the uploaded files", "details": str(e)}), 500
+
+    try:
+        ingest_queue.submit(job)
+    except QueueFull as e:
+        return jsonify({"error": "Too many uploads are being processed, try again later", "details": str(e)}), 429
+
+    return jsonify({
+        "message": "PDF files queued for processing",
+        "job_id": job.id,
+        "status_url": f"/upload/{job.id}",
+        "collection": collection,
+        "doc_ids": [doc_id for doc_id, _, _ in job.params["files"]]
+    }), 202
+
+def upload_status(job_id):
+    status = ingest_queue.status(job_id)
+    if status is None:
+        return jsonify({"error": f"Upload job '{job_id}' not found"}), 404
 
-    return jsonify({"message": "PDF files processed successfully!"}), 200
+    return jsonify(status), 200
+
+def delete_document(doc_id):
+    collection = request.args.get('collection', DEFAULT_COLLECTION)
+    if not STORE_ID_PATTERN.match(collection):
+        return invalid_collection_response(collection)
+
+    removed = {}
+
+    def apply(vector_store):
+        if vector_store is None:
+            return None
+        removed["chunks"] = remove_document_chunks(vector_store, doc_id)
+        return fit_index_to_size(vector_store) if removed["chunks"] else None
+
+    index_registry.update(collection, apply)
+    answer_cache.invalidate(collection)
+
+    if not removed.get("chunks"):
+        return jsonify({"error": f"Document '{doc_id}' not found"}), 404
+
+    return jsonify({"message": f"Document '{doc_id}' removed", "chunks_removed": removed["chunks"]}), 200
 
 def ask_question():
     data = request.json
@@ -83,9 +383,58 @@ def ask_question():
     if not user_question:
         return jsonify({"error": "Question is required"}), 400
 
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-    docs = new_db.similarity_search(user_question)
+    collection = data.get('collection', DEFAULT_COLLECTION)
+    if not STORE_ID_PATTERN.match(collection):
+        return invalid_collection_response(collection)
+
+    try:
+        k = min(int(data.get('k', RETRIEVAL_K)), MAX_RETRIEVAL_K)
+        token_budget = min(int(data.get('token_budget', CONTEXT_TOKEN_BUDGET)), MAX_CONTEXT_TOKEN_BUDGET)
+    except (TypeError, ValueError):
+        return jsonify({"error": "k and token_budget must be integers"}), 400
+    if k < 1 or token_budget < 1:
+        return jsonify({"error": "k and token_budget must be positive"}), 400
+
+    new_db, version = index_registry.get(collection)
+    if new_db is None:
+        return jsonify({"error": f"No documents have been uploaded to collection '{collection}' yet"}), 400
+
+    # Stream tokens as Server-Sent Events when asked to; JSON stays the default
+    stream = bool(data.get('stream')) or request.accept_mimetypes.best == "text/event-stream"
+
+    # Fast path: the same question (ignoring case, punctuation and spacing) was answered before
+    # with the same retrieval settings
+    settings = (k, token_budget)
+    answer = answer_cache.get_exact(collection, version, settings, user_question)
+    cached = "exact"
+    if answer is None:
+        # The question embedding serves both the semantic cache lookup and retrieval
+        question_vector = get_embeddings().embed_query(user_question)
+        answer = answer_cache.get_similar(collection, version, settings, question_vector)
+        cached = "semantic"
+
+    if answer is not None:
+        if stream:
+            return event_stream_response(cached_answer_stream(answer, cached))
+        return jsonify({"answer": answer, "cached": cached}), 200
+
+    # Retrieve with MMR de-duplication, then pack the best spans into the token budget
+    scored_docs = retrieve(new_db, question_vector, k, RETRIEVAL_FETCH_K, RETRIEVAL_MMR_LAMBDA)
+    docs, context_tokens = pack_context(scored_docs, user_question, token_budget)
+    usage = {
+        "chunks_retrieved": len(scored_docs),
+        "context_tokens": context_tokens,
+        "prompt_tokens": count_tokens(build_prompt(docs, user_question)),
+        "token_budget": token_budget,
+    }
+
+    if stream:
+        def remember(answer):
+            answer_cache.put(collection, version, settings, user_question, question_vector, answer)
+
+        return event_stream_response(
+            stream_answer(get_chat_model(), docs, user_question, on_complete=remember, usage=usage)
+        )
 
     chain = get_conversational_chain()
 
@@ -94,7 +443,12 @@ def ask_question():
         return_only_outputs=True
     )
 
-    return jsonify({"answer": response["output_text"]}), 200
+    answer_cache.put(collection, version, settings, user_question, question_vector, response["output_text"])
+
+    return jsonify({"answer": response["output_text"], "cached": False, "usage": usage}), 200
+
+def embedding_cache_stats():
+    return jsonify(get_embedding_cache().stats()), 200
 
 if __name__ == '__main__':
     app.run(debug=True)
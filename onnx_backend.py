@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+import numpy as np
+from keybert.backend import BaseEmbedder
+
+# Exported models are cached per sentence-transformer: model.onnx (fp32), model.int8.onnx
+# (dynamically quantized weights) and the tokenizer files
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+
+# Intra-op threads per ONNX Runtime session (0 = one per core); with several gunicorn
+# workers, set this to cores / WEB_CONCURRENCY
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+
+# Texts per forward pass; texts are sorted by length first so batches pad little
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", "64"))
+
+_export_lock = threading.Lock()
+
+
+def model_dir(model_name):
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def export_model(sentence_model, directory):
+    """Export the transformer of ``sentence_model`` to ONNX and quantize it to int8.
+
+    Only the transformer is exported; mean pooling and normalization, the remaining
+    modules of the MiniLM pipeline, are applied to its output in numpy.
+    Returns the path of the quantized model.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(directory, exist_ok=True)
+    transformer = sentence_model[0].auto_model.eval()
+    tokenizer = sentence_model.tokenizer
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    fp32_path = os.path.join(directory, "model.onnx")
+    int8_path = os.path.join(directory, "model.int8.onnx")
+    tmp_path = f"{int8_path}.tmp-{os.getpid()}"
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+    tokenizer.save_pretrained(directory)
+    os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+def ensure_exported(model_name):
+    """Path of the quantized model for ``model_name``, exporting it on first use."""
+    from shared_models import get_sentence_model
+
+    directory = model_dir(model_name)
+    int8_path = os.path.join(directory, "model.int8.onnx")
+    with _export_lock:
+        if not os.path.exists(int8_path):
+            logging.info(f"Exporting {model_name} to ONNX (int8) in {directory}")
+            export_model(get_sentence_model(), directory)
+    return int8_path
+
+
+class OnnxSentenceEmbedder(BaseEmbedder):
+    """KeyBERT embedder running a quantized ONNX export of the sentence-transformer.
+
+    Produces the same mean-pooled, L2-normalized vectors as the PyTorch model, up to
+    quantization error; ``parity_check`` measures how much that changes keywords.
+    """
+
+    def __init__(self, model_name, threads=ONNX_THREADS, batch_size=ONNX_BATCH_SIZE, max_length=256):
+        super().__init__()
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = ensure_exported(model_name)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(model_path))
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def _embed_batch(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed(self, documents, verbose=False):
+        documents = list(documents)
+        embeddings = np.zeros((len(documents), 0), dtype=np.float32)
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            vectors = self._embed_batch([documents[i] for i in batch])
+            if embeddings.shape[1] == 0:
+                embeddings = np.zeros((len(documents), vectors.shape[1]), dtype=np.float32)
+            embeddings[batch] = vectors
+        return embeddings
+
+
+def parity_check(docs, top_n=10):
+    """Compare keywords and throughput of the PyTorch and ONNX KeyBERT backends.
+
+    For each document, reports the overlap of the two top-``top_n`` keyword sets and
+    the cosine similarity of the two document embeddings.
+    """
+    from keybert import KeyBERT
+    from shared_models import SENTENCE_MODEL_NAME, get_sentence_model
+
+    backends = {"torch": KeyBERT(model=get_sentence_model()), "onnx": KeyBERT(model=OnnxSentenceEmbedder(SENTENCE_MODEL_NAME))}
+    results = {}
+    for name, kw_model in backends.items():
+        kw_model.model.embed(docs[:1])  # warm-up
+        start = time.perf_counter()
+        embeddings = kw_model.model.embed(docs)
+        keywords = kw_model.extract_keywords(docs, top_n=top_n)
+        elapsed = time.perf_counter() - start
+        if len(docs) == 1:
+            keywords = [keywords]
+        results[name] = {"embeddings": np.asarray(embeddings), "keywords": keywords, "seconds": elapsed}
+
+    overlaps = []
+    for torch_keywords, onnx_keywords in zip(results["torch"]["keywords"], results["onnx"]["keywords"]):
+        torch_words = {word for word, _ in torch_keywords}
+        onnx_words = {word for word, _ in onnx_keywords}
+        overlaps.append(len(torch_words & onnx_words) / max(len(torch_words | onnx_words), 1))
+    cosines = np.sum(results["torch"]["embeddings"] * results["onnx"]["embeddings"], axis=1) / (
+        np.linalg.norm(results["torch"]["embeddings"], axis=1) * np.linalg.norm(results["onnx"]["embeddings"], axis=1)
+    )
+    return {
+        "documents": len(docs),
+        "mean_keyword_overlap": float(np.mean(overlaps)),
+        "min_keyword_overlap": float(np.min(overlaps)),
+        "mean_embedding_cosine": float(np.mean(cosines)),
+        "min_embedding_cosine": float(np.min(cosines)),
+        "torch_seconds": round(results["torch"]["seconds"], 3),
+        "onnx_seconds": round(results["onnx"]["seconds"], 3),
+        "speedup": round(results["torch"]["seconds"] / results["onnx"]["seconds"], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the KeyBERT model to int8 ONNX and check parity with PyTorch")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("files", nargs="*", help="text files to use as parity documents (default: built-in samples)")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--min-overlap", type=float, default=0.8, help="fail if the mean keyword overlap is lower")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from shared_models import SENTENCE_MODEL_NAME
+
+    if args.command == "export":
+        print(ensure_exported(SENTENCE_MODEL_NAME))
+        sys.exit(0)
+
+    if args.files:
+        docs = []
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                docs.append(f.read())
+    else:
+        docs = [
+            "Supervised learning trains a model on labeled examples so it can predict labels for unseen data.",
+            "The central bank raised interest rates to slow inflation, pushing mortgage costs higher.",
+            "Photosynthesis converts light energy into chemical energy stored in glucose molecules.",
+            "The striker scored twice in the second half, securing the championship for her club.",
+        ] * 16
+    report = parity_check(docs, top_n=args.top_n)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if report["mean_keyword_overlap"] < args.min_overlap:
+        sys.exit(f"Keyword overlap {report['mean_keyword_overlap']:.3f} is below {args.min_overlap}")
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PyPDF2 import PdfReader
+
+# Number of processes extracting pages in parallel (1 disables the pool)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+
+# Pages handled by one pool task; larger ranges mean fewer times a worker re-opens the file
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Create the process pool on first use, so importing this module never forks.
+
+    Workers are started by a forkserver: forking the threaded web process directly
+    could copy locks held by its other threads into the children.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+            )
+        return _executor
+
+
+# Copy an uploaded file to temporary storage so worker processes can open it by path
+def spool_upload(file_storage, spool_dir=None):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir=spool_dir) as spooled:
+        file_storage.stream.seek(0)
+        shutil.copyfileobj(file_storage.stream, spooled)
+        return spooled.name
+
+
+# Runs inside a worker process: extract one contiguous range of pages
+def extract_page_range(path, start, stop):
+    reader = PdfReader(path)
+    return [(number + 1, reader.pages[number].extract_text() or "") for number in range(start, stop)]
+
+
+def iter_pdf_pages(path):
+    """Yield ``(page_number, text)`` for every page of the PDF at ``path``, in order.
+
+    Page ranges are extracted in parallel, but only a bounded window of ranges is
+    in flight at once so a slow consumer does not pile extracted text up in memory.
+    """
+    page_count = len(PdfReader(path).pages)
+    ranges = [
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    ]
+
+    if PDF_EXTRACT_WORKERS <= 1 or len(ranges) <= 1:
+        for start, stop in ranges:
+            yield from extract_page_range(path, start, stop)
+        return
+
+    executor = get_executor()
+    in_flight = deque()
+    pending = iter(ranges)
+    for start, stop in pending:
+        in_flight.append(executor.submit(extract_page_range, path, start, stop))
+        if len(in_flight) >= PDF_EXTRACT_WORKERS * 2:
+            break
+
+    while in_flight:
+        pages = in_flight.popleft().result()
+        next_range = next(pending, None)
+        if next_range is not None:
+            in_flight.append(executor.submit(extract_page_range, path, *next_range))
+        yield from pages
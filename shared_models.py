@@ -0,0 +1,64 @@
+import os
+import threading
+
+from langchain_core.embeddings import Embeddings
+
+# Sentence-transformer shared by KeyBERT (app.py) and the local RAG embedding backend (newapp.py)
+SENTENCE_MODEL_NAME = os.getenv("SENTENCE_MODEL", "all-MiniLM-L6-v2")
+
+# Embedding backend for KeyBERT: "torch" runs the shared sentence-transformer, "onnx" an
+# int8-quantized ONNX export of it (see onnx_backend.py), several times faster on CPU
+KEYBERT_BACKEND = os.getenv("KEYBERT_BACKEND", "torch")
+if KEYBERT_BACKEND not in ("torch", "onnx"):
+    raise ValueError(f"Unknown KEYBERT_BACKEND '{KEYBERT_BACKEND}'. Use torch or onnx.")
+
+# Chunks encoded per forward pass by the local embedding backend
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+
+_lock = threading.Lock()
+_sentence_model = None
+_kw_model = None
+
+
+def get_sentence_model():
+    """Load the MiniLM sentence-transformer once per process, on CPU."""
+    global _sentence_model
+    with _lock:
+        if _sentence_model is None:
+            from sentence_transformers import SentenceTransformer
+            _sentence_model = SentenceTransformer(SENTENCE_MODEL_NAME, device="cpu")
+        return _sentence_model
+
+
+def get_kw_model():
+    """KeyBERT wrapping the shared sentence-transformer instead of loading its own copy,
+    or its quantized ONNX export when KEYBERT_BACKEND is "onnx"."""
+    global _kw_model
+    if _kw_model is not None:
+        return _kw_model
+    if KEYBERT_BACKEND == "onnx":
+        from onnx_backend import OnnxSentenceEmbedder
+        model = OnnxSentenceEmbedder(SENTENCE_MODEL_NAME)
+    else:
+        model = get_sentence_model()
+    with _lock:
+        if _kw_model is None:
+            from keybert import KeyBERT
+            _kw_model = KeyBERT(model=model)
+        return _kw_model
+
+
+class LocalEmbeddings(Embeddings):
+    """In-process embeddings from the shared sentence-transformer, batched on CPU."""
+
+    def __init__(self, batch_size=LOCAL_EMBEDDING_BATCH_SIZE):
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts):
+        vectors = get_sentence_model().encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
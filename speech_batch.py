@@ -0,0 +1,142 @@
+import os
+
+# One process per core; keep numerical libraries from also spawning a thread per core in each
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+import sys
+import json
+import hashlib
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".aiff", ".aif", ".mp3", ".ogg")
+
+# Written last in a recording's output directory; its presence means the recording is done
+DONE_MARKER = "done.json"
+ERROR_FILE = "error.txt"
+
+
+def find_recordings(source, extensions=AUDIO_EXTENSIONS):
+    """Audio files under a directory (recursively), or the paths listed in a manifest.
+
+    A manifest is a text file with one path per line, or a CSV with a ``path`` column;
+    relative paths are taken relative to the manifest.
+    """
+    if os.path.isdir(source):
+        found = []
+        for root, _, files in os.walk(source):
+            found.extend(os.path.join(root, name) for name in files if name.lower().endswith(extensions))
+        return sorted(found)
+
+    base = os.path.dirname(os.path.abspath(source))
+    if source.lower().endswith(".csv"):
+        paths = pd.read_csv(source)["path"].dropna().astype(str).tolist()
+    else:
+        with open(source) as f:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [path if os.path.isabs(path) else os.path.join(base, path) for path in paths]
+
+
+def recording_output_dir(output_root, audio_file):
+    """Per-recording output directory; the path hash keeps same-named files apart."""
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    digest = hashlib.sha1(os.path.abspath(audio_file).encode("utf-8")).hexdigest()[:8]
+    return os.path.join(output_root, f"{stem}-{digest}")
+
+
+def analyze_recording(audio_file, output_dir):
+    """Run the full single-file report into ``output_dir`` (executed in a worker process)."""
+    from speech_report import process_audio_file
+
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        metrics = process_audio_file(audio_file, output_dir=output_dir)
+        if metrics is None:
+            raise RuntimeError("Report generation failed; see the worker output")
+    except Exception:
+        with open(os.path.join(output_dir, ERROR_FILE), "w") as f:
+            f.write(traceback.format_exc())
+        raise
+
+    record = {"recording": audio_file, "output_dir": output_dir, **metrics}
+    tmp_path = os.path.join(output_dir, f"{DONE_MARKER}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(record, f, default=str)
+    os.replace(tmp_path, os.path.join(output_dir, DONE_MARKER))
+    if os.path.exists(os.path.join(output_dir, ERROR_FILE)):
+        os.remove(os.path.join(output_dir, ERROR_FILE))  # Left by an earlier failed attempt
+    return record
+
+
+def run_batch(recordings, output_root, workers=None):
+    """Analyze every recording not already done; returns ``(records, failures)``.
+
+    Records of recordings finished by earlier runs are read back from their markers,
+    so the combined table always covers everything done so far.
+    """
+    records, failures, pending = [], [], []
+    for audio_file in recordings:
+        output_dir = recording_output_dir(output_root, audio_file)
+        marker = os.path.join(output_dir, DONE_MARKER)
+        if os.path.exists(marker):
+            with open(marker) as f:
+                records.append(json.load(f))
+        else:
+            pending.append((audio_file, output_dir))
+
+    print(f"{len(records)} recordings already done, {len(pending)} to process")
+    if not pending:
+        return records, failures
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(analyze_recording, audio_file, output_dir): audio_file
+                   for audio_file, output_dir in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            audio_file = futures[future]
+            try:
+                records.append(future.result())
+                print(f"[{done}/{len(pending)}] {audio_file}")
+            except Exception as e:
+                failures.append({"recording": audio_file, "error": str(e)})
+                print(f"[{done}/{len(pending)}] {audio_file} failed: {e}")
+    return records, failures
+
+
+def write_table(records, output_root, table_format="csv"):
+    """Write all metrics, one row per recording, as metrics.csv or metrics.parquet."""
+    table = pd.DataFrame(records).sort_values("recording")
+    path = os.path.join(output_root, f"metrics.{table_format}")
+    if table_format == "parquet":
+        table.to_parquet(path, index=False)  # Needs pyarrow or fastparquet
+    else:
+        table.to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of recordings in parallel")
+    parser.add_argument("source", help="directory of recordings, or a manifest (.txt with one path per line, or .csv with a path column)")
+    parser.add_argument("--output", default="speech_analysis_output", help="root folder for per-recording outputs")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="format of the combined metrics table")
+    args = parser.parse_args()
+
+    recordings = find_recordings(args.source)
+    if not recordings:
+        print(f"No recordings found in {args.source}")
+        sys.exit(1)
+
+    os.makedirs(args.output, exist_ok=True)
+    records, failures = run_batch(recordings, args.output, args.workers)
+    if records:
+        print(f"Metrics for {len(records)} recordings written to {write_table(records, args.output, args.format)}")
+    if failures:
+        with open(os.path.join(args.output, "failures.json"), "w") as f:
+            json.dump(failures, f, indent=2)
+        print(f"{len(failures)} recordings failed; rerun to retry them (see failures.json)")
+        sys.exit(1)
@@ -2,16 +2,77 @@ import parselmouth
 from parselmouth.praat import call
 import pandas as pd
 import speech_recognition as sr
-import librosa
 import numpy as np
 import matplotlib.pyplot as plt
 from fpdf import FPDF
 import sys
 import os
 import matplotlib
+from functools import cached_property
+from speech_stream import Envelope, plot_envelope
+from vad import segment
 
 matplotlib.use('Agg')
 
+class AnalysisContext:
+    """One recording, decoded once, with the Praat analyses that metrics and plots share.
+
+    Each derived object (Pitch, Intensity, Formant, Harmonicity, PointProcess) is computed
+    on first access and reused afterwards. Pitch uses the f0 range given here, so every
+    consumer sees the same pitch track.
+    """
+
+    def __init__(self, audio_file, f0min=75, f0max=300):
+        self.audio_file = audio_file
+        self.f0min = f0min
+        self.f0max = f0max
+        self.sound = parselmouth.Sound(audio_file)
+
+    @cached_property
+    def samples(self):
+        # Mono samples as librosa.load(sr=None) would return them, without decoding again
+        return self.sound.values.mean(axis=0).astype(np.float32)
+
+    @property
+    def sampling_rate(self):
+        return int(self.sound.sampling_frequency)
+
+    @cached_property
+    def duration(self):
+        return call(self.sound, "Get total duration")
+
+    @cached_property
+    def vad(self):
+        # Speech/pause segmentation, syllable nuclei and rhythm (see vad.segment)
+        return segment(self.samples, self.sampling_rate, self.f0min, self.f0max)
+
+    @cached_property
+    def pitch(self):
+        return call(self.sound, "To Pitch", 0.0, self.f0min, self.f0max)
+
+    @cached_property
+    def intensity(self):
+        return self.sound.to_intensity()
+
+    @cached_property
+    def formant(self):
+        return self.sound.to_formant_burg()
+
+    @cached_property
+    def harmonicity(self):
+        return call(self.sound, "To Harmonicity (cc)", 0.01, self.f0min, 0.1, 1.0)
+
+    @cached_property
+    def point_process(self):
+        # Same result as "To PointProcess (periodic, cc)", which would compute the pitch again
+        return call([self.sound, self.pitch], "To PointProcess (cc)")
+
+# Function to accept either an audio file path or an existing AnalysisContext
+def as_context(audio, f0min=75, f0max=300):
+    if isinstance(audio, AnalysisContext):
+        return audio
+    return AnalysisContext(audio, f0min, f0max)
+
 # Function to transcribe audio using Google Web Speech API
 def transcribe_speech(audio_file):
     recognizer = sr.Recognizer()
@@ -27,14 +88,14 @@ def transcribe_speech(audio_file):
 
 # Function to measure source acoustics (pitch, jitter, shimmer, etc.)
 def measurePitch(voiceID, f0min, f0max, unit="Hertz"):
-    sound = parselmouth.Sound(voiceID)  # Read the sound
-    duration = call(sound, "Get total duration")  # Get total duration
-    pitch = call(sound, "To Pitch", 0.0, f0min, f0max)  # Create a pitch object in Praat
+    context = as_context(voiceID, f0min, f0max)  # Read the sound, unless already loaded
+    sound = context.sound
+    duration = context.duration  # Get total duration
+    pitch = context.pitch  # Pitch object in Praat
     meanF0 = call(pitch, "Get mean", 0, 0, unit)  # Get mean pitch
     stdevF0 = call(pitch, "Get standard deviation", 0 ,0, unit)  # Get standard deviation of pitch
-    harmonicity = call(sound, "To Harmonicity (cc)", 0.01, f0min, 0.1, 1.0)
-    hnr = call(harmonicity, "Get mean", 0, 0)  # Harmonics-to-noise ratio (HNR)
-    pointProcess = call(sound, "To PointProcess (periodic, cc)", f0min, f0max)
+    hnr = call(context.harmonicity, "Get mean", 0, 0)  # Harmonics-to-noise ratio (HNR)
+    pointProcess = context.point_process
 
     # Jitter and Shimmer calculations
     localJitter = call(pointProcess, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
@@ -69,26 +130,32 @@ def calculate_speech_sound_accuracy(transcription, phoneme_prediction):
 
 # Fluency Metrics Calculation
 def calculate_fluency_metrics(transcript, audio_file):
-    audio, sr = librosa.load(audio_file, sr=None)
-    duration = librosa.get_duration(y=audio, sr=sr)
-    
+    context = as_context(audio_file)
+    duration = context.duration
+    vad = context.vad
+
     words = transcript.split()
     word_count = len(words)
     wpm = (word_count / duration) * 60
 
-    # Detect pauses (approximation)
-    pause_durations = librosa.effects.split(audio, top_db=30)  # Silence detection
-    avg_pause_duration = sum([end - start for start, end in pause_durations]) / len(pause_durations)
+    # Pauses are silences between stretches of speech, in seconds
+    pause_durations = vad["pause_durations"]
+    avg_pause_duration = float(pause_durations.mean()) if len(pause_durations) else 0.0
 
     return {
         "Words per Minute (WPM)": wpm,
-        "Average Pause Duration (s)": avg_pause_duration
+        "Average Pause Duration (s)": avg_pause_duration,
+        "Pause Count": len(pause_durations),
+        "Pauses per Minute": len(pause_durations) / duration * 60,
+        "Pause Duration Histogram": vad["pause_histogram"],
+        "Speech Time Ratio (%)": vad["speech_time"] / duration * 100,
+        "Articulation Rate (syllables/s)": vad["articulation_rate"],
+        "Speech Rate (syllables/s)": vad["speech_rate"]
     }
 
 # Voice Quality Metrics (Partially dynamic)
 def calculate_voice_quality_metrics(audio_file):
-    sound = parselmouth.Sound(audio_file)
-    intensity = sound.to_intensity()
+    intensity = as_context(audio_file).intensity
 
     # Vocal intensity range
     vocal_intensity = intensity.values.max() - intensity.values.min()
@@ -105,10 +172,10 @@ def calculate_voice_quality_metrics(audio_file):
         "Breathiness Ratio": breathiness
     }
 
-# Prosody Metrics (Partially dynamic)
+# Prosody Metrics
 def calculate_prosody_metrics(audio_file):
-    sound = parselmouth.Sound(audio_file)
-    pitch = sound.to_pitch()
+    context = as_context(audio_file)
+    pitch = context.pitch
 
     # Intonation range calculation
     pitch_values = pitch.selected_array['frequency']
@@ -116,14 +183,14 @@ def calculate_prosody_metrics(audio_file):
 
     return {
         "Intonation Patterns (Hz)": pitch_range,
-        "Stress and Emphasis (Mock Value)": 0.4,  # Requires more complex analysis
-        "Rhythm Consistency (Mock Value)": 0.1  # Requires more complex analysis
+        "Stress and Emphasis (dB)": context.vad["nucleus_intensity_std_db"],  # Loudness spread across syllables
+        "Rhythm Variability (nPVI)": context.vad["npvi"],  # Between successive syllable intervals
+        "Rhythm Variability (Varco)": context.vad["varco"]
     }
 
 # Acoustic Analysis Metrics
 def calculate_acoustic_analysis_metrics(audio_file):
-    sound = parselmouth.Sound(audio_file)
-    formants = sound.to_formant_burg()
+    formants = as_context(audio_file).formant
 
     f1 = call(formants, "Get mean", 1, 0, 0, "Hertz")  # Formant 1
     f2 = call(formants, "Get mean", 2, 0, 0, "Hertz")  # Formant 2
@@ -138,11 +205,14 @@ def calculate_acoustic_analysis_metrics(audio_file):
 # Generate and save report to text file
 def generate_and_save_report(audio_file, transcription, phoneme_prediction, report_folder, report_filename, f0min=75, f0max=300, unit="Hertz"):
     try:
+        # Decode the audio once; every metric below shares it and its Praat analyses
+        context = as_context(audio_file, f0min, f0max)
+
         # Transcribe the audio
-        transcript = transcribe_speech(audio_file)
+        transcript = transcribe_speech(context.audio_file)
 
         # Use the measurePitch function to extract acoustic features
-        acoustic_metrics = measurePitch(audio_file, f0min, f0max, unit)
+        acoustic_metrics = measurePitch(context, f0min, f0max, unit)
 
         # Calculate phoneme-related articulation metrics
         phoneme_accuracy = calculate_phoneme_accuracy(transcription, phoneme_prediction)
@@ -151,12 +221,12 @@ def generate_and_save_report(audio_file, transcription, phoneme_prediction, repo
         speech_sound_accuracy = calculate_speech_sound_accuracy(transcription, phoneme_prediction)
 
         # Calculate fluency metrics
-        fluency_metrics = calculate_fluency_metrics(transcript, audio_file)
+        fluency_metrics = calculate_fluency_metrics(transcript, context)
 
         # Calculate additional voice quality, prosody, and comprehension/language metrics
-        voice_quality_metrics = calculate_voice_quality_metrics(audio_file)
-        prosody_metrics = calculate_prosody_metrics(audio_file)
-        acoustic_analysis_metrics = calculate_acoustic_analysis_metrics(audio_file)
+        voice_quality_metrics = calculate_voice_quality_metrics(context)
+        prosody_metrics = calculate_prosody_metrics(context)
+        acoustic_analysis_metrics = calculate_acoustic_analysis_metrics(context)
 
         # Combine all metrics into a single report
         metrics = {
@@ -214,20 +284,17 @@ def draw_pitch(pitch):
 
 # Save all plots to files
 def generate_plots(audio_file, image_folder):
-    sound = parselmouth.Sound(audio_file)
+    context = as_context(audio_file)
+    sound = context.sound
 
-    # Plot waveform
-    plt.figure()
-    plt.plot(sound.xs(), sound.values.T)
-    plt.xlim([sound.xmin, sound.xmax])
-    plt.xlabel("time [s]")
-    plt.ylabel("amplitude")
+    # Plot waveform as a min/max envelope; drawing every sample is slow for long recordings
+    envelope = Envelope(len(context.samples), context.sampling_rate)
+    envelope.add(context.samples, 0)
     waveform_path = os.path.join(image_folder, "waveform.png")
-    plt.savefig(waveform_path)
-    plt.close()
+    plot_envelope(envelope, waveform_path)
 
     # Spectrogram + intensity
-    intensity = sound.to_intensity()
+    intensity = context.intensity
     spectrogram = sound.to_spectrogram()
     plt.figure()
     draw_spectrogram(spectrogram)
@@ -239,7 +306,7 @@ def generate_plots(audio_file, image_folder):
     plt.close()
 
     # Spectrogram + pitch
-    pitch = sound.to_pitch()
+    pitch = context.pitch
     pre_emphasized_snd = sound.copy()
     pre_emphasized_snd.pre_emphasize()
     spectrogram = pre_emphasized_snd.to_spectrogram(window_length=0.03, maximum_frequency=8000)
@@ -295,9 +362,10 @@ def generate_pdf_report(metrics, image_folder, pdf_folder, pdf_filename="report.
     pdf_output_path = os.path.join(pdf_folder, pdf_filename)
     pdf.output(pdf_output_path)
 
-def process_audio_file(audio_file_path):
+def process_audio_file(audio_file_path, output_dir="speech_analysis_output"):
     """
-    Function to process the audio file: generate plots, report, and PDF.
+    Function to process the audio file: generate plots, report, and PDF under output_dir.
+    Returns the metrics (None if the report could not be generated).
     """
     print("Processing audio file:", audio_file_path)
     
@@ -305,7 +373,7 @@ def process_audio_file(audio_file_path):
     audio_file = os.path.normpath(audio_file_path)
 
     # Create parent folder
-    parent_folder = "speech_analysis_output"
+    parent_folder = output_dir
     os.makedirs(parent_folder, exist_ok=True)
 
     # Create subdirectories for images, reports, and PDFs
@@ -317,8 +385,11 @@ def process_audio_file(audio_file_path):
     os.makedirs(report_folder, exist_ok=True)
     os.makedirs(pdf_folder, exist_ok=True)
 
+    # Decode the audio once for the plots and every metric
+    context = AnalysisContext(audio_file)
+
     # Generate plots and save them in the image folder
-    generate_plots(audio_file, image_folder)
+    generate_plots(context, image_folder)
     
     # Dummy transcription and phoneme prediction
     transcription = ["k", "a", "t"]  # Correct transcription of "cat"
@@ -326,16 +397,16 @@ def process_audio_file(audio_file_path):
 
     # Generate and save the report with metrics
     report_filename = "speech_report.txt"
-    metrics = generate_and_save_report(audio_file, transcription, phoneme_prediction, report_folder, report_filename)
-
-    # Generate the PDF report and save it in the pdf folder
-    pdf_filename = "report.pdf"
-    generate_pdf_report(metrics, image_folder, pdf_folder, pdf_filename)
+    metrics = generate_and_save_report(context, transcription, phoneme_prediction, report_folder, report_filename)
 
-    # Print the metrics if available
+    # Generate the PDF report and save it in the pdf folder, and print the metrics if available
     if metrics is not None:
+        pdf_filename = "report.pdf"
+        generate_pdf_report(metrics, image_folder, pdf_folder, pdf_filename)
         print(metrics)
 
+    return metrics
+
 # Main entry point
 if __name__ == "__main__":
     if len(sys.argv) < 2:
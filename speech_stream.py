@@ -0,0 +1,297 @@
+import os
+import sys
+import csv
+import json
+import argparse
+
+import numpy as np
+import soundfile as sf
+import parselmouth
+from parselmouth.praat import call
+import matplotlib
+import matplotlib.pyplot as plt
+
+import vad
+
+matplotlib.use('Agg')
+
+# Audio analyzed at a time; memory use depends on this, not on the recording length
+WINDOW_SECONDS = float(os.getenv("SPEECH_WINDOW_SECONDS", "30"))
+
+# Points in the waveform envelope plot, whatever the recording length
+ENVELOPE_POINTS = 4000
+
+
+class RunningStats:
+    """Count, mean, variance, min and max that can be updated and merged in any order.
+
+    Two accumulators combine with Chan et al.'s parallel update, so per-window
+    statistics merge into exact global ones without keeping the samples.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=np.inf, maximum=-np.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def of(cls, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2, self.min, self.max = other.count, other.mean, other.m2, other.min, other.max
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def update(self, values):
+        return self.merge(RunningStats.of(values))
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0, "mean": None, "std": None, "min": None, "max": None}
+        return {"count": self.count, "mean": self.mean, "std": self.std, "min": self.min, "max": self.max}
+
+
+class Envelope:
+    """Min/max envelope of a recording at a fixed number of points, filled window by window."""
+
+    def __init__(self, total_frames, sampling_rate, points=ENVELOPE_POINTS):
+        self.bin_size = max(1, int(np.ceil(total_frames / points)))
+        bins = int(np.ceil(total_frames / self.bin_size)) or 1
+        self.minimum = np.full(bins, np.nan)
+        self.maximum = np.full(bins, np.nan)
+        self.sampling_rate = sampling_rate
+
+    def add(self, samples, offset):
+        bins = (offset + np.arange(len(samples))) // self.bin_size
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+        indices = bins[starts]
+        # A bin can straddle two windows, so fold into what is already there
+        self.minimum[indices] = np.fmin(self.minimum[indices], np.minimum.reduceat(samples, starts))
+        self.maximum[indices] = np.fmax(self.maximum[indices], np.maximum.reduceat(samples, starts))
+
+    def times(self):
+        return (np.arange(len(self.minimum)) + 0.5) * self.bin_size / self.sampling_rate
+
+
+# Function to draw a waveform from its envelope instead of every sample
+def plot_envelope(envelope, path):
+    plt.figure()
+    plt.fill_between(envelope.times(), envelope.minimum, envelope.maximum, linewidth=0.5)
+    plt.xlim([0, len(envelope.minimum) * envelope.bin_size / envelope.sampling_rate])
+    plt.xlabel("time [s]")
+    plt.ylabel("amplitude")
+    plt.savefig(path)
+    plt.close()
+
+
+class NoiseFloor:
+    """Running estimate of ``vad``'s noise floor over every frame seen so far.
+
+    Frame energies go into a fixed histogram of ``resolution`` dB bins, so the percentile
+    covers the whole recording up to the current window without keeping its frames.
+    """
+
+    def __init__(self, low=-120.0, high=40.0, resolution=0.25, percentile=vad.NOISE_FLOOR_PERCENTILE):
+        self.edges = np.arange(low, high + resolution, resolution)
+        self.counts = np.zeros(len(self.edges), dtype=np.int64)
+        self.percentile = percentile
+
+    def update(self, energy_db):
+        bins = np.clip(np.searchsorted(self.edges, energy_db), 0, len(self.edges) - 1)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+    @property
+    def level(self):
+        cumulative = np.cumsum(self.counts)
+        return float(self.edges[np.searchsorted(cumulative, self.percentile / 100 * cumulative[-1])])
+
+
+class PauseTracker:
+    """Pauses from per-frame silence flags, including pauses spanning window boundaries.
+
+    As in ``vad.segment``, only silences between speech are pauses: silence before the
+    first speech frame and after the last one is not counted.
+    """
+
+    def __init__(self, frame_step, min_pause=vad.MIN_PAUSE_SECONDS):
+        self.frame_step = frame_step
+        self.min_pause = min_pause
+        self.heard_speech = False
+        self.open_run = 0   # Silent frames at the end of the previous window
+        self.durations = RunningStats()
+
+    def add(self, silent):
+        """Returns durations (s) of pauses that ended in this window."""
+        if not self.heard_speech:
+            speech = np.flatnonzero(~silent)
+            if not len(speech):
+                return np.zeros(0)
+            silent = silent[speech[0]:]
+            self.heard_speech = True
+        edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        closed = []
+        if self.open_run:
+            if len(starts) and starts[0] == 0:
+                lengths[0] += self.open_run  # The pause continues into this window
+            else:
+                closed.append(self.open_run)
+        self.open_run = 0
+        # A run touching the end of the window may continue in the next one
+        if len(ends) and ends[-1] == len(silent):
+            self.open_run = int(lengths[-1])
+            lengths = lengths[:-1]
+        return self._close(np.concatenate((np.array(closed, dtype=int), lengths)))
+
+    def finish(self):
+        """End of the recording: a silent run still open is trailing silence, not a pause."""
+        self.open_run = 0
+
+    def _close(self, lengths):
+        durations = lengths * self.frame_step
+        durations = durations[durations >= self.min_pause]
+        self.durations.update(durations)
+        return durations
+
+
+def analyze_window(samples, sampling_rate, start_time, f0min, f0max):
+    """Pitch, intensity and formant tracks of one window, as arrays over its frames."""
+    if len(samples) < 0.1 * sampling_rate:
+        # Too short a tail for Praat's analyses; it still counts towards duration and envelope
+        return {"f0": np.zeros(0), "voiced_fraction": 0.0, "intensity": np.zeros(0), "formants": np.zeros((3, 0))}
+    sound = parselmouth.Sound(samples.astype(np.float64), sampling_frequency=sampling_rate, start_time=start_time)
+    pitch = call(sound, "To Pitch", 0.0, f0min, f0max)
+    f0 = pitch.selected_array['frequency']
+    intensity = sound.to_intensity(minimum_pitch=f0min) if sound.duration > 6.4 / f0min else None
+    formant = sound.to_formant_burg()
+    # One matrix per formant number holds its value in every frame; 0 marks an undefined one
+    formants = np.vstack([call(formant, "To Matrix", n).values[0] for n in (1, 2, 3)])
+    formants[formants <= 0] = np.nan
+    return {
+        "f0": f0[f0 > 0],
+        "voiced_fraction": float(np.mean(f0 > 0)) if len(f0) else 0.0,
+        "intensity": intensity.values[0] if intensity is not None else np.zeros(0),
+        "formants": formants,
+    }
+
+
+def iter_windows(audio_file, window_seconds=WINDOW_SECONDS):
+    """Yield ``(mono samples, start frame)`` blocks of ``window_seconds``, decoded one at a time."""
+    info = sf.info(audio_file)
+    block = int(window_seconds * info.samplerate)
+    offset = 0
+    for data in sf.blocks(audio_file, blocksize=block, dtype='float32', always_2d=True):
+        yield data.mean(axis=1), offset
+        offset += len(data)
+
+
+def analyze_stream(audio_file, output_dir, window_seconds=WINDOW_SECONDS, f0min=75, f0max=300):
+    """Analyze a recording of any length window by window with flat memory use.
+
+    Writes ``windows.csv`` (one row per window, as each window finishes), ``summary.json``
+    (global statistics merged from the windows) and ``waveform.png`` (envelope plot)
+    into ``output_dir``, and returns the summary.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    info = sf.info(audio_file)
+    sampling_rate = info.samplerate
+
+    f0_stats, intensity_stats = RunningStats(), RunningStats()
+    formant_stats = [RunningStats() for _ in range(3)]
+    envelope = Envelope(info.frames, sampling_rate)
+    pauses = PauseTracker(vad.HOP_SECONDS)
+    noise_floor = NoiseFloor()
+    # Samples after the last whole VAD frame of a window start the next window's first frame
+    hop = int(vad.HOP_SECONDS * sampling_rate)
+    carry = np.zeros(0, dtype=np.float32)
+
+    columns = ["start_s", "end_s", "mean_f0_hz", "std_f0_hz", "voiced_fraction", "mean_intensity_db",
+               "pauses", "pause_time_s", "f1_hz", "f2_hz", "f3_hz"]
+    with open(os.path.join(output_dir, "windows.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        windows = 0
+        for samples, offset in iter_windows(audio_file, window_seconds):
+            start = offset / sampling_rate
+            envelope.add(samples, offset)
+            result = analyze_window(samples, sampling_rate, start, f0min, f0max)
+
+            window_f0 = RunningStats.of(result["f0"])
+            window_intensity = RunningStats.of(result["intensity"])
+            window_formants = [RunningStats.of(track) for track in result["formants"]]
+            f0_stats.merge(window_f0)
+            intensity_stats.merge(window_intensity)
+            for total, window in zip(formant_stats, window_formants):
+                total.merge(window)
+
+            # Frames are classified by the same detector vad.segment uses for whole recordings,
+            # on the same hop grid and against a noise floor estimated over the recording so far
+            framed = np.concatenate((carry, samples))
+            energy_db, _, voicing = vad.frame_features(framed, sampling_rate, f0min, f0max)
+            carry = framed[len(energy_db) * hop:]
+            ended = np.zeros(0)
+            if len(energy_db):
+                noise_floor.update(energy_db)
+                ended = pauses.add(~vad.speech_mask(energy_db, voicing, noise_floor.level))
+
+            writer.writerow([
+                round(start, 3), round((offset + len(samples)) / sampling_rate, 3),
+                window_f0.summary()["mean"], window_f0.summary()["std"], round(result["voiced_fraction"], 4),
+                window_intensity.summary()["mean"], len(ended), round(float(ended.sum()), 3),
+                *(stats.summary()["mean"] for stats in window_formants),
+            ])
+            windows += 1
+
+    pauses.finish()
+    plot_envelope(envelope, os.path.join(output_dir, "waveform.png"))
+
+    pause_stats = pauses.durations
+    summary = {
+        "recording": audio_file,
+        "duration_s": info.frames / sampling_rate,
+        "windows": windows,
+        "f0_hz": f0_stats.summary(),
+        "intensity_db": intensity_stats.summary(),
+        "pause_s": pause_stats.summary(),
+        "pause_time_s": pause_stats.mean * pause_stats.count,
+        **{f"f{n}_hz": stats.summary() for n, stats in enumerate(formant_stats, start=1)},
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Windowed analysis of long recordings with bounded memory")
+    parser.add_argument("audio_file")
+    parser.add_argument("--output", default=os.path.join("speech_analysis_output", "stream"))
+    parser.add_argument("--window", type=float, default=WINDOW_SECONDS, help="window length in seconds")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio_file):
+        print(f"File not found: {args.audio_file}")
+        sys.exit(1)
+    print(json.dumps(analyze_stream(args.audio_file, args.output, args.window), indent=2))
@@ -0,0 +1,39 @@
+import os
+import time
+import resource
+
+# Imported first by app.py, so this marks the start of application import
+PROCESS_STARTED = time.perf_counter()
+
+_marks = {}
+
+
+def mark(name):
+    """Record seconds elapsed since import started, e.g. mark("app_imported")."""
+    _marks[name] = round(time.perf_counter() - PROCESS_STARTED, 3)
+
+
+def memory_usage():
+    """Resident, shared and private memory of this process in bytes.
+
+    Shared memory includes pages still shared copy-on-write with the gunicorn master,
+    which is where preloaded model weights show up in forked workers.
+    """
+    usage = {"max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith(" "))
+    except OSError:
+        return usage
+
+    def kb(name):
+        return int(fields.get(name, "0 kB").split()[0]) * 1024
+
+    usage["rss_bytes"] = kb("Rss")
+    usage["shared_bytes"] = kb("Shared_Clean") + kb("Shared_Dirty")
+    usage["private_bytes"] = kb("Private_Clean") + kb("Private_Dirty")
+    return usage
+
+
+def report():
+    return {"pid": os.getpid(), "timings_seconds": dict(_marks), **memory_usage()}
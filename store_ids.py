@@ -0,0 +1,10 @@
+import os
+import re
+
+# Corpus and collection ids double as directory names, so keep them to a safe alphabet
+STORE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+# One cache directory per model, e.g. embedding_cache/models-embedding-001
+def model_cache_dir(root, model_name):
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "-", model_name))
@@ -0,0 +1,50 @@
+import os
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeSentenceModel:
+    """Deterministic embeddings: one random vector per distinct text."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return np.array([np.random.default_rng(zlib.crc32(text.encode())).normal(size=8) for text in texts],
+                        dtype=np.float32)
+
+
+class FakeKeyBERT:
+    """Scores each document's candidate words by cosine similarity, as KeyBERT does."""
+
+    def __init__(self):
+        self.model = FakeSentenceModel()
+        self.calls = []
+
+    def extract_keywords(self, docs, keyphrase_ngram_range, stop_words, top_n, doc_embeddings, word_embeddings):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.calls.append(list(docs))
+        count = CountVectorizer(ngram_range=keyphrase_ngram_range, stop_words=stop_words).fit(docs)
+        words = count.get_feature_names_out()
+        assert len(words) == len(word_embeddings)
+        results = []
+        for row, doc_embedding in zip(count.transform(docs), doc_embeddings):
+            candidates = row.nonzero()[1]
+            scores = word_embeddings[candidates] @ doc_embedding
+            order = np.argsort(-scores)[:top_n]
+            results.append([(str(words[candidates[i]]), float(scores[i])) for i in order])
+        return results[0] if len(docs) == 1 else results
+
+
+@pytest.fixture
+def kw_model():
+    pytest.importorskip("sklearn")
+    return FakeKeyBERT()
@@ -0,0 +1,69 @@
+import numpy as np
+
+from answer_cache import AnswerCache, normalize_question
+
+SETTINGS = (4, 3000)
+
+
+def cache(**overrides):
+    options = {"max_entries": 8, "ttl_seconds": 3600, "max_distance": 0.05, **overrides}
+    return AnswerCache(**options)
+
+
+def test_trivial_variants_normalize_alike():
+    assert normalize_question("  What is  FAISS?? ") == normalize_question("what is faiss")
+    assert normalize_question("Is C++ fast?") != normalize_question("Is C fast?")
+
+
+def test_exact_and_semantic_hits():
+    answers = cache()
+    answers.put("docs", 1, SETTINGS, "What is FAISS?", [1.0, 0.0], "a vector index")
+
+    assert answers.get_exact("docs", 1, SETTINGS, "what is faiss") == "a vector index"
+    assert answers.get_similar("docs", 1, SETTINGS, [0.99, 0.05]) == "a vector index"
+    assert answers.get_similar("docs", 1, SETTINGS, [0.0, 1.0]) is None
+    assert answers.stats() == {"entries": 1, "exact_hits": 1, "semantic_hits": 1, "misses": 1}
+
+
+def test_answers_are_scoped_to_retrieval_settings():
+    answers = cache()
+    answers.put("docs", 1, (4, 3000), "What is FAISS?", [1.0, 0.0], "short answer")
+
+    assert answers.get_exact("docs", 1, (8, 3000), "What is FAISS?") is None
+    assert answers.get_exact("docs", 1, (4, 6000), "What is FAISS?") is None
+    assert answers.get_similar("docs", 1, (8, 3000), [1.0, 0.0]) is None
+    answers.put("docs", 1, (8, 3000), "What is FAISS?", [1.0, 0.0], "longer answer")
+    assert answers.get_exact("docs", 1, (4, 3000), "What is FAISS?") == "short answer"
+    assert answers.get_exact("docs", 1, (8, 3000), "What is FAISS?") == "longer answer"
+
+
+def test_new_index_version_drops_answers():
+    answers = cache()
+    answers.put("docs", 1, SETTINGS, "What is FAISS?", [1.0, 0.0], "old")
+    answers.put("other", 1, SETTINGS, "What is FAISS?", [1.0, 0.0], "kept")
+
+    assert answers.get_exact("docs", 2, SETTINGS, "What is FAISS?") is None
+    assert answers.get_exact("docs", 1, SETTINGS, "What is FAISS?") is None
+    assert answers.get_exact("other", 1, SETTINGS, "What is FAISS?") == "kept"
+
+
+def test_expired_answers_are_not_served(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("answer_cache.time.monotonic", lambda: now[0])
+    answers = cache(ttl_seconds=60)
+    answers.put("docs", 1, SETTINGS, "What is FAISS?", [1.0, 0.0], "a vector index")
+    now[0] += 61
+    assert answers.get_exact("docs", 1, SETTINGS, "What is FAISS?") is None
+    assert answers.stats()["entries"] == 0
+
+
+def test_versions_are_forgotten_with_their_last_entry():
+    answers = cache(max_entries=2)
+    for i in range(50):
+        answers.put(f"collection{i}", 1, SETTINGS, "What is FAISS?", np.eye(2)[i % 2], "answer")
+        answers.get_exact(f"unknown{i}", 1, SETTINGS, "What is FAISS?")
+
+    assert answers.stats()["entries"] == 2
+    assert set(answers._versions) == {"collection48", "collection49"}
+    answers.invalidate("collection49")
+    assert set(answers._versions) == {"collection48"}
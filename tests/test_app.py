@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("flask")
+
+import app as app_module
+from keyword_cache import KeywordCache
+from keyword_engine import BatchKeywordEngine
+
+
+@pytest.fixture
+def engine(kw_model):
+    return BatchKeywordEngine(kw_model, cache=KeywordCache(max_bytes=1 << 20))
+
+
+@pytest.fixture
+def client(monkeypatch, engine):
+    monkeypatch.setattr(app_module, "get_keyword_engine", lambda: engine)
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("text", ["", "a", "!!"])
+def test_keybert_keywords_of_wordless_text_are_empty(client, text):
+    response = client.post("/extract_keywords", json={"text": text})
+    assert response.status_code == 200
+    assert response.get_json() == {"keywords": []}
+
+
+def test_keybert_keywords_are_cached_by_text(client, engine):
+    first = client.post("/extract_keywords", json={"text": "sparse attention transformers", "keywords": 2})
+    second = client.post("/extract_keywords", json={"text": "sparse attention transformers", "keywords": 2})
+    assert first.status_code == second.status_code == 200
+    assert first.get_json() == second.get_json()
+    assert len(first.get_json()["keywords"]) == 2
+    assert len(engine.kw_model.calls) == 1
+    assert engine.cache.stats()["keywords"]["hits"] == 1
+
+
+DOCS = ["graph neural networks for molecules", "neural networks on molecular graphs", "tax law in the eu"]
+
+
+def test_dense_comparison_keeps_the_legacy_descriptions(client):
+    response = client.post("/compare_documents", json={"docs": DOCS})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["metric"] == "tfidf_keywords_cosine"
+    assert len(body["similarity_matrix"]) == 3
+    similarity = round(body["similarity_matrix"][0][1] * 100, 2)
+    assert body["similarity_descriptions"][0] == f"Text 1 and Text 2 have a similarity of {similarity}%."
+
+
+def test_sparse_comparison_reports_embedding_cosine(client):
+    response = client.post("/compare_documents", json={"docs": DOCS, "mode": "sparse", "top_k": 1000})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["metric"] == "embedding_cosine"
+    # top_k is clamped, and never exceeds the other documents
+    assert len(body["pairs"]) == 6
+    assert all(description.startswith("Text ") for description in body["similarity_descriptions"])
+
+
+@pytest.mark.parametrize("top_k", [0, -3, "many"])
+def test_sparse_comparison_rejects_bad_top_k(client, top_k):
+    response = client.post("/compare_documents", json={"docs": DOCS, "mode": "sparse", "top_k": top_k})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("payload", [
+    {"docs": ["some text", 42]},
+    {"docs": "some text"},
+    {"docs": ["some text"], "ids": "a"},
+])
+def test_near_duplicates_rejects_malformed_docs(payload):
+    response = app_module.app.test_client().post("/near_duplicates", json=payload)
+    assert response.status_code == 400
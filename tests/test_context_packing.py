@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+import context_packing
+from context_packing import count_tokens, pack_context, split_spans
+
+
+def test_long_paragraphs_split_on_sentences(monkeypatch):
+    monkeypatch.setattr(context_packing, "MAX_SPAN_TOKENS", 12)
+    text = "Short intro.\n\nFirst sentence here. Second sentence follows. Third one closes it out."
+    spans = split_spans(text)
+    assert spans[0] == "Short intro."
+    assert " ".join(spans[1:]) == "First sentence here. Second sentence follows. Third one closes it out."
+    assert all(count_tokens(span) <= 12 for span in spans)
+
+
+def test_packing_respects_the_token_budget():
+    docs = [(Document(page_content="\n\n".join(f"paragraph {i} of chunk {rank} " * 5 for i in range(4)),
+                      metadata={"rank": rank}), 0.1 * rank) for rank in range(3)]
+    for budget in (1, 40, 100, 10000):
+        packed, used = pack_context(docs, "what is in chunk one", budget)
+        assert used <= budget
+        assert used == sum(count_tokens(span) for doc in packed for span in doc.page_content.split("\n\n"))
+
+
+def test_spans_matching_the_question_win_and_keep_reading_order():
+    chunk = Document(
+        page_content="The office opens at nine.\n\nParking is free on weekends.\n\nThe cafeteria serves lunch at noon.",
+        metadata={"source": "handbook.pdf"},
+    )
+    other = Document(page_content="Lunch breaks last one hour at the cafeteria.", metadata={"source": "policy.pdf"})
+    budget = count_tokens("The cafeteria serves lunch at noon.") + count_tokens("The office opens at nine.")
+
+    packed, used = pack_context([(chunk, 0.2), (other, 0.9)], "When does the cafeteria serve lunch?", budget)
+
+    assert used <= budget
+    assert [doc.metadata["source"] for doc in packed] == ["handbook.pdf"]
+    # The lunch span ranks first, but spans of one chunk stay in reading order
+    assert packed[0].page_content == "The office opens at nine.\n\nThe cafeteria serves lunch at noon."
+
+
+def test_nothing_fits_a_tiny_budget():
+    docs = [(Document(page_content="A paragraph that is longer than the budget."), 0.0)]
+    assert pack_context(docs, "paragraph", 2) == ([], 0)
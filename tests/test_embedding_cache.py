@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+import embedding_cache
+from embedding_cache import JOURNAL_FILE, EmbeddingCache
+
+DIM = 4
+
+
+def vector(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+
+def test_round_trip_and_sharing_between_processes(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=1024)
+    cache.put_many([("a", vector(1)), ("b", vector(2))])
+
+    found = cache.get_many(["a", "b", "c"])
+    assert sorted(found) == ["a", "b"]
+    np.testing.assert_array_equal(found["b"], vector(2))
+
+    # A second instance on the same directory stands in for another worker process
+    other = EmbeddingCache(str(tmp_path), max_bytes=1024)
+    np.testing.assert_array_equal(other.get_many(["a"])["a"], vector(1))
+    other.put_many([("c", vector(3))])
+    np.testing.assert_array_equal(cache.get_many(["c"])["c"], vector(3))
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path):
+    # Room for ten rows; going over compacts down to 90%, i.e. nine rows
+    cache = EmbeddingCache(str(tmp_path), max_bytes=10 * DIM * 4)
+    cache.put_many([(f"k{i}", vector(i)) for i in range(10)])
+    assert cache.stats()["evictions"] == 0
+
+    cache.get_many(["k0"])  # k0 is now the most recently used
+    cache.put_many([("k10", vector(10))])
+
+    stats = cache.stats()
+    assert stats["entries"] == 9
+    assert stats["evictions"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    found = cache.get_many([f"k{i}" for i in range(11)])
+    assert sorted(found) == sorted(["k0", "k10"] + [f"k{i}" for i in range(3, 10)])
+    for key, value in found.items():
+        np.testing.assert_array_equal(value, vector(int(key[1:])))
+
+
+def test_puts_append_to_the_journal_instead_of_rewriting_it(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=1024)
+    cache.put_many([("a", vector(1))])
+    journal = (tmp_path / JOURNAL_FILE).read_bytes()
+
+    cache.put_many([("b", vector(2))])
+    grown = (tmp_path / JOURNAL_FILE).read_bytes()
+    assert grown.startswith(journal)
+    assert len(grown.splitlines()) == 3  # header plus one record per row
+
+
+def test_recency_from_another_process_decides_eviction(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_bytes=10 * DIM * 4)
+    cache.put_many([(f"k{i}", vector(i)) for i in range(9)])
+
+    # Another worker reads k0; its tick is written with its next put
+    other = EmbeddingCache(str(tmp_path), max_bytes=10 * DIM * 4)
+    other.get_many(["k0"])
+    other.put_many([("k9", vector(9))])
+
+    cache.put_many([("k10", vector(10))])
+    found = EmbeddingCache(str(tmp_path), max_bytes=10 * DIM * 4).get_many([f"k{i}" for i in range(11)])
+    assert sorted(found) == sorted(["k0"] + [f"k{i}" for i in range(3, 11)])
+    assert sorted(other.get_many(list(found))) == sorted(found)
+
+
+def test_journal_is_compacted_once_recency_records_pile_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "JOURNAL_COMPACT_RATIO", 1)
+    monkeypatch.setattr(embedding_cache, "JOURNAL_COMPACT_SLACK", 0)
+    cache = EmbeddingCache(str(tmp_path), max_bytes=1024)
+    cache.put_many([("a", vector(1)), ("b", vector(2))])
+    for i in range(20):
+        cache.get_many(["a"])
+        cache.put_many([(f"n{i}", vector(i))])
+
+    # Each round adds a row and a recency record, so the journal must have been rewritten
+    lines = (tmp_path / JOURNAL_FILE).read_bytes().splitlines()
+    assert len(lines) <= 1 + 22
+    found = EmbeddingCache(str(tmp_path), max_bytes=1024).get_many(["a", "b", "n19"])
+    np.testing.assert_array_equal(found["n19"], vector(19))
+    assert sorted(found) == ["a", "b", "n19"]
@@ -0,0 +1,91 @@
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+import faiss_index_types
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from faiss_index_types import (
+    choose_index_type, delete_chunks, fit_index_to_size, index_type_of, reconstruct_all, stored_vectors,
+)
+
+DIM = 16
+
+
+class RandomEmbeddings(Embeddings):
+    """Fixed pseudo-random vector per text."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return np.random.default_rng(zlib.crc32(text.encode("utf-8"))).normal(size=DIM).astype(np.float32).tolist()
+
+
+def store_of(count, embeddings=None, index_type="flat", monkeypatch=None):
+    embeddings = embeddings or RandomEmbeddings()
+    texts = [f"chunk {i}" for i in range(count)]
+    store = FAISS.from_embeddings(
+        list(zip(texts, embeddings.embed_documents(texts))), embeddings, ids=[f"id{i}" for i in range(count)]
+    )
+    if index_type != "flat":
+        monkeypatch.setattr(faiss_index_types, "FAISS_INDEX_TYPE", index_type)
+        monkeypatch.setattr(faiss_index_types, "IVFPQ_MIN_VECTORS", 0)
+        fit_index_to_size(store)
+    assert index_type_of(store.index) == index_type
+    return store
+
+
+def test_auto_index_type_follows_vector_count(monkeypatch):
+    monkeypatch.setattr(faiss_index_types, "FLAT_MAX_VECTORS", 100)
+    monkeypatch.setattr(faiss_index_types, "HNSW_MAX_VECTORS", 1000)
+    assert [choose_index_type(n) for n in (0, 100, 101, 1000, 1001)] == ["flat", "flat", "hnsw", "hnsw", "ivfpq"]
+
+    # IVF-PQ cannot be trained on a handful of vectors, even when asked for explicitly
+    monkeypatch.setattr(faiss_index_types, "FAISS_INDEX_TYPE", "ivfpq")
+    assert choose_index_type(faiss_index_types.IVFPQ_MIN_VECTORS - 1) == "flat"
+    assert choose_index_type(faiss_index_types.IVFPQ_MIN_VECTORS) == "ivfpq"
+
+
+def test_growing_store_is_rebuilt_as_hnsw(monkeypatch):
+    monkeypatch.setattr(faiss_index_types, "FLAT_MAX_VECTORS", 50)
+    store = store_of(80)
+    vectors = reconstruct_all(store.index)
+    fit_index_to_size(store)
+    assert index_type_of(store.index) == "hnsw"
+    np.testing.assert_array_equal(reconstruct_all(store.index), vectors)
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "ivfpq"])
+def test_delete_chunks_keeps_ids_and_vectors_aligned(monkeypatch, index_type):
+    store = store_of(400, index_type=index_type, monkeypatch=monkeypatch)
+    delete_chunks(store, [f"id{i}" for i in range(0, 400, 2)])
+
+    assert store.index.ntotal == len(store.index_to_docstore_id) == 200
+    assert index_type_of(store.index) == index_type
+    for i in (1, 101, 399):
+        [(doc, _)] = store.similarity_search_with_score_by_vector(RandomEmbeddings().embed_query(f"chunk {i}"), k=1)
+        assert doc.page_content == f"chunk {i}"
+    assert "id0" not in store.index_to_docstore_id.values()
+    assert store.docstore.search("id0") == "ID id0 not found."
+
+
+def test_ivfpq_is_retrained_on_cached_originals(monkeypatch, tmp_path):
+    embeddings = CachedEmbeddings(RandomEmbeddings(), EmbeddingCache(str(tmp_path), 1 << 20), "random")
+    store = store_of(400, embeddings=embeddings, index_type="ivfpq", monkeypatch=monkeypatch)
+    originals = np.array(RandomEmbeddings().embed_documents([f"chunk {i}" for i in range(400)]), dtype=np.float32)
+
+    # The compressed codes alone only approximate the embeddings
+    assert not np.allclose(reconstruct_all(store.index), originals, atol=1e-3)
+    np.testing.assert_allclose(stored_vectors(store), originals)
+
+    # Rebuilding (here into HNSW, which stores vectors as given) starts from the originals
+    monkeypatch.setattr(faiss_index_types, "FAISS_INDEX_TYPE", "hnsw")
+    fit_index_to_size(store)
+    np.testing.assert_allclose(reconstruct_all(store.index), originals)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+nltk = pytest.importorskip("nltk")
+pytest.importorskip("sklearn")
+
+from sklearn.feature_extraction.text import TfidfTransformer
+
+import idf_corpus
+from idf_corpus import IdfCorpus, score_keywords
+from keyword_extractor import model_registry, preprocess_text
+
+DOCS = [
+    ("a", "Neural networks learn hidden units with back propagation."),
+    ("b", "Support vector machines separate classes with a maximum margin."),
+    ("c", "Deep neural networks need large training sets and regularization."),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def nltk_data():
+    for resource in ("stopwords", "wordnet"):
+        try:
+            nltk.data.find(f"corpora/{resource}")
+        except LookupError:
+            pytest.skip(f"NLTK data '{resource}' is not installed")
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    return model_registry.get()
+
+
+def sklearn_idf(artifacts, texts):
+    counts = artifacts.cv.transform([preprocess_text(text) for text in texts])
+    return TfidfTransformer(smooth_idf=True).fit(counts).idf_
+
+
+def test_idf_matches_scikit_learn(tmp_path, artifacts):
+    corpus = IdfCorpus(str(tmp_path))
+    corpus.add_documents(artifacts, DOCS)
+    np.testing.assert_allclose(corpus.idf(artifacts.feature_names), sklearn_idf(artifacts, [text for _, text in DOCS]))
+
+
+def test_replaced_and_removed_documents_update_idf(tmp_path, artifacts):
+    corpus = IdfCorpus(str(tmp_path))
+    corpus.add_documents(artifacts, DOCS)
+    corpus.add_documents(artifacts, [("a", "Gradient boosting builds an ensemble of decision trees.")])
+    assert corpus.remove_document("b")
+    assert not corpus.remove_document("b")
+
+    expected = sklearn_idf(artifacts, ["Gradient boosting builds an ensemble of decision trees.", DOCS[2][1]])
+    np.testing.assert_allclose(corpus.idf(artifacts.feature_names), expected)
+    assert corpus.stats()["documents"] == 2
+
+
+def test_other_processes_follow_appends_and_compactions(tmp_path, artifacts, monkeypatch):
+    monkeypatch.setattr(idf_corpus, "COMPACT_RATIO", 2)
+    writer, reader = IdfCorpus(str(tmp_path)), IdfCorpus(str(tmp_path))
+    writer.add_documents(artifacts, DOCS)
+    assert reader.stats()["documents"] == 3
+
+    # Replacing the same document over and over triggers compaction
+    for i in range(10):
+        writer.add_documents(artifacts, [("a", f"{DOCS[0][1]} Revision {i} adds dropout.")])
+    assert writer.stats()["journal_entries"] <= 2 * 3
+    np.testing.assert_allclose(reader.idf(artifacts.feature_names), writer.idf(artifacts.feature_names))
+    assert reader.stats() == writer.stats()
+
+
+def test_scores_are_normalized_tfidf_of_the_text(tmp_path, artifacts):
+    corpus = IdfCorpus(str(tmp_path))
+    corpus.add_documents(artifacts, DOCS)
+    idf = corpus.idf(artifacts.feature_names)
+    text = "Neural networks with dropout and regularization generalize on large training sets."
+    keywords = score_keywords(artifacts, idf, text, top_n=3)
+
+    weights = artifacts.cv.transform([preprocess_text(text)]).toarray()[0] * idf
+    weights /= np.linalg.norm(weights)
+    # Equal weights may tie, so check each keyword's own weight against the top three
+    assert list(keywords.values()) == [round(float(w), 3) for w in np.sort(weights)[::-1][:3]]
+    for word, score in keywords.items():
+        assert score == round(float(weights[artifacts.cv.vocabulary_[word]]), 3)
+
+
+def test_corpus_routes_and_404s_for_unknown_corpora(tmp_path, monkeypatch):
+    app_module = pytest.importorskip("app")
+    monkeypatch.setattr(app_module, "IDF_CORPUS_DIR", str(tmp_path))
+    monkeypatch.setattr(app_module, "_idf_corpora", None)
+    client = app_module.app.test_client()
+
+    assert client.get("/idf_corpus/missing").status_code == 404
+    assert client.delete("/idf_corpus/missing/documents/a").status_code == 404
+    assert client.post("/extract_keywords_manual", json={"text": "neural networks", "corpus": "missing"}).status_code == 404
+    assert client.get("/idf_corpus/bad.name").status_code == 400
+
+    response = client.post("/idf_corpus/papers/documents", json={"docs": [{"id": d, "text": t} for d, t in DOCS]})
+    assert response.status_code == 200 and response.get_json()["added"] == 3
+    assert client.get("/idf_corpus/papers").get_json()["documents"] == 3
+    assert client.delete("/idf_corpus/papers/documents/zzz").status_code == 404
+    assert client.delete("/idf_corpus/papers/documents/a").get_json()["documents"] == 2
+    response = client.post("/extract_keywords_manual", json={"text": "neural networks", "corpus": "papers"})
+    assert response.status_code == 200 and response.get_json()
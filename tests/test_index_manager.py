@@ -0,0 +1,87 @@
+import os
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+import index_manager
+from index_manager import CURRENT_FILE, KEEP_VERSIONS, IndexManager
+
+
+@pytest.fixture(autouse=True)
+def json_stores(monkeypatch):
+    """Stores are plain lists saved as JSON, so the tests exercise versioning, not FAISS."""
+    def save_store(store, path):
+        os.makedirs(path)
+        with open(os.path.join(path, "store.json"), "w") as f:
+            json.dump(store, f)
+
+    def load_store(path, embeddings, mmap=True):
+        with open(os.path.join(path, "store.json")) as f:
+            return json.load(f)
+
+    monkeypatch.setattr(index_manager, "save_store", save_store)
+    monkeypatch.setattr(index_manager, "load_store", load_store)
+
+
+def make_manager(root):
+    return IndexManager(str(root), embeddings_factory=lambda: None)
+
+
+def test_commit_publishes_a_new_version(tmp_path):
+    manager = make_manager(tmp_path)
+    assert manager.get() == (None, None)
+
+    version = manager.commit(["a"])
+    with open(tmp_path / CURRENT_FILE) as f:
+        assert f.read() == version
+    assert manager.get() == (["a"], version)
+    assert manager.resident_bytes > 0
+
+    # Another process sharing the directory loads the published version
+    assert make_manager(tmp_path).get() == (["a"], version)
+
+
+def test_commit_keeps_only_recent_versions(tmp_path):
+    manager = make_manager(tmp_path)
+    versions = [manager.commit([i]) for i in range(KEEP_VERSIONS + 2)]
+    remaining = sorted(name for name in os.listdir(tmp_path) if not name.startswith(".") and name != CURRENT_FILE)
+    assert remaining == versions[-KEEP_VERSIONS:]
+
+
+def test_update_starts_from_the_latest_published_version(tmp_path):
+    manager, other = make_manager(tmp_path), make_manager(tmp_path)
+    manager.commit(["a"])
+    manager.get()
+    other.update(lambda store: store + ["b"])
+
+    seen = []
+    manager.update(lambda store: seen.append(store) or store + ["c"])
+    assert seen == [["a", "b"]]
+    assert manager.get()[0] == ["a", "b", "c"]
+
+
+def test_update_without_changes_publishes_nothing(tmp_path):
+    manager = make_manager(tmp_path)
+    version = manager.commit(["a"])
+    assert manager.update(lambda store: None) == version
+    assert manager.get() == (["a"], version)
+
+
+def test_concurrent_updates_do_not_lose_changes(tmp_path):
+    managers = [make_manager(tmp_path) for _ in range(4)]
+
+    def add_items(manager, worker):
+        for i in range(5):
+            manager.update(lambda store: (store or []) + [f"{worker}-{i}"])
+
+    threads = [threading.Thread(target=add_items, args=(manager, n)) for n, manager in enumerate(managers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(make_manager(tmp_path).get()[0]) == sorted(f"{w}-{i}" for w in range(4) for i in range(5))
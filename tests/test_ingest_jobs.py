@@ -0,0 +1,92 @@
+import os
+import time
+
+from ingest_jobs import STATUS_FILE, IngestJob, IngestJobQueue
+
+
+def queue_for(tmp_path, run_job=lambda job: None, **options):
+    return IngestJobQueue(run_job, str(tmp_path), **options)
+
+
+def wait_for(jobs, job_id, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = jobs.status(job_id)
+        if status and status["state"] == state:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {state}: {jobs.status(job_id)}")
+
+
+def test_job_runs_and_its_uploads_are_removed(tmp_path):
+    def run_job(job):
+        job.update(chunks_total=3)
+        job.increment("chunks_embedded", 3)
+
+    jobs = queue_for(tmp_path, run_job)
+    job = jobs.create_job({})
+    with open(os.path.join(job.dir, "upload.pdf"), "wb") as f:
+        f.write(b"%PDF")
+    jobs.submit(job)
+
+    status = wait_for(jobs, job.id, "succeeded")
+    assert status["progress"]["chunks_embedded"] == 3
+    assert sorted(os.listdir(job.dir)) == [".lock", STATUS_FILE]
+
+
+def test_failing_job_reports_its_error(tmp_path):
+    def run_job(job):
+        raise RuntimeError("not a PDF")
+
+    jobs = queue_for(tmp_path, run_job)
+    job = jobs.submit(jobs.create_job({}))
+    assert wait_for(jobs, job.id, "failed")["error"] == "not a PDF"
+
+
+def test_restart_fails_jobs_whose_process_died(tmp_path):
+    jobs = queue_for(tmp_path)
+    # Saved as running, but no live process holds its lock any more
+    orphan = jobs.create_job({})
+    orphan.set_state("running")
+    with open(os.path.join(orphan.dir, "upload.pdf"), "wb") as f:
+        f.write(b"%PDF")
+    # Still owned by a live worker
+    owned = jobs.create_job({})
+    owned.claim()
+    owned.set_state("running")
+
+    # A new queue on the same directory stands in for the restarted server
+    restarted = queue_for(tmp_path)
+    status = restarted.status(orphan.id)
+    assert status["state"] == "failed" and "restart" in status["error"]
+    assert "upload.pdf" not in os.listdir(orphan.dir)
+    assert restarted.status(owned.id)["state"] == "running"
+    owned.release()
+    assert restarted.recover() == [owned.id]
+
+
+def test_finished_jobs_are_pruned_by_age(tmp_path):
+    jobs = queue_for(tmp_path, retention_seconds=60)
+    old, recent, active = (IngestJob(name, str(tmp_path / name), {}) for name in ("old", "recent", "active"))
+    for job, state in ((old, "succeeded"), (recent, "failed"), (active, "running")):
+        os.makedirs(job.dir)
+        job.set_state(state)
+    # An upload whose process died while spooling it never got a status
+    os.makedirs(tmp_path / "spooling")
+    an_hour_ago = time.time() - 3600
+    for path in (old.dir, os.path.join(old.dir, STATUS_FILE), os.path.join(active.dir, STATUS_FILE),
+                 str(tmp_path / "spooling")):
+        os.utime(path, (an_hour_ago, an_hour_ago))
+
+    assert sorted(jobs.prune()) == ["old", "spooling"]
+    assert sorted(os.listdir(tmp_path)) == ["active", "recent"]
+
+
+def test_discarded_job_leaves_nothing_behind(tmp_path):
+    jobs = queue_for(tmp_path)
+    job = jobs.create_job({})
+    with open(os.path.join(job.dir, "partial.pdf"), "wb") as f:
+        f.write(b"%PD")
+    jobs.discard(job)
+    assert os.listdir(tmp_path) == []
+    assert jobs.status(job.id) is None
@@ -0,0 +1,65 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+scipy_sparse = pytest.importorskip("scipy.sparse")
+
+import keyword_batch
+from keyword_batch import iter_json_items, iter_ndjson_items, stream_keywords, top_n_per_row
+
+
+class FlakyEngine:
+    """Keyword engine stand-in that fails on any batch containing the text "boom"."""
+
+    def __init__(self):
+        self.batches = []
+
+    def extract(self, texts, top_n):
+        self.batches.append(texts)
+        if "boom" in texts:
+            raise RuntimeError("model crashed")
+        return [[(text.split()[0], 0.5)] for text in texts], None
+
+
+def lines_of(chunks):
+    return [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+
+def test_ndjson_items_report_bad_lines_in_place(monkeypatch):
+    monkeypatch.setattr(keyword_batch, "MAX_LINE_BYTES", 40)
+    body = b'"plain text"\n\n{"id": "x", "text": "with id"}\nnot json\n' + b'"' + b"a" * 60 + b'"\n{"text": 3}\n"last"'
+    items = list(iter_ndjson_items(io.BytesIO(body)))
+
+    assert items[0] == {"id": 0, "text": "plain text"}
+    assert items[1] == {"id": "x", "text": "with id"}
+    assert items[2]["id"] == 2 and items[2]["error"].startswith("Invalid JSON")
+    assert items[3] == {"id": 3, "error": "Line longer than 40 bytes"}
+    assert items[4]["id"] == 4 and "error" in items[4]
+    assert items[5] == {"id": 5, "text": "last"}
+
+
+def test_top_n_per_row_matches_sorting_each_row():
+    matrix = scipy_sparse.random(20, 50, density=0.2, format="csr", random_state=1)
+    names = np.array([f"w{i}" for i in range(50)], dtype=object)
+    results = top_n_per_row(matrix, names, 3)
+
+    for row, result in enumerate(results):
+        dense = matrix[row].toarray()[0]
+        best = [i for i in np.argsort(-dense)[:3] if dense[i] > 0]
+        assert set(result) == {f"w{i}" for i in best}
+
+
+def test_a_failing_batch_does_not_stop_the_stream():
+    engine = FlakyEngine()
+    items = iter_json_items(["alpha one", "beta two", "boom", "gamma three", 42])
+    lines = lines_of(stream_keywords(items, "keybert", 5, keyword_engine=engine, batch_size=2))
+
+    assert engine.batches == [["alpha one", "beta two"], ["boom", "gamma three"]]
+    assert lines[0] == {"id": 0, "keybert": [["alpha", 0.5]]}
+    assert lines[2]["error"] == lines[3]["error"] == "Keyword extraction failed: model crashed"
+    assert "keybert" not in lines[3]
+    assert lines[4]["id"] == 4 and "error" in lines[4]
+    assert lines[5] == {"done": True, "count": 5, "errors": 3}
+    assert all("text" not in line for line in lines)
@@ -0,0 +1,40 @@
+import numpy as np
+
+from keyword_cache import KeywordCache, text_hash
+
+
+def test_least_recently_used_entries_are_evicted():
+    vector = np.zeros(100, dtype=np.float32)  # 400 bytes each
+    cache = KeywordCache(max_bytes=1000)
+    cache.put("doc", "a", vector)
+    cache.put("doc", "b", vector)
+    assert cache.get("doc", "a") is not None  # b is now the oldest
+    cache.put("doc", "c", vector)
+
+    assert cache.get("doc", "b") is None
+    assert cache.get("doc", "a") is not None and cache.get("doc", "c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["bytes"] <= 1000
+    assert stats["doc"]["hits"] == 3 and stats["doc"]["misses"] == 1
+
+
+def test_namespaces_are_separate():
+    cache = KeywordCache(max_bytes=1 << 20)
+    key = text_hash("neural networks")
+    cache.put("doc", key, np.ones(4, dtype=np.float32))
+    assert cache.get("word", key) is None
+    assert cache.get("keywords", key) is None
+
+
+def test_disk_entries_outlive_the_memory_cache(tmp_path):
+    key = text_hash("neural networks")
+    cache = KeywordCache(max_bytes=1 << 20, disk_dir=str(tmp_path))
+    cache.put("doc", key, np.arange(4, dtype=np.float32))
+    cache.put("keywords", key, [("neural", 0.75), ("networks", 0.5)])
+
+    # A new process starts with an empty memory cache
+    restarted = KeywordCache(max_bytes=1 << 20, disk_dir=str(tmp_path))
+    np.testing.assert_array_equal(restarted.get("doc", key), np.arange(4, dtype=np.float32))
+    assert restarted.get("keywords", key) == [("neural", 0.75), ("networks", 0.5)]
+    assert restarted.stats()["doc"]["disk_hits"] == 1
+    assert restarted.get("doc", text_hash("unseen")) is None
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from keyword_cache import KeywordCache
+from keyword_engine import BatchKeywordEngine, sparse_neighbors
+
+
+def dense_similarities(embeddings):
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return normalized @ normalized.T
+
+
+@pytest.fixture
+def embeddings():
+    return np.random.default_rng(0).normal(size=(23, 8)).astype(np.float32)
+
+
+def test_threshold_pairs_match_the_dense_matrix(embeddings):
+    dense = dense_similarities(embeddings)
+    expected = {(i, j) for i in range(len(dense)) for j in range(i + 1, len(dense)) if dense[i, j] >= 0.3}
+
+    pairs = sparse_neighbors(embeddings, threshold=0.3, block_size=5)
+    assert {(source, target) for source, target, _ in pairs} == expected
+    for source, target, similarity in pairs:
+        assert similarity == pytest.approx(dense[source, target], abs=1e-5)
+
+
+def test_top_k_returns_nearest_neighbours_in_order(embeddings):
+    dense = dense_similarities(embeddings)
+    np.fill_diagonal(dense, -np.inf)
+
+    pairs = sparse_neighbors(embeddings, top_k=3, block_size=5)
+    assert len(pairs) == 3 * len(embeddings)
+    for source in range(len(embeddings)):
+        targets = [target for s, target, _ in pairs if s == source]
+        assert targets == np.argsort(-dense[source])[:3].tolist()
+
+
+def test_top_k_with_threshold_and_tiny_inputs(embeddings):
+    pairs = sparse_neighbors(embeddings, top_k=3, threshold=0.5)
+    assert all(similarity >= 0.5 for _, _, similarity in pairs)
+    assert sparse_neighbors(embeddings[:1], top_k=3) == []
+    # Fewer documents than top_k: every other document is a neighbour
+    assert len(sparse_neighbors(embeddings[:3], top_k=5)) == 6
+
+
+@pytest.fixture
+def engine(kw_model):
+    return BatchKeywordEngine(kw_model, cache=KeywordCache(max_bytes=1 << 20))
+
+
+def test_wordless_documents_get_no_keywords(engine):
+    docs = ["", "a", "!!", "the and of", "neural networks learn features"]
+    keywords, doc_embeddings = engine.extract(docs, top_n=3, stop_words="english")
+
+    assert keywords[:4] == [[], [], [], []]
+    assert {word for word, _ in keywords[4]} <= {"neural", "networks", "learn", "features"}
+    assert len(keywords[4]) == 3
+    assert doc_embeddings.shape == (5, 8)
+    # Only the document with candidate words reaches KeyBERT
+    assert engine.kw_model.calls == [["neural networks learn features"]]
+
+
+def test_batch_of_wordless_documents(engine):
+    keywords, doc_embeddings = engine.extract(["", "?"], top_n=3)
+    assert keywords == [[], []]
+    assert doc_embeddings.shape == (2, 8)
+    assert engine.kw_model.calls == []
+
+    doc_embeddings, word_embeddings = engine.embed(["", "!"])
+    assert len(doc_embeddings) == 2 and len(word_embeddings) == 0
+
+
+def test_cached_results_skip_the_model(engine):
+    docs = ["graph neural networks", "support vector machines"]
+    first, first_embeddings = engine.extract(docs, top_n=2)
+    embedded = len(engine.kw_model.model.embedded)
+
+    second, second_embeddings = engine.extract(docs[::-1], top_n=2)
+    assert second == first[::-1]
+    np.testing.assert_allclose(second_embeddings, first_embeddings[::-1])
+    assert len(engine.kw_model.calls) == 1
+    assert len(engine.kw_model.model.embedded) == embedded
@@ -0,0 +1,40 @@
+import pytest
+
+nltk = pytest.importorskip("nltk")
+pytest.importorskip("sklearn")
+
+from keyword_extractor import extract_keywords, model_registry, preprocess_text
+
+# Phrases the stored vocabulary holds as bigrams, written as ordinary text
+TEXT = ("<p>The algorithm uses low-pass filters. Back propagation of errors, even though first order "
+        "methods may be used, trains neural networks with 2 hidden units.</p>")
+EXPECTED_BIGRAMS = ["algorithm us", "low pas", "back propagation", "even though", "first order", "may used",
+                    "neural network", "hidden unit"]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def nltk_data():
+    for resource in ("stopwords", "wordnet"):
+        try:
+            nltk.data.find(f"corpora/{resource}")
+        except LookupError:
+            pytest.skip(f"NLTK data '{resource}' is not installed")
+
+
+def test_preprocessing_lemmatizes_and_drops_stop_words():
+    assert preprocess_text("The algorithm uses low-pass filters.") == "algorithm us low pas filter"
+    assert preprocess_text("Using two large networks, et al. also show") == "network show"
+
+
+def test_preprocessed_text_matches_the_stored_vocabulary():
+    vectorizer = model_registry.get().cv
+    features = vectorizer.build_analyzer()(preprocess_text(TEXT))
+    for bigram in EXPECTED_BIGRAMS:
+        assert bigram in features
+        assert bigram in vectorizer.vocabulary_
+    assert all(feature in vectorizer.vocabulary_ for feature in preprocess_text(TEXT).split())
+
+
+def test_keywords_include_bigrams():
+    keywords = extract_keywords(TEXT, None)
+    assert any(" " in keyword for keyword in keywords)
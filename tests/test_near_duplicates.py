@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+
+from near_duplicates import IDS_FILE, MinHasher, MinHashIndex, find_near_duplicates, shingle_hashes
+
+BASE = ("the quick brown fox jumps over the lazy dog while the cat sleeps on the warm mat "
+        "and the birds sing in the old oak tree behind the red barn near the river")
+EDITED = BASE.replace("cat sleeps", "cat naps")
+OTHER = ("quarterly revenue grew by twelve percent driven by strong demand for cloud services "
+         "and a recovery in hardware sales across european markets")
+
+
+def test_signature_agreement_estimates_jaccard():
+    a, b = shingle_hashes(BASE), shingle_hashes(EDITED)
+    jaccard = len(np.intersect1d(a, b)) / len(np.union1d(a, b))
+    hasher = MinHasher(num_perm=512)
+    estimate = float(np.mean(hasher.signature(a) == hasher.signature(b)))
+    assert abs(estimate - jaccard) < 0.1
+
+
+def test_near_copies_are_paired_and_clustered():
+    pairs, clusters, unsigned = find_near_duplicates(
+        ["a", "b", "c", "d"], [BASE, EDITED, OTHER, BASE.upper()], threshold=0.5
+    )
+    assert {(pair["a"], pair["b"]) for pair in pairs} == {("a", "b"), ("a", "d"), ("b", "d")}
+    assert clusters == [["a", "b", "d"]]
+    assert unsigned == []
+
+
+def test_wordless_texts_are_not_signed_or_stored(tmp_path):
+    corpus = MinHashIndex(str(tmp_path))
+    pairs, clusters, unsigned = find_near_duplicates(["a", "b", "c"], ["", "  ", "!!"], 0.5, corpus=corpus)
+    assert (pairs, clusters, unsigned) == ([], [], ["a", "b", "c"])
+    assert corpus.ids == []
+
+
+def test_stored_corpus_is_shared_between_instances(tmp_path):
+    first, second = MinHashIndex(str(tmp_path)), MinHashIndex(str(tmp_path))
+    find_near_duplicates(["a"], [BASE], 0.5, corpus=first)
+    # The second instance reloads what the first saved before checking and storing
+    pairs, _, _ = find_near_duplicates(["b"], [EDITED], 0.5, corpus=second)
+    assert [(pair["a"], pair["b"]) for pair in pairs] == [("a", "b")]
+    assert second.ids == ["a", "b"]
+
+    reopened = MinHashIndex(str(tmp_path))
+    assert reopened.ids == ["a", "b"]
+    np.testing.assert_array_equal(reopened.signatures, second.signatures)
+
+
+def test_re_adding_an_id_replaces_its_signature(tmp_path):
+    corpus = MinHashIndex(str(tmp_path))
+    find_near_duplicates(["a"], [BASE], 0.5, corpus=corpus)
+    find_near_duplicates(["a"], [OTHER], 0.5, corpus=corpus)
+    assert corpus.ids == ["a"]
+    pairs, _, _ = find_near_duplicates(["b"], [BASE], 0.5, corpus=corpus, store=False)
+    assert pairs == []
+
+
+def test_save_appends_only_new_signatures(tmp_path):
+    corpus = MinHashIndex(str(tmp_path))
+    find_near_duplicates(["a"], [BASE], 0.5, corpus=corpus)
+    ids_journal = (tmp_path / IDS_FILE).read_bytes()
+    [segment] = tmp_path.glob("signatures-*.u32")
+    assert segment.stat().st_size == corpus.hasher.num_perm * 4
+
+    find_near_duplicates(["b"], [OTHER], 0.5, corpus=corpus)
+    assert (tmp_path / IDS_FILE).read_bytes().startswith(ids_journal)
+    assert list(tmp_path.glob("signatures-*.u32")) == [segment]
+    assert segment.stat().st_size == 2 * corpus.hasher.num_perm * 4
+
+
+def test_superseded_signatures_are_compacted_away(tmp_path):
+    corpus = MinHashIndex(str(tmp_path))
+    find_near_duplicates(["a", "b"], [BASE, OTHER], 0.5, corpus=corpus)
+    for _ in range(3):
+        find_near_duplicates(["a"], [OTHER], 0.5, corpus=corpus)
+        find_near_duplicates(["a"], [BASE], 0.5, corpus=corpus)
+
+    [segment] = tmp_path.glob("signatures-*.u32")
+    assert segment.stat().st_size <= 2 * 2 * corpus.hasher.num_perm * 4
+    reopened = MinHashIndex(str(tmp_path))
+    assert reopened.ids == ["a", "b"]
+    np.testing.assert_array_equal(reopened.signatures, corpus.signatures)
+
+
+def test_corpus_in_the_old_format_is_migrated(tmp_path):
+    hasher = MinHasher()
+    signatures = np.stack(hasher.signatures([BASE, OTHER]))
+    np.save(tmp_path / "signatures.npy", signatures)
+    (tmp_path / "ids.json").write_text(json.dumps(["a", "b"]))
+
+    pairs, _, _ = find_near_duplicates(["c"], [EDITED], 0.5, corpus=MinHashIndex(str(tmp_path)))
+    assert [(pair["a"], pair["b"]) for pair in pairs] == [("a", "c")]
+    assert not (tmp_path / "ids.json").exists()
+    assert MinHashIndex(str(tmp_path)).ids == ["a", "b", "c"]
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+speech_report = pytest.importorskip("speech_report")
+soundfile = pytest.importorskip("soundfile")
+
+from speech_report import AnalysisContext
+
+SAMPLING_RATE = 16000
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """Stereo file of two voiced stretches with a pause between them."""
+    t = np.arange(int(1.2 * SAMPLING_RATE)) / SAMPLING_RATE
+    voiced = 0.3 * (0.2 + 0.8 * np.sin(4 * np.pi * t) ** 2) * sum(
+        np.sin(2 * np.pi * 140 * harmonic * t) / harmonic for harmonic in range(1, 6))
+    mono = np.concatenate([np.zeros(4000), voiced, np.zeros(10000), voiced, np.zeros(4000)])
+    mono += np.random.default_rng(0).normal(scale=0.001, size=len(mono))
+    path = tmp_path / "recording.wav"
+    soundfile.write(str(path), np.column_stack((mono, 0.5 * mono)), SAMPLING_RATE, subtype="FLOAT")
+    return str(path)
+
+
+@pytest.fixture
+def praat_calls(monkeypatch):
+    """Names of the Praat commands speech_report runs."""
+    calls = []
+    real_call = speech_report.call
+
+    def recording_call(*args):
+        calls.append(args[1])
+        return real_call(*args)
+
+    monkeypatch.setattr(speech_report, "call", recording_call)
+    return calls
+
+
+def test_samples_are_the_mono_mix(recording):
+    context = AnalysisContext(recording)
+    data, sampling_rate = soundfile.read(recording, dtype="float32")
+    assert context.sampling_rate == sampling_rate
+    np.testing.assert_allclose(context.samples, data.mean(axis=1), atol=1e-6)
+
+
+def test_metrics_share_one_decode_and_one_pitch_track(recording, praat_calls, monkeypatch):
+    decodes = []
+    real_sound = speech_report.parselmouth.Sound
+    monkeypatch.setattr(speech_report.parselmouth, "Sound", lambda *args: decodes.append(args) or real_sound(*args))
+
+    context = speech_report.as_context(recording, 75, 300)
+    speech_report.measurePitch(context, 75, 300)
+    speech_report.calculate_fluency_metrics("one two three", context)
+    speech_report.calculate_prosody_metrics(context)
+    speech_report.calculate_voice_quality_metrics(context)
+    speech_report.calculate_acoustic_analysis_metrics(context)
+
+    assert len(decodes) == 1
+    assert praat_calls.count("To Pitch") == 1
+    assert "To PointProcess (periodic, cc)" not in praat_calls
+    assert speech_report.as_context(context) is context
+
+
+def test_shared_analyses_give_the_same_metrics_as_separate_ones(recording, tmp_path, monkeypatch):
+    monkeypatch.setattr(speech_report, "transcribe_speech", lambda audio_file: "one two three")
+    metrics = speech_report.generate_and_save_report(
+        recording, ["k", "a", "t"], ["k", "a", "t"], str(tmp_path), "report.txt")
+
+    assert metrics["Pause Count"] == 1
+    assert metrics["Average Pause Duration (s)"] == pytest.approx(10000 / SAMPLING_RATE, abs=0.05)
+    separate = {
+        **speech_report.measurePitch(recording, 75, 300),
+        **speech_report.calculate_prosody_metrics(recording),
+        **speech_report.calculate_acoustic_analysis_metrics(recording),
+    }
+    for name, value in separate.items():
+        assert metrics[name] == pytest.approx(value, nan_ok=True)
+    assert (tmp_path / "report.txt").read_text().startswith("Transcribed Speech: one two three\n")
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+speech_stream = pytest.importorskip("speech_stream")
+
+import vad
+from speech_stream import NoiseFloor, PauseTracker, RunningStats, analyze_stream
+
+SAMPLING_RATE = 16000
+
+
+def test_merged_stats_equal_stats_of_all_values():
+    values = np.random.default_rng(0).normal(loc=5, scale=2, size=1000)
+    merged = RunningStats()
+    for part in np.split(values, [0, 1, 300, 301, 750]):
+        merged.merge(RunningStats.of(part))
+
+    assert merged.count == len(values)
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.std == pytest.approx(values.std(ddof=1))
+    assert (merged.min, merged.max) == (values.min(), values.max())
+
+
+def test_update_ignores_non_finite_values():
+    stats = RunningStats().update([1.0, np.nan, 3.0, np.inf])
+    assert stats.summary() == {"count": 2, "mean": 2.0, "std": pytest.approx(np.sqrt(2)), "min": 1.0, "max": 3.0}
+    assert RunningStats().summary()["mean"] is None
+
+
+def frames(pattern):
+    return np.array([c == "_" for c in pattern])
+
+
+def test_pauses_within_windows():
+    tracker = PauseTracker(frame_step=0.1, min_pause=0.25)
+    # Silent runs of 3, 2 (too short to be a pause) and 4 frames
+    ended = tracker.add(frames("x___x__x____x"))
+    np.testing.assert_allclose(ended, [0.3, 0.4])
+    assert tracker.durations.count == 2
+
+
+def test_pause_spanning_windows_is_counted_once():
+    tracker = PauseTracker(frame_step=0.1, min_pause=0.25)
+    assert len(tracker.add(frames("xxx__"))) == 0
+    assert len(tracker.add(frames("_____"))) == 0
+    np.testing.assert_allclose(tracker.add(frames("__xx_")), [0.9])
+    # A run at the end of a window ends with the next window's first speech frame
+    np.testing.assert_allclose(tracker.add(frames("xx___")), [])
+    np.testing.assert_allclose(tracker.add(frames("x")), [0.3])
+    assert tracker.durations.count == 2
+    assert tracker.durations.mean == pytest.approx(0.6)
+
+
+def test_leading_and_trailing_silence_are_not_pauses():
+    tracker = PauseTracker(frame_step=0.1, min_pause=0.25)
+    assert len(tracker.add(frames("_____"))) == 0
+    assert len(tracker.add(frames("___xx___"))) == 0
+    tracker.add(frames("_____"))
+    tracker.finish()
+    assert tracker.durations.count == 0
+    # Speech after the silence turns it into a pause
+    tracker = PauseTracker(frame_step=0.1, min_pause=0.25)
+    tracker.add(frames("___xx___"))
+    np.testing.assert_allclose(tracker.add(frames("_x")), [0.4])
+
+
+def clip(layout):
+    """Voiced tone for ``("speech", seconds)`` parts and silence otherwise, over faint noise."""
+    rng = np.random.default_rng(0)
+    parts = []
+    for kind, seconds in layout:
+        t = np.arange(int(seconds * SAMPLING_RATE)) / SAMPLING_RATE
+        if kind == "speech":
+            tone = sum(np.sin(2 * np.pi * 150 * harmonic * t) / harmonic for harmonic in range(1, 6))
+            parts.append(0.3 * (0.2 + 0.8 * np.sin(4 * np.pi * t) ** 2) * tone)
+        else:
+            parts.append(np.zeros(len(t)))
+    samples = np.concatenate(parts)
+    return (samples + rng.normal(scale=0.001, size=len(samples))).astype(np.float32)
+
+
+# Windows that cut through speech and pauses, as well as one holding the whole clip
+@pytest.mark.parametrize("window_seconds", [60, 1.0, 0.7])
+def test_batch_and_streaming_pauses_agree(tmp_path, window_seconds):
+    soundfile = pytest.importorskip("soundfile")
+    samples = clip([("silence", 0.5), ("speech", 1.0), ("silence", 0.6), ("speech", 1.2),
+                    ("silence", 1.3), ("speech", 0.8), ("silence", 0.4)])
+    path = str(tmp_path / "clip.wav")
+    soundfile.write(path, samples, SAMPLING_RATE, subtype="FLOAT")
+
+    batch = vad.segment(samples, SAMPLING_RATE)["pause_durations"]
+    streamed = analyze_stream(path, str(tmp_path / "out"), window_seconds=window_seconds)["pause_s"]
+
+    assert len(batch) == streamed["count"] == 2
+    assert streamed["mean"] == pytest.approx(batch.mean())
+    assert (streamed["min"], streamed["max"]) == pytest.approx((batch.min(), batch.max()))
+
+
+def test_noise_floor_covers_every_window_so_far():
+    energy_db = np.random.default_rng(0).normal(loc=-40, scale=15, size=5000)
+    noise_floor = NoiseFloor()
+    for part in np.array_split(energy_db, 7):
+        noise_floor.update(part)
+    assert noise_floor.level == pytest.approx(np.percentile(energy_db, vad.NOISE_FLOOR_PERCENTILE), abs=0.25)
@@ -0,0 +1,66 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+newapp = pytest.importorskip("newapp")
+
+
+class FakeModel:
+    """Chat model whose ``stream`` yields fixed chunks, optionally failing part way."""
+
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.prompts = []
+
+    def stream(self, prompt):
+        self.prompts.append(prompt)
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise RuntimeError("model went away")
+            yield SimpleNamespace(content=chunk)
+
+
+def parse_events(stream):
+    events = []
+    for message in stream:
+        event, data = message.strip().split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def make_docs():
+    return [SimpleNamespace(page_content="The sky is blue.", metadata={"source": "a.pdf", "page": 1})]
+
+
+def test_events_arrive_as_context_tokens_done():
+    completed = []
+    model = FakeModel(["The sky ", "", "is blue."])
+    events = parse_events(newapp.stream_answer(model, make_docs(), "What colour is the sky?", completed.append))
+
+    assert [event for event, _ in events] == ["context", "token", "token", "done"]
+    assert events[0][1]["documents"] == [{"source": "a.pdf", "page": 1}]
+    assert [data["text"] for event, data in events if event == "token"] == ["The sky ", "is blue."]
+    assert events[-1][1] == {"answer": "The sky is blue.", "cached": False}
+    assert completed == ["The sky is blue."]
+    assert "The sky is blue." in model.prompts[0] and "What colour is the sky?" in model.prompts[0]
+
+
+def test_model_failure_ends_with_error_event():
+    completed = []
+    model = FakeModel(["The sky ", "is blue."], fail_after=1)
+    events = parse_events(newapp.stream_answer(model, make_docs(), "What colour is the sky?", completed.append))
+
+    assert [event for event, _ in events] == ["context", "token", "error"]
+    assert events[-1][1]["details"] == "model went away"
+    assert completed == []
+
+
+def test_plain_string_chunks_are_streamed():
+    class StringModel:
+        def stream(self, prompt):
+            yield from ["Blue", "."]
+
+    events = parse_events(newapp.stream_answer(StringModel(), make_docs(), "Colour?"))
+    assert events[-1] == ("done", {"answer": "Blue.", "cached": False})
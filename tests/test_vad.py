@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("numba")
+
+import vad
+
+SAMPLING_RATE = 16000
+
+
+def speech(seconds, f0=150, syllables_per_second=4):
+    """Voiced harmonic tone whose loudness rises and falls once per syllable."""
+    t = np.arange(int(seconds * SAMPLING_RATE)) / SAMPLING_RATE
+    tone = sum(np.sin(2 * np.pi * f0 * harmonic * t) / harmonic for harmonic in range(1, 6))
+    loudness = 0.2 + 0.8 * np.sin(np.pi * syllables_per_second * t) ** 2
+    return 0.3 * loudness * tone
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SAMPLING_RATE))
+
+
+@pytest.fixture
+def recording():
+    # Leading and trailing silence, one real pause, and a short gap inside speech
+    parts = [silence(0.5), speech(1.0), silence(0.6), speech(1.0), silence(0.1), speech(0.8), silence(0.5)]
+    samples = np.concatenate(parts)
+    return samples + np.random.default_rng(0).normal(scale=0.001, size=len(samples))
+
+
+def test_segments_speech_and_pauses(recording):
+    result = vad.segment(recording, SAMPLING_RATE)
+
+    assert result["duration"] == pytest.approx(4.5)
+    speech_segments = np.array(result["speech_segments"])
+    assert len(speech_segments) == 2
+    np.testing.assert_allclose(speech_segments, [[0.5, 1.5], [2.1, 4.0]], atol=0.06)
+
+    # Only the silence between the two stretches of speech is a pause
+    assert len(result["pause_durations"]) == 1
+    assert result["pause_durations"][0] == pytest.approx(0.6, abs=0.1)
+    assert result["pause_histogram"]["0.5-1s"] == 1
+    assert result["speech_time"] == pytest.approx(2.9, abs=0.15)
+
+
+def test_finds_one_nucleus_per_syllable(recording):
+    result = vad.segment(recording, SAMPLING_RATE)
+
+    # 4 syllables per second over 2.8 s of speech
+    assert 8 <= len(result["nuclei"]) <= 14
+    assert all(any(start <= t <= end for start, end in result["speech_segments"]) for t in result["nuclei"])
+    assert result["articulation_rate"] == pytest.approx(4, abs=1)
+    # Evenly spaced syllables have little rhythmic variability
+    assert result["npvi"] < 30
+
+
+def test_input_shorter_than_a_frame():
+    result = vad.segment(np.zeros(100), SAMPLING_RATE)
+    assert result["speech_segments"] == [] and result["articulation_rate"] is None
+
+
+def test_rhythm_metrics():
+    assert vad.npvi([0.2, 0.2, 0.2]) == 0
+    assert vad.npvi([0.1, 0.3]) == pytest.approx(100)
+    assert vad.varco([0.2]) is None
+    assert vad.varco([0.1, 0.3]) == pytest.approx(100 * np.std([0.1, 0.3], ddof=1) / 0.2)
@@ -0,0 +1,207 @@
+import numpy as np
+from numba import njit
+
+# Analysis frames: 25 ms windows every 10 ms
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+
+# Frames per block when computing autocorrelation, bounding memory on long recordings
+FRAMES_PER_BLOCK = 4096
+
+# Speech starts above noise floor + HIGH_DB and continues while above noise floor + LOW_DB;
+# the noise floor is this percentile of frame energy
+HIGH_DB = 12.0
+LOW_DB = 6.0
+NOISE_FLOOR_PERCENTILE = 10
+
+# Silences shorter than MIN_PAUSE_SECONDS are gaps within speech (e.g. stop closures);
+# bursts shorter than MIN_SPEECH_SECONDS are clicks or breaths
+MIN_PAUSE_SECONDS = 0.25
+MIN_SPEECH_SECONDS = 0.08
+
+# A syllable nucleus is a voiced intensity peak rising at least this far above the dip before it
+NUCLEUS_PROMINENCE_DB = 2.0
+VOICING_THRESHOLD = 0.45
+
+# Upper edges (s) of the pause histogram bins; the last bin is open-ended
+PAUSE_HISTOGRAM_EDGES = (0.5, 1.0, 2.0, 4.0)
+
+
+def frame_features(samples, sampling_rate, f0min=75, f0max=300):
+    """Per-frame energy (dB), zero-crossing rate and voicing strength, computed in bulk.
+
+    Voicing is the peak of the normalized autocorrelation within the lag range of
+    ``f0min``-``f0max``, computed for a block of frames at a time with one FFT.
+    Returns ``(energy_db, zcr, voicing)`` arrays, one value per frame.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    frame_length = int(FRAME_SECONDS * sampling_rate)
+    hop = int(HOP_SECONDS * sampling_rate)
+    if len(samples) < frame_length:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty, empty
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame_length)[::hop]
+    min_lag = max(1, int(sampling_rate / f0max))
+    max_lag = min(frame_length - 1, int(sampling_rate / f0min))
+    n_fft = 1 << int(np.ceil(np.log2(2 * frame_length)))
+    taper = np.hanning(frame_length).astype(np.float32)
+
+    energy_db = np.empty(len(frames), dtype=np.float32)
+    zcr = np.empty(len(frames), dtype=np.float32)
+    voicing = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), FRAMES_PER_BLOCK):
+        block = frames[start:start + FRAMES_PER_BLOCK]
+        power = np.mean(block * block, axis=1)
+        energy_db[start:start + len(block)] = 10 * np.log10(power + 1e-10)
+        signs = np.signbit(block)
+        zcr[start:start + len(block)] = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        centered = (block - block.mean(axis=1, keepdims=True)) * taper
+        spectrum = np.fft.rfft(centered, n=n_fft, axis=1)
+        autocorrelation = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=1)
+        peak = autocorrelation[:, min_lag:max_lag + 1].max(axis=1)
+        voicing[start:start + len(block)] = np.where(autocorrelation[:, 0] > 0, peak / np.maximum(autocorrelation[:, 0], 1e-12), 0)
+    return energy_db, zcr, voicing
+
+
+@njit(cache=True)
+def hysteresis(energy_db, high, low):
+    """Speech mask: on when energy rises above ``high``, off when it falls below ``low``."""
+    mask = np.zeros(len(energy_db), dtype=np.bool_)
+    active = False
+    for i in range(len(energy_db)):
+        if active:
+            active = energy_db[i] >= low
+        else:
+            active = energy_db[i] >= high
+        mask[i] = active
+    return mask
+
+
+@njit(cache=True)
+def syllable_nuclei(energy_db, voiced, speech, prominence, min_gap):
+    """Frames of voiced intensity peaks at least ``prominence`` dB above the preceding dip."""
+    peaks = np.zeros(len(energy_db), dtype=np.int64)
+    count = 0
+    dip = np.inf
+    last = -min_gap
+    for i in range(1, len(energy_db) - 1):
+        if not speech[i]:
+            dip = np.inf
+            continue
+        dip = min(dip, energy_db[i])
+        if energy_db[i] >= energy_db[i - 1] and energy_db[i] > energy_db[i + 1] and voiced[i]:
+            if energy_db[i] - dip >= prominence and i - last >= min_gap:
+                peaks[count] = i
+                count += 1
+                last = i
+                dip = energy_db[i]
+    return peaks[:count]
+
+
+def runs(mask):
+    """``(starts, ends)`` frame indices of the True runs in ``mask`` (ends exclusive)."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_mask(energy_db, voicing, noise_floor=None):
+    """Frame-level speech decision with an adaptive noise floor and minimum durations.
+
+    ``noise_floor`` (dB) defaults to the ``NOISE_FLOOR_PERCENTILE`` of ``energy_db``;
+    callers working through a recording in pieces pass one estimated over all of it.
+    """
+    if noise_floor is None:
+        noise_floor = float(np.percentile(energy_db, NOISE_FLOOR_PERCENTILE))
+    # Voiced frames count as speech a little below the energy threshold
+    boosted = energy_db + np.where(voicing >= VOICING_THRESHOLD, LOW_DB / 2, 0).astype(np.float32)
+    mask = hysteresis(boosted, noise_floor + HIGH_DB, noise_floor + LOW_DB)
+
+    # Close short gaps, then drop short bursts
+    min_pause = int(round(MIN_PAUSE_SECONDS / HOP_SECONDS))
+    starts, ends = runs(~mask)
+    for start, end in zip(starts, ends):
+        if end - start < min_pause and start > 0 and end < len(mask):
+            mask[start:end] = True
+    min_speech = int(round(MIN_SPEECH_SECONDS / HOP_SECONDS))
+    starts, ends = runs(mask)
+    for start, end in zip(starts, ends):
+        if end - start < min_speech:
+            mask[start:end] = False
+    return mask
+
+
+def npvi(durations):
+    """Normalized pairwise variability index of successive durations."""
+    durations = np.asarray(durations, dtype=np.float64)
+    if len(durations) < 2:
+        return None
+    pairs = np.abs(np.diff(durations)) / ((durations[1:] + durations[:-1]) / 2)
+    return float(100 * pairs.mean())
+
+
+def varco(durations):
+    """Standard deviation of durations as a percentage of their mean."""
+    durations = np.asarray(durations, dtype=np.float64)
+    if len(durations) < 2 or durations.mean() == 0:
+        return None
+    return float(100 * durations.std(ddof=1) / durations.mean())
+
+
+def segment(samples, sampling_rate, f0min=75, f0max=300):
+    """Speech/pause segmentation and timing metrics for one recording.
+
+    Returns a dict with speech and pause segments as ``(start_s, end_s)`` pairs (pauses
+    are the silences between speech, not leading or trailing silence), a pause-duration
+    histogram, syllable nuclei times, articulation and speech rates, and rhythm
+    variability (nPVI and varco) of the intervals between successive nuclei.
+    """
+    energy_db, zcr, voicing = frame_features(samples, sampling_rate, f0min, f0max)
+    duration = len(samples) / sampling_rate
+    if not len(energy_db):
+        return {"duration": duration, "speech_segments": [], "pause_segments": [], "pause_durations": np.zeros(0),
+                "pause_histogram": {}, "nuclei": np.zeros(0), "speech_time": 0.0, "articulation_rate": None,
+                "speech_rate": None, "npvi": None, "varco": None, "nucleus_intensity_std_db": None}
+
+    mask = speech_mask(energy_db, voicing)
+    # Noise (high zero-crossing rate, unvoiced) is not a syllable nucleus
+    voiced = (voicing >= VOICING_THRESHOLD) & (zcr < 0.3)
+    frame_offset = FRAME_SECONDS / 2
+
+    # Each frame stands for the hop-long stretch around its centre, so a pause lasts exactly
+    # its silent frames times HOP_SECONDS, as speech_stream.PauseTracker counts it
+    starts, ends = runs(mask)
+    speech_segments = np.column_stack((starts, ends)) * HOP_SECONDS + (FRAME_SECONDS - HOP_SECONDS) / 2 \
+        if len(starts) else np.zeros((0, 2))
+    pause_segments = np.column_stack((speech_segments[:-1, 1], speech_segments[1:, 0])) \
+        if len(speech_segments) > 1 else np.zeros((0, 2))
+    pause_durations = np.clip(pause_segments[:, 1] - pause_segments[:, 0], 0, None)
+    speech_time = float((speech_segments[:, 1] - speech_segments[:, 0]).sum())
+
+    nuclei = syllable_nuclei(energy_db, voiced, mask, NUCLEUS_PROMINENCE_DB, int(round(0.1 / HOP_SECONDS)))
+    nucleus_times = nuclei * HOP_SECONDS + frame_offset
+    # Rhythm from intervals between nuclei of the same stretch of speech
+    segment_of = np.searchsorted(starts, nuclei, side="right")
+    same_segment = segment_of[1:] == segment_of[:-1]
+    intervals = np.diff(nucleus_times)[same_segment]
+
+    edges = (0.0,) + PAUSE_HISTOGRAM_EDGES + (np.inf,)
+    counts, _ = np.histogram(pause_durations, bins=edges)
+    histogram = {(f"{low:g}-{high:g}s" if np.isfinite(high) else f">{low:g}s"): int(count)
+                 for low, high, count in zip(edges[:-1], edges[1:], counts)}
+
+    return {
+        "duration": duration,
+        "speech_segments": speech_segments.round(3).tolist(),
+        "pause_segments": pause_segments.round(3).tolist(),
+        "pause_durations": pause_durations,
+        "pause_histogram": histogram,
+        "nuclei": nucleus_times,
+        "speech_time": speech_time,
+        "articulation_rate": len(nuclei) / speech_time if speech_time else None,
+        "speech_rate": len(nuclei) / duration if duration else None,
+        "npvi": npvi(intervals),
+        "varco": varco(intervals),
+        "nucleus_intensity_std_db": float(np.std(energy_db[nuclei])) if len(nuclei) > 1 else None,
+    }